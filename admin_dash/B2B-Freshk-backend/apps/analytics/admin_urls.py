@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
+
 from .views import SalesReportViewSet, ProductPerformanceViewSet, CategoryPerformanceViewSet
 from .admin_views import AdminAnalyticsViewSet, AdminEventLogViewSet
 
@@ -14,4 +17,11 @@ router.register(r'events', AdminEventLogViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
-] 
\ No newline at end of file
+] 
+
+if settings.ASYNC_READ_VIEWS:
+    # Async dashboard takes precedence over the viewset's list and dashboard routes
+    urlpatterns = [
+        path('dashboard/', async_views.dashboard, name='admin-analytics-list'),
+        path('dashboard/dashboard/', async_views.dashboard, name='admin-analytics-dashboard'),
+    ] + urlpatterns
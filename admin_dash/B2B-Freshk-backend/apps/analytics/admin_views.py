@@ -12,11 +12,15 @@ from apps.orders.models import Order, OrderItem
 from apps.products.models import Product, ProductCategory
 from apps.users.models import CustomUser
 from apps.users.permissions import IsAdmin
+from freshk.db_router import ReplicaReadMixin
 
 
-class AdminAnalyticsViewSet(viewsets.ViewSet):
-    """Admin viewset for analytics and reporting"""
+class AdminAnalyticsViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """Admin viewset for analytics and reporting (pure reads come from the replica)"""
     permission_classes = [IsAdmin]
+    # sales_reports and the performance actions store what they compute, so
+    # they read from the primary
+    replica_actions = ('list', 'dashboard', 'revenue_trends', 'user_analytics')
     
     def list(self, request):
         """Get overview analytics data"""
@@ -270,6 +274,11 @@ class AdminAnalyticsViewSet(viewsets.ViewSet):
             orders__order_date__date__lte=end_date
         ).distinct().count()
         
+        # Users who used the app at all (last_activity lags by a few minutes)
+        recently_active_users = CustomUser.objects.filter(
+            last_activity__date__gte=start_date
+        ).count()
+        
         # User role distribution
         user_roles = CustomUser.objects.values('role').annotate(
             count=Count('id')
@@ -292,6 +301,7 @@ class AdminAnalyticsViewSet(viewsets.ViewSet):
             'end_date': end_date.strftime('%Y-%m-%d'),
             'new_users_trend': list(new_users),
             'active_users': active_users,
+            'recently_active_users': recently_active_users,
             'user_roles': list(user_roles),
             'top_customers': list(top_customers)
         })
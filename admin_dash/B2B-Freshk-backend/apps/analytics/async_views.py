@@ -0,0 +1,95 @@
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from django.db.models import Sum, Avg, F
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product
+from apps.users.models import CustomUser
+from apps.users.async_auth import async_admin_required
+from freshk.db_router import read_from_replica
+
+# Async variant of AdminAnalyticsViewSet.dashboard, served when
+# ASYNC_READ_VIEWS is on and the app runs under freshk.asgi. While one
+# aggregation waits on the database the worker keeps serving other requests.
+
+
+@require_GET
+@async_admin_required
+@read_from_replica
+async def dashboard(request):
+    """Get dashboard analytics overview"""
+    # Time period selection
+    period = request.GET.get('period', 'month')
+
+    if period == 'week':
+        start_date = timezone.now() - timedelta(days=7)
+    elif period == 'year':
+        start_date = timezone.now() - timedelta(days=365)
+    elif period == 'day':
+        start_date = timezone.now() - timedelta(days=1)
+    else:  # default to month
+        start_date = timezone.now() - timedelta(days=30)
+
+    # Get basic metrics
+    total_orders = await Order.objects.filter(
+        order_date__gte=start_date
+    ).acount()
+
+    # Sum and average come from the same rows, so fetch both in one query
+    sales = await Order.objects.filter(
+        order_date__gte=start_date,
+        status='completed'
+    ).aaggregate(
+        total=Sum('total_amount'),
+        avg=Avg('total_amount')
+    )
+
+    # Get user stats
+    total_users = await CustomUser.objects.acount()
+    new_users = await CustomUser.objects.filter(
+        date_joined__gte=start_date
+    ).acount()
+
+    # Get product stats
+    total_products = await Product.objects.filter(is_active=True).acount()
+    low_stock_products = await Product.objects.filter(
+        stock_quantity__lte=F('minimum_stock'),
+        is_active=True
+    ).acount()
+
+    # Get recent activity
+    recent_orders = Order.objects.filter(
+        order_date__gte=start_date
+    ).order_by('-order_date')[:5].values(
+        'id', 'order_date', 'status', 'total_amount', 'user__username'
+    )
+
+    # Top products by sales
+    top_products = OrderItem.objects.filter(
+        order__order_date__gte=start_date,
+        order__status='completed'
+    ).values(
+        'product__name'
+    ).annotate(
+        total_sales=Sum(F('price') * F('quantity')),
+        total_quantity=Sum('quantity')
+    ).order_by('-total_sales')[:5]
+
+    return JsonResponse({
+        'period': period,
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'overview': {
+            'total_orders': total_orders,
+            'total_sales': float(sales['total'] or 0),
+            'average_order_value': float(sales['avg'] or 0),
+            'total_users': total_users,
+            'new_users': new_users,
+            'total_products': total_products,
+            'low_stock_alerts': low_stock_products,
+        },
+        'recent_orders': [row async for row in recent_orders],
+        'top_products': [row async for row in top_products],
+    }, encoder=JSONEncoder)
@@ -0,0 +1,91 @@
+import os
+import tempfile
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.orders.models import Order
+from apps.users.models import CustomUser
+from freshk.db_router import REPLICA_DB_ALIAS, read_from_replica, use_replica
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Routing against a second SQLite database: a copy of the (empty) test
+    database taken before each test, so rows written during the test exist on
+    the primary only, like a lagging replica.
+    """
+
+    # Resolved in setUpClass, after the replica alias is registered
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        handle, cls.replica_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        replica = {**connections.settings[DEFAULT_DB_ALIAS], 'NAME': cls.replica_path}
+        # connections.settings is settings.DATABASES
+        connections.settings[REPLICA_DB_ALIAS] = replica
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA_DB_ALIAS].close()
+        del connections[REPLICA_DB_ALIAS]
+        del connections.settings[REPLICA_DB_ALIAS]
+        os.remove(cls.replica_path)
+
+    def setUp(self):
+        connections[REPLICA_DB_ALIAS].close()
+        os.remove(self.replica_path)
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute('VACUUM INTO %s', [self.replica_path])
+
+        self.admin = CustomUser.objects.create_user('admin', password='pass', role='admin')
+        Order.objects.create(user=self.admin, total_amount=Decimal('10.00'))
+
+    def test_unmarked_reads_use_the_primary(self):
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_use_replica_reads_from_the_replica(self):
+        with use_replica():
+            self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_read_from_replica_decorator(self):
+        @read_from_replica
+        def count_orders():
+            return Order.objects.count()
+
+        self.assertEqual(count_orders(), 0)
+
+    def test_reads_after_a_write_go_to_the_primary(self):
+        with use_replica():
+            Order.objects.create(user=self.admin, total_amount=Decimal('5.00'))
+            self.assertEqual(Order.objects.count(), 2)
+        # The next block starts on the replica again
+        with use_replica():
+            self.assertEqual(Order.objects.count(), 0)
+
+    def test_reads_inside_a_primary_transaction_stay_there(self):
+        with use_replica(), transaction.atomic():
+            self.assertEqual(Order.objects.count(), 1)
+
+    def test_analytics_viewset_routes_pure_reads_only(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica_queries:
+            response = client.get('/api/admin/analytics/dashboard/user_analytics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(replica_queries.captured_queries)
+
+        # Stores the report it computes, so it must read the primary
+        with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica_queries:
+            response = client.get('/api/admin/analytics/dashboard/sales_reports/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica_queries.captured_queries, [])
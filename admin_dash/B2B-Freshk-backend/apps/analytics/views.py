@@ -9,6 +9,7 @@ from .serializers import (
     CategoryPerformanceSerializer
 )
 from apps.users.permissions import IsAdmin
+from freshk.db_router import read_from_replica
 from rest_framework.permissions import IsAuthenticated
 from apps.products.models import Product, ProductCategory
 from django.utils import timezone
@@ -113,6 +114,7 @@ class SalesReportViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=False, methods=['get'])
+    @read_from_replica
     def trends(self, request):
         """Get sales trends over time"""
         period = request.query_params.get('period', 'monthly')
@@ -1,14 +1,16 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import APKVersion, UpdateLog
+from django.db.models import Sum
+from .models import APKVersion, APKPatch, UpdateLog, UpdateCounter
+from .update_cache import update_check_cache
 
 @admin.register(APKVersion)
 class APKVersionAdmin(admin.ModelAdmin):
     list_display = [
-        'version', 'is_latest', 'is_active', 'force_update', 
+        'version', 'channel', 'rollout_percentage', 'is_latest', 'is_active', 'force_update', 
         'formatted_size', 'created_at', 'download_count'
     ]
-    list_filter = ['is_active', 'is_latest', 'force_update', 'created_at']
+    list_filter = ['channel', 'is_active', 'is_latest', 'force_update', 'created_at']
     search_fields = ['version', 'release_notes']
     readonly_fields = ['file_size', 'checksum', 'created_at', 'updated_at']
     
@@ -20,7 +22,7 @@ class APKVersionAdmin(admin.ModelAdmin):
             'fields': ['apk_file', 'file_size', 'checksum']
         }),
         ('Update Settings', {
-            'fields': ['is_active', 'is_latest', 'force_update', 'minimum_supported_version']
+            'fields': ['channel', 'rollout_percentage', 'is_active', 'is_latest', 'force_update', 'minimum_supported_version']
         }),
         ('Timestamps', {
             'fields': ['created_at', 'updated_at'],
@@ -33,7 +35,7 @@ class APKVersionAdmin(admin.ModelAdmin):
     def mark_as_latest(self, request, queryset):
         if queryset.count() == 1:
             version = queryset.first()
-            APKVersion.objects.update(is_latest=False)
+            APKVersion.objects.filter(channel=version.channel).update(is_latest=False)
             version.is_latest = True
             version.save()
             self.message_user(request, f"Version {version.version} marked as latest")
@@ -43,20 +45,23 @@ class APKVersionAdmin(admin.ModelAdmin):
     
     def activate_versions(self, request, queryset):
         count = queryset.update(is_active=True)
+        # Bulk updates don't send post_save
+        update_check_cache.invalidate()
         self.message_user(request, f"{count} versions activated")
     activate_versions.short_description = "Activate selected versions"
     
     def deactivate_versions(self, request, queryset):
         count = queryset.update(is_active=False)
+        update_check_cache.invalidate()
         self.message_user(request, f"{count} versions deactivated")
     deactivate_versions.short_description = "Deactivate selected versions"
     
     def download_count(self, obj):
-        count = UpdateLog.objects.filter(
+        count = UpdateCounter.objects.filter(
             action='download',
-            target_version=obj.version
-        ).count()
-        return count
+            version=obj.version
+        ).aggregate(total=Sum('count'))['total']
+        return count or 0
     download_count.short_description = "Downloads"
 
 @admin.register(UpdateLog)
@@ -69,3 +74,9 @@ class UpdateLogAdmin(admin.ModelAdmin):
     
     def has_add_permission(self, request):
         return False  # Don't allow manual creation of logs
+
+@admin.register(APKPatch)
+class APKPatchAdmin(admin.ModelAdmin):
+    list_display = ['from_version', 'to_version', 'patch_size', 'created_at']
+    list_filter = ['to_version']
+    readonly_fields = ['patch_size', 'checksum', 'created_at']
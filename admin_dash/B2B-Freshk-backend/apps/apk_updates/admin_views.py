@@ -6,12 +6,15 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.http import FileResponse
-from django.db.models import Count
+from django.db.models import Sum, Q
+from django.utils import timezone
+from datetime import timedelta
 import os
-import hashlib
 
-from .models import APKVersion, UpdateLog
+from .models import APKVersion, UpdateCounter
 from .serializers import APKVersionSerializer
+from .patches import delete_patches
+from .uploads import ChecksumUploadHandler, uploaded_file_checksum
 from apps.users.permissions import IsAdmin
 
 
@@ -22,6 +25,11 @@ class AdminAPKViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdmin]
     parser_classes = [MultiPartParser, FormParser]
     
+    def initialize_request(self, request, *args, **kwargs):
+        # Hash uploads while they stream to disk instead of re-reading them
+        request.upload_handlers = [ChecksumUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+    
     def get_queryset(self):
         """Filter APK versions for admin"""
         return APKVersion.objects.all().order_by('-created_at')
@@ -53,10 +61,13 @@ class AdminAPKViewSet(viewsets.ModelViewSet):
                 
                 # Set as latest if requested
                 if request.data.get('is_latest', False):
-                    APKVersion.objects.filter(is_latest=True).update(is_latest=False)
+                    APKVersion.objects.filter(is_latest=True, channel=apk_version.channel).update(is_latest=False)
                     apk_version.is_latest = True
                     apk_version.save()
                 
+                # Delta patches are built by `manage.py generate_apk_patches`,
+                # not in the web worker
+                
                 return Response(
                     self.get_serializer(apk_version).data,
                     status=status.HTTP_201_CREATED
@@ -91,7 +102,10 @@ class AdminAPKViewSet(viewsets.ModelViewSet):
                 file_size = apk_file.size
                 checksum = self._calculate_checksum(apk_file)
                 
-                serializer.save(
+                # Patches to and from the old file no longer apply
+                delete_patches(instance)
+                
+                instance = serializer.save(
                     apk_file=apk_file,
                     file_size=file_size,
                     checksum=checksum
@@ -101,7 +115,7 @@ class AdminAPKViewSet(viewsets.ModelViewSet):
             
             # Handle latest flag
             if request.data.get('is_latest', False):
-                APKVersion.objects.exclude(id=instance.id).update(is_latest=False)
+                APKVersion.objects.filter(channel=instance.channel).exclude(id=instance.id).update(is_latest=False)
                 instance.is_latest = True
                 instance.save()
             
@@ -115,31 +129,27 @@ class AdminAPKViewSet(viewsets.ModelViewSet):
         total_versions = APKVersion.objects.count()
         active_versions = APKVersion.objects.filter(is_active=True).count()
         
-        # Download stats from logs
-        total_downloads = UpdateLog.objects.filter(action='download').count()
-        total_update_checks = UpdateLog.objects.filter(action='check').count()
+        # Download stats from the daily counters (one row per day/action/version)
+        seven_days_ago = timezone.localdate() - timedelta(days=7)
+        totals = UpdateCounter.objects.aggregate(
+            total_downloads=Sum('count', filter=Q(action='download')),
+            total_update_checks=Sum('count', filter=Q(action='check')),
+            recent_downloads=Sum('count', filter=Q(action='download', day__gt=seven_days_ago)),
+            recent_checks=Sum('count', filter=Q(action='check', day__gt=seven_days_ago)),
+        )
+        total_downloads = totals['total_downloads'] or 0
+        total_update_checks = totals['total_update_checks'] or 0
+        recent_downloads = totals['recent_downloads'] or 0
+        recent_checks = totals['recent_checks'] or 0
         
         # Version download breakdown
         version_downloads = {}
-        download_logs = UpdateLog.objects.filter(action='download').values('target_version').annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        for log in download_logs:
-            version_downloads[log['target_version']] = log['count']
-        
-        # Recent activity (last 7 days)
-        from datetime import datetime, timedelta
-        seven_days_ago = datetime.now() - timedelta(days=7)
-        recent_downloads = UpdateLog.objects.filter(
-            action='download',
-            timestamp__gte=seven_days_ago
-        ).count()
+        download_counts = UpdateCounter.objects.filter(action='download').values('version').annotate(
+            total=Sum('count')
+        ).order_by('-total')
         
-        recent_checks = UpdateLog.objects.filter(
-            action='check',
-            timestamp__gte=seven_days_ago
-        ).count()
+        for row in download_counts:
+            version_downloads[row['version']] = row['total']
         
         return Response({
             'total_downloads': total_downloads,
@@ -167,8 +177,8 @@ class AdminAPKViewSet(viewsets.ModelViewSet):
         """Set a version as the latest"""
         apk_version = self.get_object()
         
-        # Unmark all other versions as latest
-        APKVersion.objects.filter(is_latest=True).update(is_latest=False)
+        # Unmark the other latest version of this channel
+        APKVersion.objects.filter(is_latest=True, channel=apk_version.channel).update(is_latest=False)
         
         # Mark this version as latest
         apk_version.is_latest = True
@@ -192,11 +202,38 @@ class AdminAPKViewSet(viewsets.ModelViewSet):
             'message': f'Version {apk_version.version} {"activated" if apk_version.is_active else "deactivated"}'
         })
     
+    @action(detail=True, methods=['post'])
+    def set_rollout(self, request, pk=None):
+        """Set the share of devices offered this version (staged rollout)"""
+        apk_version = self.get_object()
+        try:
+            percentage = int(request.data.get('rollout_percentage'))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'rollout_percentage must be an integer between 0 and 100'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 0 <= percentage <= 100:
+            return Response(
+                {'error': 'rollout_percentage must be an integer between 0 and 100'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        apk_version.rollout_percentage = percentage
+        apk_version.save()
+        
+        return Response({
+            'success': True,
+            'rollout_percentage': apk_version.rollout_percentage,
+            'message': f'Version {apk_version.version} rolled out to {percentage}% of {apk_version.channel} devices'
+        })
+    
     @action(detail=False, methods=['get'])
     def latest(self, request):
         """Get the latest version info"""
         try:
-            latest = APKVersion.objects.get(is_latest=True)
+            channel = request.query_params.get('channel', APKVersion.STABLE)
+            latest = APKVersion.objects.get(is_latest=True, channel=channel)
             serializer = self.get_serializer(latest)
             return Response(serializer.data)
         except APKVersion.DoesNotExist:
@@ -206,11 +243,8 @@ class AdminAPKViewSet(viewsets.ModelViewSet):
             )
     
     def _calculate_checksum(self, file):
-        """Calculate SHA256 checksum of uploaded file"""
-        sha256_hash = hashlib.sha256()
-        for chunk in file.chunks():
-            sha256_hash.update(chunk)
-        return sha256_hash.hexdigest()
+        """SHA256 checksum of uploaded file (computed during the upload)"""
+        return uploaded_file_checksum(file)
 
 
 class AdminAPKUploadSerializer(APKVersionSerializer):
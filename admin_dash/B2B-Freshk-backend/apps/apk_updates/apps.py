@@ -6,5 +6,4 @@ class ApkUpdatesConfig(AppConfig):
     verbose_name = 'APK Updates'
     
     def ready(self):
-        # Import signals or other initialization code here if needed
-        pass
+        import apps.apk_updates.signals
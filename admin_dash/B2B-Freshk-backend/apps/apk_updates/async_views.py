@@ -0,0 +1,86 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from django.db import ProgrammingError, OperationalError
+import logging
+
+from .models import APKVersion, UpdateLog
+from .views import UpdateCheckThrottle, update_log_fields
+from .log_buffer import update_log_buffer
+from .counters import write_update_logs
+from .update_cache import update_check_cache, MISS
+
+logger = logging.getLogger(__name__)
+
+# Async variants of the hot read endpoints, served when ASYNC_READ_VIEWS is on
+# and the app runs under freshk.asgi. Responses match the DRF views.
+
+async def alog_update_action(request, action, current_version=None, target_version=None):
+    """Log update check or download action"""
+    fields = update_log_fields(request, action, current_version, target_version)
+    if settings.APK_UPDATE_LOG_BUFFERED:
+        # Written in bulk by a background thread
+        update_log_buffer.add(**fields)
+        return
+    try:
+        await sync_to_async(write_update_logs)([UpdateLog(**fields)])
+    except (ProgrammingError, OperationalError) as e:
+        logger.warning(f"UpdateLog table not available, skipping log: {e}")
+    except Exception as e:
+        logger.error(f"Failed to log update action: {e}")
+
+async def _throttled(request):
+    """Apply the update check rate limit the DRF view uses; returns a 429 response or None"""
+    throttle = UpdateCheckThrottle()
+    if await sync_to_async(throttle.allow_request)(request, None):
+        return None
+    wait = throttle.wait()
+    response = JsonResponse({'detail': f'Request was throttled. Expected available in {int(wait) + 1} seconds.'}, status=429)
+    response['Retry-After'] = str(int(wait) + 1)
+    return response
+
+@require_GET
+async def check_update(request):
+    """Async version of views.check_update"""
+    throttled = await _throttled(request)
+    if throttled is not None:
+        return throttled
+
+    current_version = request.GET.get('version')
+    channel = request.GET.get('channel', APKVersion.STABLE)
+    device_id = request.GET.get('device_id', '')
+
+    if not current_version:
+        return JsonResponse({
+            'error': 'version parameter is required'
+        }, status=400)
+
+    # Log the update check
+    await alog_update_action(request, 'check', current_version=current_version)
+
+    try:
+        # Served from memory; only a cache miss touches the database
+        response_data = update_check_cache.lookup(request, current_version, channel, device_id)
+        if response_data is MISS:
+            response_data = await sync_to_async(update_check_cache.load)(
+                request, current_version, channel, device_id
+            )
+
+        if response_data is None:
+            # No versions available
+            return JsonResponse({
+                'update_available': False,
+                'latest_version': current_version,
+                'message': 'No updates available'
+            })
+
+        return JsonResponse(response_data)
+
+    except Exception as e:
+        logger.error(f"Error checking for updates: {e}")
+        return JsonResponse({
+            'error': 'Internal server error',
+            'update_available': False,
+            'latest_version': current_version
+        }, status=500)
@@ -0,0 +1,100 @@
+"""
+Daily update/download counters.
+
+Every UpdateLog write also bumps UpdateCounter(day, action, version) with an
+INSERT ... ON CONFLICT DO UPDATE, so statistics read a few hundred counter
+rows instead of scanning the whole log table.
+"""
+
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Case, When, F, Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import UpdateLog, UpdateCounter
+
+
+def counter_version(action, current_version, target_version):
+    """The version a log row is counted under"""
+    return current_version if action == 'check' else target_version
+
+
+def increment_counters(logs):
+    """Add UpdateLog rows (saved or not) to the daily counters in one statement"""
+    totals = Counter(
+        (
+            timezone.localdate(log.timestamp),
+            log.action,
+            counter_version(log.action, log.current_version, log.target_version),
+        )
+        for log in logs
+    )
+    if not totals:
+        return
+
+    table = connection.ops.quote_name(UpdateCounter._meta.db_table)
+    placeholders = ', '.join(['(%s, %s, %s, %s)'] * len(totals))
+    params = []
+    for (day, action, version), count in totals.items():
+        params.extend([day, action, version, count])
+
+    # Supported by PostgreSQL and SQLite 3.24+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (day, action, version, count) VALUES {placeholders} '
+            f'ON CONFLICT (day, action, version) '
+            f'DO UPDATE SET count = {table}.count + EXCLUDED.count',
+            params
+        )
+
+
+def write_update_logs(logs):
+    """Insert UpdateLog rows and their counter increments atomically"""
+    with transaction.atomic():
+        UpdateLog.objects.bulk_create(logs)
+        increment_counters(logs)
+
+
+def rebuild_counters():
+    """
+    Recompute all counters from the UpdateLog table; returns the row count.
+
+    Runs in one transaction that first locks the counter table against
+    increments (on SQLite, the delete takes the database write lock), so logs
+    written by other workers meanwhile are either in the aggregate or add to
+    the rebuilt counters after it commits, never lost.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            table = connection.ops.quote_name(UpdateCounter._meta.db_table)
+            with connection.cursor() as cursor:
+                # Conflicts with the ROW EXCLUSIVE lock increments take
+                cursor.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+        UpdateCounter.objects.all().delete()
+
+        rows = (
+            UpdateLog.objects
+            .annotate(
+                day=TruncDate('timestamp'),
+                counted_version=Case(
+                    When(action='check', then=F('current_version')),
+                    default=F('target_version')
+                )
+            )
+            .values('day', 'action', 'counted_version')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        counters = [
+            UpdateCounter(
+                day=row['day'],
+                action=row['action'],
+                version=row['counted_version'],
+                count=row['total']
+            )
+            for row in rows
+        ]
+        UpdateCounter.objects.bulk_create(counters, batch_size=1000)
+    return len(counters)
@@ -0,0 +1,167 @@
+"""
+Serving APK and patch files: ETags from the stored SHA-256 checksum, single
+byte-range requests (Range / If-Range) so interrupted downloads can resume, and
+optional offloading of the bytes to the reverse proxy (X-Accel-Redirect /
+X-Sendfile).
+"""
+
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+APK_CONTENT_TYPE = 'application/vnd.android.package-archive'
+PATCH_CONTENT_TYPE = 'application/octet-stream'
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def checksum_etag(checksum):
+    """Strong ETag built from a file checksum, or None if it is unknown"""
+    if checksum:
+        return f'"{checksum}"'
+    return None
+
+
+def _etag_matches(header, etag):
+    """Check an If-None-Match header against our (strong) ETag"""
+    if not etag:
+        return False
+    candidates = [value.strip() for value in header.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def parse_byte_range(header, size):
+    """
+    Parse a Range header for a file of the given size.
+    Returns (start, end) inclusive, None to serve the whole file (no header,
+    multiple ranges or unsupported units) or 'unsatisfiable'.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple ranges or other units: ignoring the header is allowed
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or (last and end < start):
+        return 'unsatisfiable'
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(header, etag, last_modified):
+    """An If-Range validator allows a partial response only if it still matches"""
+    header = header.strip()
+    if header.startswith('"') or header.startswith('W/'):
+        # Weak validators never match for If-Range
+        return bool(etag) and header == etag
+    since = parse_http_date_safe(header)
+    return since is not None and int(last_modified) == since
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as apk_file:
+        apk_file.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = apk_file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _offloaded_response(stored_file, content_type):
+    """Empty response telling nginx/Apache which file to send"""
+    response = HttpResponse(content_type=content_type)
+    if settings.APK_DOWNLOAD_OFFLOAD == 'nginx':
+        prefix = settings.APK_ACCEL_REDIRECT_PREFIX.rstrip('/')
+        response['X-Accel-Redirect'] = quote(f'{prefix}/{stored_file.name}')
+    else:
+        response['X-Sendfile'] = stored_file.path
+    return response
+
+
+def serve_apk(request, apk_version, filename):
+    """Build the download response for apk_version, see serve_file()"""
+    return serve_file(request, apk_version.apk_file, apk_version.checksum, filename, APK_CONTENT_TYPE)
+
+
+def serve_file(request, stored_file, checksum, filename, content_type):
+    """
+    Build the download response for a stored file.
+    Returns (response, is_new_download); HEAD, resumed and not-modified
+    requests are not new downloads.
+    """
+    path = stored_file.path
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = checksum_etag(checksum)
+
+    # Client already has this exact file
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match and _etag_matches(if_none_match, etag):
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response, False
+
+    if settings.APK_DOWNLOAD_OFFLOAD in ('nginx', 'apache'):
+        # The proxy handles Range/If-Range itself when it sends the file
+        response = _offloaded_response(stored_file, content_type)
+        is_new_download = not request.META.get('HTTP_RANGE')
+    else:
+        byte_range = parse_byte_range(request.META.get('HTTP_RANGE'), size)
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if byte_range is not None and if_range and not _if_range_matches(if_range, etag, stat.st_mtime):
+            # The file changed since the partial download started: send it all
+            byte_range = None
+
+        if byte_range == 'unsatisfiable':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            response['Accept-Ranges'] = 'bytes'
+            return response, False
+
+        if byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+            response['Content-Length'] = size
+            is_new_download = True
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _read_range(path, start, length),
+                status=206,
+                content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = length
+            is_new_download = start == 0
+        response['Accept-Ranges'] = 'bytes'
+
+    if request.method == 'HEAD':
+        is_new_download = False
+
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if etag:
+        response['ETag'] = etag
+        response['X-Checksum-SHA256'] = checksum
+    return response, is_new_download
@@ -0,0 +1,109 @@
+"""
+Buffered UpdateLog writes.
+
+Update checks run on every app launch, so logging them with one INSERT per
+request puts a write on the hot path. Rows are queued in memory instead and a
+background thread bulk-inserts them (and bumps the daily counters) every
+APK_UPDATE_LOG_FLUSH_INTERVAL seconds, or as soon as a batch fills up. Whatever
+is still queued is flushed at exit.
+
+A batch that fails for another reason than a missing table is retried row by
+row, so one bad row only loses itself.
+"""
+
+import atexit
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connections, ProgrammingError, OperationalError
+
+from .models import UpdateLog
+from .counters import write_update_logs
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# Bound memory if the database is unreachable for a long time
+MAX_PENDING = 50000
+
+
+class UpdateLogBuffer:
+    """Thread-safe queue of UpdateLog rows with a lazily started flusher thread"""
+
+    def __init__(self):
+        self._pending = deque(maxlen=MAX_PENDING)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        # Entries dropped since the buffer last filled up (None when not full)
+        self._overflow = None
+
+    def add(self, **fields):
+        if len(self._pending) == MAX_PENDING:
+            # Warn once per episode, not on every request while the database is behind
+            if self._overflow is None:
+                self._overflow = 0
+                logger.warning("UpdateLog buffer full, dropping oldest entries")
+            self._overflow += 1
+        self._pending.append(UpdateLog(**fields))
+        self._ensure_thread()
+        if len(self._pending) >= BATCH_SIZE:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything queued so far; returns the number of rows written"""
+        written = 0
+        with self._lock:
+            if self._overflow:
+                logger.warning(f"UpdateLog buffer was full, dropped {self._overflow} log entries")
+            self._overflow = None
+            while self._pending:
+                batch = []
+                while self._pending and len(batch) < BATCH_SIZE:
+                    batch.append(self._pending.popleft())
+                try:
+                    write_update_logs(batch)
+                    written += len(batch)
+                except (ProgrammingError, OperationalError) as e:
+                    logger.warning(f"UpdateLog table not available, dropping {len(batch)} log entries: {e}")
+                except Exception as e:
+                    logger.warning(f"Failed to flush {len(batch)} update log entries, retrying one by one: {e}")
+                    written += self._write_rows(batch)
+        return written
+
+    def _write_rows(self, batch):
+        written = 0
+        for log in batch:
+            try:
+                write_update_logs([log])
+                written += 1
+            except Exception as e:
+                logger.error(f"Failed to write update log entry ({log.action} from {log.ip_address}): {e}")
+        return written
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='update-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(settings.APK_UPDATE_LOG_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # Don't hold a connection between flushes
+                connections.close_all()
+
+
+update_log_buffer = UpdateLogBuffer()
+
+atexit.register(update_log_buffer.flush)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from apps.apk_updates.counters import rebuild_counters
+from apps.apk_updates.log_buffer import update_log_buffer
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily update/download counters from the UpdateLog table'
+
+    def handle(self, *args, **options):
+        # Counters are replaced wholesale, so write out anything still queued first
+        update_log_buffer.flush()
+        
+        self.stdout.write('Rebuilding counters from update logs...')
+        rows = rebuild_counters()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Created {rows} counter rows')
+        )
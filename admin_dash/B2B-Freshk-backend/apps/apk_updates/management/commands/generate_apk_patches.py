@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from apps.apk_updates.models import APKVersion
+from apps.apk_updates.patches import generate_patches, BSDIFF_AVAILABLE
+
+class Command(BaseCommand):
+    help = 'Generate missing delta patches from previous APK versions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'version',
+            nargs='?',
+            type=str,
+            help='Target version (default: the latest stable version)'
+        )
+        parser.add_argument(
+            '--patch-from',
+            type=int,
+            default=settings.APK_PATCH_PREVIOUS_VERSIONS,
+            help='Number of previous active versions to build patches from'
+        )
+
+    def handle(self, *args, **options):
+        if not BSDIFF_AVAILABLE:
+            raise CommandError('bsdiff4 is not installed')
+        
+        if options['version']:
+            apk_version = APKVersion.objects.filter(version=options['version']).first()
+        else:
+            apk_version = APKVersion.objects.filter(is_latest=True, channel=APKVersion.STABLE).first()
+        
+        if not apk_version:
+            raise CommandError('APK version not found')
+        
+        patches = generate_patches(apk_version, options['patch_from'])
+        for patch in patches:
+            self.stdout.write(
+                f'{patch.from_version.version} -> {apk_version.version}: '
+                f'{patch.patch_size} bytes'
+            )
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Created {len(patches)} patch(es) for version {apk_version.version}'
+            )
+        )
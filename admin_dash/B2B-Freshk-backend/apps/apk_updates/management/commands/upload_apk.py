@@ -1,8 +1,9 @@
 from django.core.management.base import BaseCommand, CommandError
-from django.core.files import File
+from django.conf import settings
 from apps.apk_updates.models import APKVersion
+from apps.apk_updates.patches import generate_patches, BSDIFF_AVAILABLE
+from apps.apk_updates.uploads import ChecksumFile
 import os
-import hashlib
 
 class Command(BaseCommand):
     help = 'Upload APK file and create version record'
@@ -26,6 +27,24 @@ class Command(BaseCommand):
             action='store_true',
             help='Mark this as a forced update'
         )
+        parser.add_argument(
+            '--channel',
+            choices=[choice for choice, _ in APKVersion.CHANNEL_CHOICES],
+            default=APKVersion.STABLE,
+            help='Release channel (default: stable)'
+        )
+        parser.add_argument(
+            '--rollout',
+            type=int,
+            default=100,
+            help='Percentage of devices offered this version (default: 100)'
+        )
+        parser.add_argument(
+            '--patch-from',
+            type=int,
+            default=settings.APK_PATCH_PREVIOUS_VERSIONS,
+            help='Number of previous active versions to build delta patches from (0 to skip)'
+        )
 
     def handle(self, *args, **options):
         version = options['version']
@@ -35,40 +54,55 @@ class Command(BaseCommand):
         if not os.path.exists(apk_path):
             raise CommandError(f'APK file not found: {apk_path}')
         
+        if not 0 <= options['rollout'] <= 100:
+            raise CommandError('--rollout must be between 0 and 100')
+        
         # Check if version already exists
         if APKVersion.objects.filter(version=version).exists():
             raise CommandError(f'Version {version} already exists')
         
-        # Calculate checksum
-        self.stdout.write('Calculating checksum...')
-        sha256_hash = hashlib.sha256()
-        with open(apk_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        checksum = sha256_hash.hexdigest()
-        
         # Create version record
         self.stdout.write(f'Creating version record for {version}...')
         
+        apk_version = APKVersion(
+            version=version,
+            release_notes=options['release_notes'],
+            is_latest=options['set_latest'],
+            force_update=options['force_update'],
+            channel=options['channel'],
+            rollout_percentage=options['rollout']
+        )
+        
+        # Copy the file into storage, hashing it in the same pass
         with open(apk_path, 'rb') as f:
-            apk_version = APKVersion.objects.create(
-                version=version,
-                release_notes=options['release_notes'],
-                is_latest=options['set_latest'],
-                force_update=options['force_update'],
-                checksum=checksum
-            )
+            apk_file = ChecksumFile(f)
             apk_version.apk_file.save(
                 f'freshk-v{version}.apk',
-                File(f),
-                save=True
+                apk_file,
+                save=False
             )
+        checksum = apk_file.sha256
+        apk_version.checksum = checksum
+        apk_version.file_size = apk_file.bytes_read
+        apk_version.save()
+        
+        # Build delta patches from the previous versions
+        if options['patch_from'] > 0:
+            if BSDIFF_AVAILABLE:
+                self.stdout.write('Generating delta patches...')
+                for patch in generate_patches(apk_version, options['patch_from']):
+                    self.stdout.write(
+                        f'  {patch.from_version.version} -> {version}: {patch.patch_size} bytes'
+                    )
+            else:
+                self.stdout.write(self.style.WARNING('bsdiff4 not installed, skipping patches'))
         
         self.stdout.write(
             self.style.SUCCESS(
                 f'Successfully uploaded APK version {version}\n'
                 f'File size: {apk_version.formatted_size}\n'
                 f'Checksum: {checksum[:16]}...\n'
-                f'Latest: {apk_version.is_latest}'
+                f'Latest: {apk_version.is_latest}\n'
+                f'Channel: {apk_version.channel} ({apk_version.rollout_percentage}% rollout)'
             )
         )
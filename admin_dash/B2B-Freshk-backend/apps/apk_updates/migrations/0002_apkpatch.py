@@ -0,0 +1,37 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apk_updates', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='updatelog',
+            name='action',
+            field=models.CharField(choices=[('check', 'Update Check'), ('download', 'APK Download'), ('patch', 'Patch Download')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='APKPatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('patch_file', models.FileField(help_text='bsdiff patch file', upload_to='apk_patches/')),
+                ('patch_size', models.BigIntegerField(help_text='Patch size in bytes')),
+                ('checksum', models.CharField(help_text='SHA256 checksum of the patch file', max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('from_version', models.ForeignKey(help_text='Version the client has installed', on_delete=django.db.models.deletion.CASCADE, related_name='patches_from', to='apk_updates.apkversion')),
+                ('to_version', models.ForeignKey(help_text='Version the patch produces', on_delete=django.db.models.deletion.CASCADE, related_name='patches', to='apk_updates.apkversion')),
+            ],
+            options={
+                'verbose_name': 'APK Patch',
+                'verbose_name_plural': 'APK Patches',
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(fields=('from_version', 'to_version'), name='unique_apk_patch_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apk_updates', '0002_apkpatch'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='updatelog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apk_updates', '0003_updatelog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UpdateCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('action', models.CharField(choices=[('check', 'Update Check'), ('download', 'APK Download'), ('patch', 'Patch Download')], max_length=20)),
+                ('version', models.CharField(blank=True, max_length=20)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Update Counter',
+                'verbose_name_plural': 'Update Counters',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['action', 'day'], name='apk_updates_action_0d42f4_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'action', 'version'), name='unique_update_counter')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:31
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apk_updates', '0004_updatecounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='apkversion',
+            name='channel',
+            field=models.CharField(choices=[('stable', 'Stable'), ('beta', 'Beta')], default='stable', help_text='Release channel; beta devices also receive stable releases', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='apkversion',
+            name='rollout_percentage',
+            field=models.PositiveSmallIntegerField(default=100, help_text='Share of devices (by device id bucket) offered this version', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)]),
+        ),
+        migrations.AlterField(
+            model_name='apkversion',
+            name='is_latest',
+            field=models.BooleanField(default=False, help_text='Whether this is the latest version of its channel'),
+        ),
+    ]
@@ -1,10 +1,18 @@
 from django.db import models
-from django.core.validators import RegexValidator
+from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator
+from django.utils import timezone
 import os
 
 class APKVersion(models.Model):
     """Model to track APK versions and files"""
     
+    STABLE = 'stable'
+    BETA = 'beta'
+    CHANNEL_CHOICES = [
+        (STABLE, 'Stable'),
+        (BETA, 'Beta'),
+    ]
+    
     version = models.CharField(
         max_length=20,
         unique=True,
@@ -32,7 +40,20 @@ class APKVersion(models.Model):
     
     is_latest = models.BooleanField(
         default=False,
-        help_text="Whether this is the latest version"
+        help_text="Whether this is the latest version of its channel"
+    )
+    
+    channel = models.CharField(
+        max_length=10,
+        choices=CHANNEL_CHOICES,
+        default=STABLE,
+        help_text="Release channel; beta devices also receive stable releases"
+    )
+    
+    rollout_percentage = models.PositiveSmallIntegerField(
+        default=100,
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+        help_text="Share of devices (by device id bucket) offered this version"
     )
     
     force_update = models.BooleanField(
@@ -75,9 +96,9 @@ class APKVersion(models.Model):
         if self.apk_file and not self.file_size:
             self.file_size = self.apk_file.size
         
-        # If this is marked as latest, unmark others
+        # If this is marked as latest, unmark others in the same channel
         if self.is_latest:
-            APKVersion.objects.exclude(id=self.id).update(is_latest=False)
+            APKVersion.objects.filter(channel=self.channel).exclude(id=self.id).update(is_latest=False)
         
         super().save(*args, **kwargs)
     
@@ -87,11 +108,12 @@ class APKVersion(models.Model):
         if not self.file_size:
             return "Unknown"
         
+        size = float(self.file_size)
         for unit in ['B', 'KB', 'MB', 'GB']:
-            if self.file_size < 1024.0:
-                return f"{self.file_size:.1f} {unit}"
-            self.file_size /= 1024.0
-        return f"{self.file_size:.1f} TB"
+            if size < 1024.0:
+                return f"{size:.1f} {unit}"
+            size /= 1024.0
+        return f"{size:.1f} TB"
     
     @staticmethod
     def compare_versions(version1, version2):
@@ -118,6 +140,7 @@ class UpdateLog(models.Model):
     ACTION_CHOICES = [
         ('check', 'Update Check'),
         ('download', 'APK Download'),
+        ('patch', 'Patch Download'),
     ]
     
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
@@ -125,7 +148,8 @@ class UpdateLog(models.Model):
     ip_address = models.GenericIPAddressField()
     current_version = models.CharField(max_length=20, blank=True)
     target_version = models.CharField(max_length=20, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the request happens, not when a buffered row is flushed
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     
     class Meta:
         ordering = ['-timestamp']
@@ -134,3 +158,76 @@ class UpdateLog(models.Model):
     
     def __str__(self):
         return f"{self.action} - {self.ip_address} at {self.timestamp}"
+
+
+class APKPatch(models.Model):
+    """Binary delta (bsdiff) that turns one APK version into another"""
+    
+    from_version = models.ForeignKey(
+        APKVersion,
+        on_delete=models.CASCADE,
+        related_name='patches_from',
+        help_text="Version the client has installed"
+    )
+    
+    to_version = models.ForeignKey(
+        APKVersion,
+        on_delete=models.CASCADE,
+        related_name='patches',
+        help_text="Version the patch produces"
+    )
+    
+    patch_file = models.FileField(
+        upload_to='apk_patches/',
+        help_text="bsdiff patch file"
+    )
+    
+    patch_size = models.BigIntegerField(help_text="Patch size in bytes")
+    
+    checksum = models.CharField(
+        max_length=64,
+        help_text="SHA256 checksum of the patch file"
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "APK Patch"
+        verbose_name_plural = "APK Patches"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['from_version', 'to_version'],
+                name='unique_apk_patch_pair'
+            )
+        ]
+    
+    def __str__(self):
+        return f"Patch {self.from_version.version} -> {self.to_version.version}"
+
+
+class UpdateCounter(models.Model):
+    """Daily UpdateLog totals per action and version, maintained on log write"""
+    
+    day = models.DateField()
+    action = models.CharField(max_length=20, choices=UpdateLog.ACTION_CHOICES)
+    # target_version for downloads, current_version for update checks
+    version = models.CharField(max_length=20, blank=True)
+    count = models.BigIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-day']
+        verbose_name = "Update Counter"
+        verbose_name_plural = "Update Counters"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'action', 'version'],
+                name='unique_update_counter'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['action', 'day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.action} {self.version}: {self.count}"
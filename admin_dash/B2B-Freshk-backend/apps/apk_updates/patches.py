@@ -0,0 +1,143 @@
+"""
+Binary delta patches between APK versions.
+
+For every new APK we diff the previous N active versions against it with
+bsdiff, so clients on one of those versions download a small patch and
+rebuild the new APK locally (bspatch) instead of fetching the full file.
+
+bsdiff holds both APKs in memory and takes a while on large ones, so patches
+are built outside the web workers: by `upload_apk` and by the
+`generate_apk_patches` command (run it after admin API uploads or from cron).
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+from .models import APKVersion, APKPatch
+from .rollout import version_key
+
+logger = logging.getLogger(__name__)
+
+try:
+    import bsdiff4
+    BSDIFF_AVAILABLE = True
+except ImportError:
+    BSDIFF_AVAILABLE = False
+    logger.warning("bsdiff4 not available, APK patches disabled. Install with: pip install bsdiff4")
+
+
+def _file_checksum(path):
+    sha256_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256_hash.update(chunk)
+    return sha256_hash.hexdigest()
+
+
+def patch_sources(apk_version, count=None):
+    """The previous `count` active versions that should get a patch to apk_version"""
+    if count is None:
+        count = settings.APK_PATCH_PREVIOUS_VERSIONS
+    older = [
+        candidate for candidate in APKVersion.objects.filter(is_active=True).exclude(id=apk_version.id)
+        if candidate.apk_file
+        and APKVersion.compare_versions(candidate.version, apk_version.version) < 0
+    ]
+    # Version strings don't sort numerically in SQL, so order here
+    older.sort(key=lambda candidate: version_key(candidate.version), reverse=True)
+    return older[:count]
+
+
+def create_patch(from_version, to_version):
+    """
+    Diff two stored APKs and save the patch.
+    Returns the APKPatch, or None if the patch would not save any bandwidth.
+    """
+    new_path = to_version.apk_file.path
+    fd, patch_path = tempfile.mkstemp(suffix='.patch')
+    os.close(fd)
+    try:
+        bsdiff4.file_diff(from_version.apk_file.path, new_path, patch_path)
+        patch_size = os.path.getsize(patch_path)
+        if patch_size >= os.path.getsize(new_path):
+            logger.info(
+                f"Patch {from_version.version} -> {to_version.version} is not smaller "
+                f"than the APK, skipping"
+            )
+            return None
+
+        patch = APKPatch(
+            from_version=from_version,
+            to_version=to_version,
+            patch_size=patch_size,
+            checksum=_file_checksum(patch_path)
+        )
+        with open(patch_path, 'rb') as f:
+            patch.patch_file.save(
+                f'freshk-v{from_version.version}-to-v{to_version.version}.patch',
+                File(f),
+                save=True
+            )
+        return patch
+    finally:
+        os.remove(patch_path)
+
+
+def generate_patches(apk_version, count=None):
+    """Create the missing patches from the previous versions to apk_version"""
+    if not BSDIFF_AVAILABLE or not apk_version.apk_file:
+        return []
+
+    existing = set(apk_version.patches.values_list('from_version_id', flat=True))
+    created = []
+    for source in patch_sources(apk_version, count):
+        if source.id in existing:
+            continue
+        if not os.path.exists(source.apk_file.path):
+            logger.warning(f"APK file missing for version {source.version}, no patch generated")
+            continue
+        try:
+            patch = create_patch(source, apk_version)
+        except Exception as e:
+            logger.error(f"Failed to create patch {source.version} -> {apk_version.version}: {e}")
+            continue
+        if patch:
+            logger.info(
+                f"Created patch {source.version} -> {apk_version.version} "
+                f"({patch.patch_size} bytes)"
+            )
+            created.append(patch)
+    return created
+
+
+def delete_patches(apk_version):
+    """
+    Remove patches to and from apk_version and their files, e.g. after its file
+    was replaced or before it is deleted. Files go once the transaction commits.
+    """
+    stale = APKPatch.objects.filter(from_version=apk_version) | APKPatch.objects.filter(to_version=apk_version)
+    files = [patch.patch_file for patch in stale if patch.patch_file]
+    stale.delete()
+
+    def remove_files():
+        for patch_file in files:
+            try:
+                patch_file.storage.delete(patch_file.name)
+            except Exception as e:
+                logger.warning(f"Could not delete patch file {patch_file.name}: {e}")
+
+    transaction.on_commit(remove_files)
+
+
+def patch_queryset(current_version, latest_version_obj):
+    """Patch from the client's installed version to the latest one (.first()/.afirst())"""
+    return APKPatch.objects.filter(
+        from_version__version=current_version,
+        to_version=latest_version_obj
+    )
@@ -0,0 +1,81 @@
+"""
+Release channels and staged rollouts.
+
+Each channel has its own latest version. A version with rollout_percentage < 100
+is only offered to devices whose bucket (a hash of the client-supplied device id
+and the version) falls below the percentage; everyone else gets the newest
+earlier version of the channel they are eligible for. Buckets are stable, so
+raising the percentage only ever adds devices.
+"""
+
+import hashlib
+
+from .models import APKVersion
+
+# Channels whose releases a client on the given channel may receive
+CHANNEL_AUDIENCE = {
+    APKVersion.STABLE: (APKVersion.STABLE,),
+    APKVersion.BETA: (APKVersion.BETA, APKVersion.STABLE),
+}
+
+
+def normalize_channel(channel):
+    return channel if channel in CHANNEL_AUDIENCE else APKVersion.STABLE
+
+
+def version_key(version):
+    return [int(part) for part in version.split('.')]
+
+
+def device_bucket(device_id, version):
+    """Deterministic bucket in [0, 100) for a device and version"""
+    digest = hashlib.sha256(f'{version}:{device_id}'.encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % 100
+
+
+def in_rollout(apk_version, device_id):
+    """Whether the device is offered apk_version"""
+    if apk_version.rollout_percentage >= 100:
+        return True
+    if not device_id:
+        # Clients that don't send a device id only get fully rolled out versions
+        return False
+    return device_bucket(device_id, apk_version.version) < apk_version.rollout_percentage
+
+
+def build_release_chains(versions):
+    """
+    Per channel, the active versions up to and including the channel's latest,
+    newest first. versions is an iterable of active APKVersion objects.
+    """
+    by_channel = {}
+    for apk_version in versions:
+        by_channel.setdefault(apk_version.channel, []).append(apk_version)
+
+    chains = {}
+    for channel, channel_versions in by_channel.items():
+        latest = next((v for v in channel_versions if v.is_latest), None)
+        if latest is None:
+            continue
+        chains[channel] = sorted(
+            (
+                v for v in channel_versions
+                if version_key(v.version) <= version_key(latest.version)
+            ),
+            key=lambda v: version_key(v.version),
+            reverse=True
+        )
+    return chains
+
+
+def resolve_version(chains, channel, device_id):
+    """The newest version the device is eligible for on its channel, or None"""
+    best = None
+    for audience in CHANNEL_AUDIENCE[normalize_channel(channel)]:
+        candidate = next(
+            (v for v in chains.get(audience, []) if in_rollout(v, device_id)),
+            None
+        )
+        if candidate and (best is None or version_key(candidate.version) > version_key(best.version)):
+            best = candidate
+    return best
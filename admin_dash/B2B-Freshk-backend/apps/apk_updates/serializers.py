@@ -12,6 +12,9 @@ class UpdateCheckSerializer(serializers.Serializer):
     formatted_size = serializers.CharField()
     force_update = serializers.BooleanField()
     checksum = serializers.CharField(required=False)
+    patch_url = serializers.URLField(required=False)
+    patch_size = serializers.IntegerField(required=False)
+    patch_checksum = serializers.CharField(required=False)
 
 class APKVersionSerializer(serializers.ModelSerializer):
     """Serializer for APK version information"""
@@ -22,7 +25,7 @@ class APKVersionSerializer(serializers.ModelSerializer):
         model = APKVersion
         fields = [
             'id', 'version', 'release_notes', 'is_active', 
-            'is_latest', 'force_update', 'file_size', 
+            'is_latest', 'channel', 'rollout_percentage', 'force_update', 'file_size', 
             'formatted_size', 'checksum', 'created_at', 'download_url'
         ]
         read_only_fields = ['id', 'file_size', 'checksum', 'created_at']
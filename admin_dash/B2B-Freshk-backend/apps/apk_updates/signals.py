@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .models import APKVersion, APKPatch
+from .patches import delete_patches
+from .update_cache import update_check_cache
+
+@receiver(post_save, sender=APKVersion)
+@receiver(post_delete, sender=APKVersion)
+@receiver(post_save, sender=APKPatch)
+@receiver(post_delete, sender=APKPatch)
+def invalidate_update_check_cache(sender, **kwargs):
+    """Drop cached update-check responses when versions or patches change"""
+    update_check_cache.invalidate()
+
+
+@receiver(pre_delete, sender=APKVersion)
+def delete_version_patches(sender, instance, **kwargs):
+    """Patches would cascade with the version but leave their files behind"""
+    delete_patches(instance)
@@ -0,0 +1,35 @@
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.apk_updates.counters import rebuild_counters, write_update_logs
+from apps.apk_updates.models import UpdateCounter, UpdateLog
+
+
+def log(action, current='1.0.0', target='1.1.0'):
+    return UpdateLog(action=action, ip_address='10.0.3.1', current_version=current, target_version=target)
+
+
+class UpdateCounterTests(TestCase):
+
+    def counts(self):
+        return {
+            (row.action, row.version): row.count
+            for row in UpdateCounter.objects.filter(day=timezone.localdate())
+        }
+
+    def test_writes_increment_counters(self):
+        write_update_logs([log('check'), log('check'), log('download')])
+        write_update_logs([log('check', current='1.1.0')])
+        self.assertEqual(self.counts(), {('check', '1.0.0'): 2, ('download', '1.1.0'): 1, ('check', '1.1.0'): 1})
+
+    def test_rebuild_matches_the_log(self):
+        write_update_logs([log('check'), log('download'), log('download')])
+        UpdateCounter.objects.update(count=99)
+        UpdateCounter.objects.create(day=timezone.localdate(), action='check', version='0.9.0', count=5)
+
+        self.assertEqual(rebuild_counters(), 2)
+        self.assertEqual(self.counts(), {('check', '1.0.0'): 1, ('download', '1.1.0'): 2})
+
+        # Increments after a rebuild add to the rebuilt rows
+        write_update_logs([log('check')])
+        self.assertEqual(self.counts()[('check', '1.0.0')], 2)
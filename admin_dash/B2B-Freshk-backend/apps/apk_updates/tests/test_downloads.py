@@ -0,0 +1,127 @@
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from apps.apk_updates.downloads import parse_byte_range, serve_apk
+from apps.apk_updates.models import APKVersion
+
+CONTENT = bytes(range(256)) * 4
+CHECKSUM = 'a' * 64
+ETAG = f'"{CHECKSUM}"'
+
+
+class ParseByteRangeTests(SimpleTestCase):
+
+    def test_ranges(self):
+        cases = [
+            (None, None),
+            ('', None),
+            ('bytes=0-99', (0, 99)),
+            ('bytes=100-', (100, 1023)),
+            ('bytes=1000-5000', (1000, 1023)),
+            ('bytes=-24', (1000, 1023)),
+            ('bytes=-5000', (0, 1023)),
+            ('bytes=1023-1023', (1023, 1023)),
+            ('bytes=1024-', 'unsatisfiable'),
+            ('bytes=10-5', 'unsatisfiable'),
+            ('bytes=-0', 'unsatisfiable'),
+            # Ignored: the whole file is sent
+            ('bytes=-', None),
+            ('bytes=0-10,20-30', None),
+            ('items=0-10', None),
+            ('bytes=a-b', None),
+        ]
+        for header, expected in cases:
+            self.assertEqual(parse_byte_range(header, 1024), expected, header)
+
+
+@override_settings(APK_DOWNLOAD_OFFLOAD='')
+class ServeFileTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.apk_version = APKVersion(version='1.0.0', file_size=len(CONTENT), checksum=CHECKSUM)
+        self.apk_version.apk_file.save('freshk-v1.0.0.apk', ContentFile(CONTENT), save=False)
+        self.apk_version.save()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def serve(self, method='get', **headers):
+        request = getattr(RequestFactory(), method)('/api/apk/download/1.0.0/', **headers)
+        response, is_new = serve_apk(request, self.apk_version, 'freshk.apk')
+        # Closes the file of unread responses
+        self.addCleanup(response.close)
+        return response, is_new
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file(self):
+        response, is_new = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), CONTENT)
+        self.assertEqual((response['ETag'], response['Accept-Ranges']), (ETAG, 'bytes'))
+        self.assertTrue(is_new)
+
+    def test_range(self):
+        response, is_new = self.serve(HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), CONTENT[100:200])
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1024')
+        self.assertEqual(response['Content-Length'], '100')
+        # Resuming isn't a new download
+        self.assertFalse(is_new)
+
+    def test_suffix_range(self):
+        response, _ = self.serve(HTTP_RANGE='bytes=-24')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), CONTENT[-24:])
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+
+    def test_unsatisfiable_range(self):
+        response, is_new = self.serve(HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+        self.assertFalse(is_new)
+
+    def test_if_range_with_current_etag_allows_a_partial_response(self):
+        response, _ = self.serve(HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE=ETAG)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), CONTENT[10:20])
+
+    def test_if_range_mismatch_sends_the_whole_file(self):
+        for validator in ('"' + 'b' * 64 + '"', f'W/{ETAG}', 'Mon, 01 Jan 2001 00:00:00 GMT'):
+            response, is_new = self.serve(HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE=validator)
+            self.assertEqual(response.status_code, 200, validator)
+            self.assertEqual(self.body(response), CONTENT)
+            self.assertTrue(is_new)
+
+    def test_if_none_match(self):
+        response, is_new = self.serve(HTTP_IF_NONE_MATCH=ETAG)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(is_new)
+
+    def test_head_is_not_a_download(self):
+        response, is_new = self.serve(method='head')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(is_new)
+
+    @override_settings(APK_DOWNLOAD_OFFLOAD='nginx', APK_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_nginx_offload(self):
+        response, is_new = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.apk_version.apk_file.name}')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], ETAG)
+        self.assertTrue(is_new)
+
+        # nginx applies the range itself
+        response, is_new = self.serve(HTTP_RANGE='bytes=100-')
+        self.assertIn('X-Accel-Redirect', response)
+        self.assertFalse(is_new)
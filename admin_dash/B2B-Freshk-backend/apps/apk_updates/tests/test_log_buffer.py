@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.test import RequestFactory, TestCase
+
+from apps.apk_updates import log_buffer
+from apps.apk_updates.log_buffer import UpdateLogBuffer
+from apps.apk_updates.models import UpdateCounter, UpdateLog
+from apps.apk_updates.views import update_log_fields
+
+
+class UpdateLogBufferTests(TestCase):
+
+    def buffer(self):
+        buffer = UpdateLogBuffer()
+        # Flushed by the test, not by a thread
+        buffer._ensure_thread = lambda: None
+        return buffer
+
+    def check(self, version='1.0.0', **fields):
+        return {
+            'action': 'check', 'user_agent': 'okhttp', 'ip_address': '10.0.3.1',
+            'current_version': version, 'target_version': '', **fields
+        }
+
+    def test_flush_writes_rows_and_counters(self):
+        buffer = self.buffer()
+        for _ in range(3):
+            buffer.add(**self.check())
+        buffer.add(**self.check('1.1.0'))
+
+        self.assertEqual(UpdateLog.objects.count(), 0)
+        self.assertEqual(buffer.flush(), 4)
+        self.assertEqual(UpdateLog.objects.count(), 4)
+        self.assertEqual(
+            dict(UpdateCounter.objects.values_list('version', 'count')), {'1.0.0': 3, '1.1.0': 1}
+        )
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_failed_batch_is_retried_row_by_row(self):
+        buffer = self.buffer()
+        buffer.add(**self.check())
+        buffer.add(**self.check(action=None))
+        buffer.add(**self.check('1.1.0'))
+
+        with self.assertLogs('apps.apk_updates.log_buffer', level='WARNING') as logs:
+            self.assertEqual(buffer.flush(), 2)
+
+        self.assertEqual(sorted(UpdateLog.objects.values_list('current_version', flat=True)), ['1.0.0', '1.1.0'])
+        self.assertEqual(len([line for line in logs.output if line.startswith('ERROR')]), 1)
+
+    def test_overflow_drops_oldest_and_warns_once(self):
+        with mock.patch.object(log_buffer, 'MAX_PENDING', 3):
+            buffer = self.buffer()
+            with self.assertLogs('apps.apk_updates.log_buffer', level='WARNING') as logs:
+                for i in range(6):
+                    buffer.add(**self.check(f'1.0.{i}'))
+                buffer.flush()
+
+        self.assertEqual(
+            sorted(UpdateLog.objects.values_list('current_version', flat=True)), ['1.0.3', '1.0.4', '1.0.5']
+        )
+        self.assertEqual(logs.output, [
+            'WARNING:apps.apk_updates.log_buffer:UpdateLog buffer full, dropping oldest entries',
+            'WARNING:apps.apk_updates.log_buffer:UpdateLog buffer was full, dropped 3 log entries',
+        ])
+
+
+class UpdateLogFieldsTests(TestCase):
+
+    def test_client_values_fit_their_columns(self):
+        request = RequestFactory().get(
+            '/api/apk/check-update/', HTTP_X_FORWARDED_FOR='not-an-ip, 10.0.0.1', REMOTE_ADDR='10.0.3.2'
+        )
+
+        fields = update_log_fields(request, 'check', current_version='1.0.0-' + 'x' * 100)
+
+        self.assertEqual(fields['ip_address'], '10.0.3.2')
+        self.assertEqual(len(fields['current_version']), 20)
+        UpdateLog.objects.create(**fields).full_clean()
+
+    def test_forwarded_address_is_used_when_valid(self):
+        request = RequestFactory().get('/', HTTP_X_FORWARDED_FOR=' 203.0.113.7 , 10.0.0.1')
+        self.assertEqual(update_log_fields(request, 'check')['ip_address'], '203.0.113.7')
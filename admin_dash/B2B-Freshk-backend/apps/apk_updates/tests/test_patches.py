@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from apps.apk_updates.models import APKPatch, APKVersion
+from apps.apk_updates.patches import generate_patches, patch_sources
+
+
+class APKPatchTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        content = bytes(range(256)) * 2000
+        self.old = self.version('1.0.0', content)
+        self.new = self.version('1.1.0', content[:1000] + b'changed' + content[1000:])
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def version(self, number, content):
+        apk_version = APKVersion(version=number, file_size=len(content), checksum='0' * 64)
+        apk_version.apk_file.save(f'freshk-v{number}.apk', ContentFile(content), save=False)
+        apk_version.save()
+        return apk_version
+
+    def test_generates_missing_patches_once(self):
+        [patch] = generate_patches(self.new)
+        self.assertEqual(patch.from_version, self.old)
+        self.assertLess(patch.patch_size, self.new.file_size)
+        self.assertEqual(generate_patches(self.new), [])
+
+    def test_sources_are_the_newest_previous_versions(self):
+        for number in ('1.9.0', '1.10.0'):
+            self.version(number, b'apk ' + number.encode())
+        target = self.version('1.11.0', b'apk 1.11.0')
+
+        sources = patch_sources(target, count=3)
+
+        self.assertEqual([source.version for source in sources], ['1.10.0', '1.9.0', '1.1.0'])
+
+    def test_deleting_a_version_removes_its_patch_files(self):
+        [patch] = generate_patches(self.new)
+        path = patch.patch_file.path
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.old.delete()
+
+        self.assertFalse(APKPatch.objects.exists())
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,44 @@
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.apk_updates import async_views
+from freshk.throttling import reset_buckets
+
+
+def rates(**scopes):
+    """REST_FRAMEWORK settings with some throttle rates replaced"""
+    throttle_rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **scopes}
+    return {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': throttle_rates}
+
+
+class CodeAndUpdateCheckThrottlingTests(TestCase):
+
+    def setUp(self):
+        reset_buckets()
+
+    @override_settings(REST_FRAMEWORK=rates(apk_check='2/hour'))
+    def test_async_update_check_is_throttled(self):
+        factory = AsyncRequestFactory()
+
+        def check():
+            request = factory.get('/api/apk/check-update/', {'version': '1.0.0'})
+            request.user = AnonymousUser()
+            return async_to_sync(async_views.check_update)(request)
+
+        self.assertEqual(check().status_code, 200)
+        self.assertEqual(check().status_code, 200)
+        response = check()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    @override_settings(REST_FRAMEWORK=rates(otp_verify='2/hour'))
+    def test_phone_auth_verify_is_throttled(self):
+        client = APIClient()
+        payload = {'phone_number': '+21620000003', 'otp': '123456'}
+
+        self.assertEqual(client.post('/api/mobile/auth/verify/', payload, format='json').status_code, 400)
+        self.assertEqual(client.post('/api/mobile/auth/verify/', payload, format='json').status_code, 400)
+        self.assertEqual(client.post('/api/mobile/auth/verify/', payload, format='json').status_code, 429)
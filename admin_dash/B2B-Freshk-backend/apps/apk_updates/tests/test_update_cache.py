@@ -0,0 +1,69 @@
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, TestCase, override_settings
+
+from apps.apk_updates.models import APKVersion
+from apps.apk_updates.update_cache import MISS, update_check_cache
+
+
+class UpdateCheckCacheTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, ALLOWED_HOSTS=['updates.example.com'])
+        self.settings_override.enable()
+        update_check_cache.invalidate()
+        self.latest = self.version('1.1.0')
+        self.request = RequestFactory(HTTP_HOST='updates.example.com').get(
+            '/api/apk/check-update/', {'version': '1.0.0'}
+        )
+
+    def tearDown(self):
+        update_check_cache.invalidate()
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def version(self, number):
+        apk_version = APKVersion(
+            version=number, file_size=4, checksum='0' * 64, is_active=True, is_latest=True,
+            release_notes=f'Version {number}'
+        )
+        apk_version.apk_file.save(f'freshk-v{number}.apk', ContentFile(b'data'), save=False)
+        apk_version.save()
+        return apk_version
+
+    def lookup(self, current_version='1.0.0'):
+        return update_check_cache.lookup(self.request, current_version, APKVersion.STABLE, 'device-1')
+
+    def load(self, current_version='1.0.0'):
+        return update_check_cache.load(self.request, current_version, APKVersion.STABLE, 'device-1')
+
+    def test_payload_is_served_from_memory_once_loaded(self):
+        self.assertIs(self.lookup(), MISS)
+        payload = self.load()
+        self.assertEqual(payload['latest_version'], '1.1.0')
+        self.assertTrue(payload['update_available'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.lookup(), payload)
+        # Other versions share the chain but have payloads of their own
+        self.assertIs(self.lookup('0.9.0'), MISS)
+
+    def test_saving_a_version_clears_the_cache(self):
+        self.load()
+        self.version('1.2.0')
+
+        self.assertIs(self.lookup(), MISS)
+        self.assertEqual(self.load()['latest_version'], '1.2.0')
+
+    @override_settings(APK_UPDATE_CACHE_TTL=-1)
+    def test_entries_expire(self):
+        self.load()
+        self.assertIs(self.lookup(), MISS)
+
+    def test_no_published_version(self):
+        APKVersion.objects.all().delete()
+        self.assertIsNone(self.load())
+        self.assertIsNone(self.lookup())
@@ -0,0 +1,96 @@
+"""
+Process-level cache for update checks.
+
+The release chain of every channel (see rollout.py) and the check-update body
+for each (current_version, resolved version) pair are loaded once and then
+served from memory; resolving a device to a version is a hash, not a query. Saving or deleting an APKVersion or
+APKPatch clears the cache in the process that made the change (see signals.py);
+other worker processes pick the change up within APK_UPDATE_CACHE_TTL seconds.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .models import APKVersion
+from .patches import patch_queryset
+from .rollout import build_release_chains, resolve_version
+from .serializers import UpdateCheckSerializer
+
+logger = logging.getLogger(__name__)
+
+# Update checks carry arbitrary client-supplied versions; cap the entries
+MAX_PAYLOADS = 512
+
+MISS = object()
+
+
+class UpdateCheckCache:
+    """Per-channel release chains plus precomputed check-update payloads, per process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chains = MISS
+        self._payloads = {}
+        self._loaded_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._chains = MISS
+            self._payloads = {}
+            self._loaded_at = 0.0
+
+    def _expired(self):
+        return time.monotonic() - self._loaded_at > settings.APK_UPDATE_CACHE_TTL
+
+    def lookup(self, request, current_version, channel, device_id):
+        """Cached payload, None if nothing is published for the device, or MISS"""
+        chains = self._chains
+        if chains is MISS or self._expired():
+            return MISS
+        target = resolve_version(chains, channel, device_id)
+        if target is None:
+            return None
+        return self._payloads.get(_payload_key(request, current_version, target), MISS)
+
+    def load(self, request, current_version, channel, device_id):
+        """Resolve the payload from the database and remember it"""
+        # Imported here: views imports this module
+        from .views import build_update_payload
+
+        chains = self._chains
+        if chains is MISS or self._expired():
+            chains = build_release_chains(APKVersion.objects.filter(is_active=True))
+            with self._lock:
+                self._chains = chains
+                self._payloads = {}
+                self._loaded_at = time.monotonic()
+
+        target = resolve_version(chains, channel, device_id)
+        if target is None:
+            return None
+
+        patch = patch_queryset(current_version, target).first()
+        payload = build_update_payload(request, current_version, target, patch)
+        serializer = UpdateCheckSerializer(data=payload)
+        if serializer.is_valid():
+            payload = serializer.data
+        else:
+            # Return raw data if serializer fails
+            logger.error(f"Serializer errors: {serializer.errors}")
+
+        with self._lock:
+            # Skip if the cache was invalidated while we were building
+            if self._chains is chains and len(self._payloads) < MAX_PAYLOADS:
+                self._payloads[_payload_key(request, current_version, target)] = payload
+        return payload
+
+
+update_check_cache = UpdateCheckCache()
+
+
+def _payload_key(request, current_version, target):
+    # Payloads contain absolute URLs, so they depend on the host as well
+    return (request.scheme, request.get_host(), current_version, target.id)
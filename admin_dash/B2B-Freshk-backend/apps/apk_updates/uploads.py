@@ -0,0 +1,66 @@
+"""
+Single-pass APK ingestion: the SHA-256 checksum and size are computed while the
+bytes are being written, instead of reading the file again afterwards.
+"""
+
+import hashlib
+
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+# Large reads keep the per-chunk overhead low without holding the file in memory
+CHUNK_SIZE = 1024 * 1024
+
+
+class ChecksumUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream uploads straight to a temporary file (even small ones) and hash them
+    on the way. The resulting file has a `sha256` attribute, and storage moves
+    the temporary file into place without reading it again.
+    """
+
+    chunk_size = CHUNK_SIZE
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.sha256 = self.sha256.hexdigest()
+        return uploaded_file
+
+
+class ChecksumFile(File):
+    """File wrapper that hashes the bytes as storage copies them in large chunks"""
+
+    def __init__(self, file, name=None):
+        super().__init__(file, name)
+        self._sha256 = hashlib.sha256()
+        self.bytes_read = 0
+
+    def chunks(self, chunk_size=None):
+        for chunk in super().chunks(chunk_size or CHUNK_SIZE):
+            self._sha256.update(chunk)
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+
+def uploaded_file_checksum(uploaded_file):
+    """SHA-256 of an uploaded file, reusing the one computed while it streamed in"""
+    checksum = getattr(uploaded_file, 'sha256', None)
+    if checksum:
+        return checksum
+    sha256_hash = hashlib.sha256()
+    for chunk in uploaded_file.chunks(CHUNK_SIZE):
+        sha256_hash.update(chunk)
+    uploaded_file.seek(0)
+    return sha256_hash.hexdigest()
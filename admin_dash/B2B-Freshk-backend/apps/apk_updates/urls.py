@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, async_views
 
 # Router for ViewSets
 router = DefaultRouter()
@@ -8,9 +9,14 @@ router.register(r'versions', views.APKVersionViewSet)
 
 urlpatterns = [
     # Main API endpoints
-    path('check-update/', views.check_update, name='apk-check-update'),
+    path(
+        'check-update/',
+        async_views.check_update if settings.ASYNC_READ_VIEWS else views.check_update,
+        name='apk-check-update'
+    ),
     path('download/<str:version>/', views.download_apk, name='apk-download-version'),
     path('download/', views.download_apk, name='apk-download-latest'),
+    path('patch/<str:from_version>/<str:to_version>/', views.download_patch, name='apk-download-patch'),
     
     # ViewSet endpoints (for admin/management)
     path('', include(router.urls)),
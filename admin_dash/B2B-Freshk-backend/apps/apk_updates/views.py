@@ -1,50 +1,128 @@
-from django.http import JsonResponse, FileResponse, Http404
+from django.http import JsonResponse, Http404
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.conf import settings
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from django.db import ProgrammingError, OperationalError
+from django.db.models import Sum
 import os
 import hashlib
+import ipaddress
 import logging
 
-from .models import APKVersion, UpdateLog
+from .models import APKVersion, APKPatch, UpdateLog, UpdateCounter
 from .serializers import UpdateCheckSerializer, APKVersionSerializer
+from .downloads import serve_apk, serve_file, PATCH_CONTENT_TYPE
+from .log_buffer import update_log_buffer
+from .counters import write_update_logs
+from .update_cache import update_check_cache, MISS
 from apps.users.permissions import IsAdmin
+from freshk.throttling import TokenBucketThrottle
 
 logger = logging.getLogger(__name__)
 
+class UpdateCheckThrottle(TokenBucketThrottle):
+    """Update checks, per user or IP"""
+    scope = 'apk_check'
+
+class APKDownloadThrottle(TokenBucketThrottle):
+    """APK and patch downloads, per user or IP"""
+    scope = 'apk_download'
+
 def get_client_ip(request):
-    """Get client IP address from request"""
+    """Get client IP address from request (REMOTE_ADDR if X-Forwarded-For isn't an address)"""
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
     if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+        ip = x_forwarded_for.split(',')[0].strip()
+        try:
+            return str(ipaddress.ip_address(ip))
+        except ValueError:
+            pass
+    return request.META.get('REMOTE_ADDR')
+
+def update_log_fields(request, action, current_version=None, target_version=None):
+    """
+    UpdateLog fields for a request. Versions come from the client, so they are
+    cut to their column length; buffered rows are inserted in batches and one
+    bad value would fail the whole batch.
+    """
+    version_length = UpdateLog._meta.get_field('current_version').max_length
+    return dict(
+        action=action,
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+        ip_address=get_client_ip(request),
+        current_version=(current_version or '')[:version_length],
+        target_version=(target_version or '')[:version_length]
+    )
 
 def log_update_action(request, action, current_version=None, target_version=None):
     """Log update check or download action"""
+    fields = update_log_fields(request, action, current_version, target_version)
+    if settings.APK_UPDATE_LOG_BUFFERED:
+        # Written in bulk by a background thread
+        update_log_buffer.add(**fields)
+        return
     try:
-        UpdateLog.objects.create(
-            action=action,
-            user_agent=request.META.get('HTTP_USER_AGENT', ''),
-            ip_address=get_client_ip(request),
-            current_version=current_version or '',
-            target_version=target_version or ''
-        )
+        write_update_logs([UpdateLog(**fields)])
     except (ProgrammingError, OperationalError) as e:
         logger.warning(f"UpdateLog table not available, skipping log: {e}")
     except Exception as e:
         logger.error(f"Failed to log update action: {e}")
 
+def build_update_payload(request, current_version, latest_version_obj, patch=None):
+    """
+    Build the check-update response body for a client on current_version.
+    patch is the APKPatch from current_version to the latest version, if any.
+    """
+    latest_version = latest_version_obj.version
+    
+    # Compare versions
+    version_comparison = APKVersion.compare_versions(current_version, latest_version)
+    update_available = version_comparison < 0  # current_version < latest_version
+    
+    # Check if current version is supported
+    min_supported = latest_version_obj.minimum_supported_version
+    if min_supported and APKVersion.compare_versions(current_version, min_supported) < 0:
+        # Current version is too old
+        force_update = True
+    else:
+        force_update = latest_version_obj.force_update and update_available
+    
+    # Build download URL
+    download_url = request.build_absolute_uri(
+        f'/api/apk/download/{latest_version}/'
+    )
+    
+    payload = {
+        'update_available': update_available,
+        'latest_version': latest_version,
+        'current_version': current_version,
+        'download_url': download_url,
+        'release_notes': latest_version_obj.release_notes,
+        'apk_size': latest_version_obj.file_size or 0,
+        'formatted_size': latest_version_obj.formatted_size,
+        'force_update': force_update,
+        'checksum': latest_version_obj.checksum or ''
+    }
+    
+    # Clients with a patch can download the delta and bspatch it locally
+    if patch and update_available:
+        payload['patch_url'] = request.build_absolute_uri(
+            f'/api/apk/patch/{current_version}/{latest_version}/'
+        )
+        payload['patch_size'] = patch.patch_size
+        payload['patch_checksum'] = patch.checksum
+    
+    return payload
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@throttle_classes([UpdateCheckThrottle])
 def check_update(request):
     """
     Check if an update is available for the mobile app
@@ -52,6 +130,8 @@ def check_update(request):
     Query Parameters:
     - version: Current app version (required)
     - platform: Platform (android/ios) - optional
+    - channel: Release channel (stable/beta) - optional, defaults to stable
+    - device_id: Stable per-install id used for staged rollouts - optional
     
     Returns:
     - update_available: boolean
@@ -64,6 +144,8 @@ def check_update(request):
     """
     current_version = request.GET.get('version')
     platform = request.GET.get('platform', 'android')
+    channel = request.GET.get('channel', APKVersion.STABLE)
+    device_id = request.GET.get('device_id', '')
     
     if not current_version:
         return Response({
@@ -74,13 +156,12 @@ def check_update(request):
     log_update_action(request, 'check', current_version=current_version)
     
     try:
-        # Get the latest active version
-        latest_version_obj = APKVersion.objects.filter(
-            is_active=True,
-            is_latest=True
-        ).first()
+        # Release chains and payloads are resolved once per process
+        response_data = update_check_cache.lookup(request, current_version, channel, device_id)
+        if response_data is MISS:
+            response_data = update_check_cache.load(request, current_version, channel, device_id)
         
-        if not latest_version_obj:
+        if response_data is None:
             # No versions available
             return Response({
                 'update_available': False,
@@ -88,43 +169,7 @@ def check_update(request):
                 'message': 'No updates available'
             })
         
-        latest_version = latest_version_obj.version
-        
-        # Compare versions
-        version_comparison = APKVersion.compare_versions(current_version, latest_version)
-        update_available = version_comparison < 0  # current_version < latest_version
-        
-        # Check if current version is supported
-        min_supported = latest_version_obj.minimum_supported_version
-        if min_supported and APKVersion.compare_versions(current_version, min_supported) < 0:
-            # Current version is too old
-            force_update = True
-        else:
-            force_update = latest_version_obj.force_update and update_available
-        
-        # Build download URL
-        download_url = request.build_absolute_uri(
-            f'/api/apk/download/{latest_version}/'
-        )
-        
-        response_data = {
-            'update_available': update_available,
-            'latest_version': latest_version,
-            'current_version': current_version,
-            'download_url': download_url,
-            'release_notes': latest_version_obj.release_notes,
-            'apk_size': latest_version_obj.file_size or 0,
-            'formatted_size': latest_version_obj.formatted_size,
-            'force_update': force_update,
-            'checksum': latest_version_obj.checksum or ''
-        }
-        
-        serializer = UpdateCheckSerializer(data=response_data)
-        if serializer.is_valid():
-            return Response(serializer.data)
-        else:
-            logger.error(f"Serializer errors: {serializer.errors}")
-            return Response(response_data)  # Return raw data if serializer fails
+        return Response(response_data)
             
     except Exception as e:
         logger.error(f"Error checking for updates: {e}")
@@ -134,8 +179,9 @@ def check_update(request):
             'latest_version': current_version
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-@api_view(['GET'])
+@api_view(['GET', 'HEAD'])
 @permission_classes([AllowAny])
+@throttle_classes([APKDownloadThrottle])
 def download_apk(request, version=None):
     """
     Download APK file for specified version
@@ -152,37 +198,32 @@ def download_apk(request, version=None):
             # Download latest version
             apk_version = APKVersion.objects.filter(
                 is_active=True,
-                is_latest=True
+                is_latest=True,
+                channel=APKVersion.STABLE
             ).first()
         
         if not apk_version:
             raise Http404("APK version not found or not available")
         
-        # Log the download
-        log_update_action(
-            request, 
-            'download', 
-            target_version=apk_version.version
-        )
-        
         # Check if file exists
         if not apk_version.apk_file or not os.path.exists(apk_version.apk_file.path):
             logger.error(f"APK file not found for version {apk_version.version}")
             raise Http404("APK file not found on server")
         
-        # Serve the file
-        response = FileResponse(
-            open(apk_version.apk_file.path, 'rb'),
-            as_attachment=True,
+        # Serve the file (supports Range/If-Range, ETag and proxy offload)
+        response, is_new_download = serve_apk(
+            request,
+            apk_version,
             filename=f"freshk-v{apk_version.version}.apk"
         )
         
-        # Add headers
-        response['Content-Type'] = 'application/vnd.android.package-archive'
-        response['Content-Length'] = apk_version.file_size
-        
-        if apk_version.checksum:
-            response['X-Checksum-SHA256'] = apk_version.checksum
+        # Log the download once, not for every resumed chunk
+        if is_new_download:
+            log_update_action(
+                request, 
+                'download', 
+                target_version=apk_version.version
+            )
         
         return response
         
@@ -194,6 +235,51 @@ def download_apk(request, version=None):
             'error': 'Failed to download APK file'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET', 'HEAD'])
+@permission_classes([AllowAny])
+@throttle_classes([APKDownloadThrottle])
+def download_patch(request, from_version, to_version):
+    """
+    Download the bsdiff patch that turns from_version into to_version.
+    The client verifies patch_checksum, applies it with bspatch and then checks
+    the result against the APK checksum.
+    """
+    try:
+        patch = APKPatch.objects.select_related('to_version').filter(
+            from_version__version=from_version,
+            to_version__version=to_version,
+            to_version__is_active=True
+        ).first()
+        
+        if not patch or not os.path.exists(patch.patch_file.path):
+            raise Http404("Patch not available")
+        
+        response, is_new_download = serve_file(
+            request,
+            patch.patch_file,
+            patch.checksum,
+            f"freshk-v{from_version}-to-v{to_version}.patch",
+            PATCH_CONTENT_TYPE
+        )
+        
+        if is_new_download:
+            log_update_action(
+                request,
+                'patch',
+                current_version=from_version,
+                target_version=to_version
+            )
+        
+        return response
+        
+    except Http404:
+        raise
+    except Exception as e:
+        logger.error(f"Error downloading APK patch: {e}")
+        return Response({
+            'error': 'Failed to download patch file'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.core.files.uploadedfile import InMemoryUploadedFile
 import hashlib
@@ -215,7 +301,7 @@ class APKVersionViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def latest(self, request):
         """Get the latest active APK version"""
-        latest = APKVersion.objects.filter(is_active=True, is_latest=True).first()
+        latest = APKVersion.objects.filter(is_active=True, is_latest=True, channel=APKVersion.STABLE).first()
         if latest:
             return Response(APKVersionSerializer(latest).data)
         return Response({"error": "No active APK version found"}, status=404)
@@ -229,7 +315,7 @@ class APKVersionViewSet(viewsets.ReadOnlyModelViewSet):
         
         try:
             current_version_obj = APKVersion.objects.get(version=current_version)
-            latest = APKVersion.objects.filter(is_active=True, is_latest=True).first()
+            latest = APKVersion.objects.filter(is_active=True, is_latest=True, channel=APKVersion.STABLE).first()
             
             if latest and latest.id != current_version_obj.id:
                 return Response({
@@ -250,10 +336,18 @@ class APKVersionViewSet(viewsets.ReadOnlyModelViewSet):
         """Get APK download statistics - Admin only"""
         self.permission_classes = [IsAdmin]  # Override to admin-only
         
+        active_versions = APKVersion.objects.filter(is_active=True)
+        
+        # Downloads come from the daily counters, not the log table
+        total_downloads = UpdateCounter.objects.filter(
+            action='download',
+            version__in=active_versions.values('version')
+        ).aggregate(total=Sum('count'))['total'] or 0
+        
         return Response({
-            'total_versions': APKVersion.objects.filter(is_active=True).count(),
-            'total_downloads': sum(apk.download_count for apk in APKVersion.objects.filter(is_active=True)),
-            'latest_version': APKVersion.objects.filter(is_active=True, is_latest=True).first().version if APKVersion.objects.filter(is_active=True, is_latest=True).exists() else None
+            'total_versions': active_versions.count(),
+            'total_downloads': total_downloads,
+            'latest_version': active_versions.filter(is_latest=True, channel=APKVersion.STABLE).values_list('version', flat=True).first()
         })
     
     @action(detail=True, methods=['get'])
@@ -262,11 +356,18 @@ class APKVersionViewSet(viewsets.ReadOnlyModelViewSet):
         self.permission_classes = [IsAdmin]  # Override to admin-only
         
         version = self.get_object()
+        active_versions = APKVersion.objects.filter(is_active=True)
+        
+        download_count = UpdateCounter.objects.filter(
+            action='download',
+            version=version.version
+        ).aggregate(total=Sum('count'))['total'] or 0
+        
         return Response({
             'version': version.version,
-            'download_count': version.download_count,
-            'total_versions': APKVersion.objects.filter(is_active=True).count(),
-            'latest_version': APKVersion.objects.filter(is_active=True, is_latest=True).first().version if APKVersion.objects.filter(is_active=True, is_latest=True).exists() else None
+            'download_count': download_count,
+            'total_versions': active_versions.count(),
+            'latest_version': active_versions.filter(is_latest=True, channel=APKVersion.STABLE).values_list('version', flat=True).first()
         })
 
 # Legacy endpoint for backward compatibility
@@ -31,10 +31,12 @@ class CartItemSerializer(serializers.ModelSerializer):
         product = data.get('product')
         quantity = data.get('quantity', 1)
         
-        if product and product.stock_quantity < quantity:
-            raise serializers.ValidationError(
-                {"quantity": f"Not enough stock. Available: {product.stock_quantity}"}
-            )
+        if product:
+            available = product.available_stock()
+            if available < quantity:
+                raise serializers.ValidationError(
+                    {"quantity": f"Not enough stock. Available: {available}"}
+                )
         return data
 
 
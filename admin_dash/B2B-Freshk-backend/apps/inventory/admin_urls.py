@@ -1,13 +1,20 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .admin_views import AdminInventoryLogViewSet, AdminStockAlertViewSet
+from .admin_views import (
+    AdminInventoryLogViewSet, AdminStockAlertViewSet, AdminDemandForecastViewSet, AdminStockLotViewSet,
+    inventory_as_of, product_stock_history
+)
 
 # Create a router for admin inventory viewsets
 router = DefaultRouter()
 router.register(r'logs', AdminInventoryLogViewSet)
 router.register(r'alerts', AdminStockAlertViewSet, basename='stock-alerts')
+router.register(r'forecasts', AdminDemandForecastViewSet)
+router.register(r'lots', AdminStockLotViewSet)
 
 urlpatterns = [
+    path('as_of/', inventory_as_of, name='inventory-as-of'),
+    path('products/<int:pk>/history/', product_stock_history, name='product-stock-history'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
@@ -1,31 +1,42 @@
 from rest_framework import viewsets, status, filters
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, F, OuterRef, Subquery
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
 
-from .models import InventoryLog
-from .serializers import InventoryLogSerializer
+from .models import DemandForecast, InventoryLog, StockLot
+from .ledger import set_stock
+from .valuation import end_of_day, stock_as_of
+from .history import METHODS, stock_history
+from .serializers import DemandForecastSerializer, InventoryLogSerializer, StockLotSerializer
+from .lots import expiring_lots
 from apps.users.permissions import IsAdmin
 from apps.products.models import Product
+from freshk.db_router import read_from_replica
+
+REASON_CODES = dict(InventoryLog.REASON_CHOICES)
 
 
 class AdminInventoryLogViewSet(viewsets.ModelViewSet):
     """
-    Admin-only inventory log management API
+    Admin-only inventory log management API.
+    The log is a ledger: entries can be added (which moves stock) but not edited or deleted.
     """
     serializer_class = InventoryLogSerializer
     permission_classes = [IsAdmin]
+    http_method_names = ['get', 'post', 'head', 'options']
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['product', 'change', 'reason']
+    filterset_fields = ['product', 'change', 'reason', 'reason_code']
     search_fields = ['product__name', 'reason']
-    ordering_fields = ['timestamp', 'change']
+    ordering_fields = ['timestamp', 'change', 'sequence']
     
     queryset = InventoryLog.objects.all().select_related('product').order_by('-timestamp')
     
     @action(detail=False, methods=['get'])
+    @read_from_replica
     def summary(self, request):
         """Get inventory summary statistics"""
         # Time period selection
@@ -74,7 +85,8 @@ class AdminInventoryLogViewSet(viewsets.ModelViewSet):
             'start_date': start_date.strftime('%Y-%m-%d'),
             'end_date': timezone.now().strftime('%Y-%m-%d'),
             'statistics': stats,
-            'top_products': top_products
+            # Evaluate here so the query runs against the replica
+            'top_products': list(top_products)
         })
 
 
@@ -132,6 +144,7 @@ class AdminStockAlertViewSet(viewsets.ViewSet):
             product_id = item.get('product_id')
             quantity = item.get('quantity')
             reason = item.get('reason', 'Admin stock adjustment')
+            reason_code = item.get('reason_code', InventoryLog.ADJUSTMENT)
             
             if not product_id or quantity is None:
                 errors.append({
@@ -139,31 +152,27 @@ class AdminStockAlertViewSet(viewsets.ViewSet):
                     "data": item
                 })
                 continue
+            
+            if reason_code not in REASON_CODES:
+                errors.append({
+                    "error": f"Invalid reason_code. Options: {sorted(REASON_CODES)}",
+                    "data": item
+                })
+                continue
                 
             try:
                 product = Product.objects.get(pk=product_id)
                 
-                # Calculate change
-                previous_quantity = product.stock_quantity
-                change = float(quantity) - previous_quantity
-                
-                # Update product stock
-                product.stock_quantity = quantity
-                product.save(update_fields=['stock_quantity', 'updated_at'])
-                
-                # Create inventory log
-                log = InventoryLog.objects.create(
-                    product=product,
-                    change=change,
-                    reason=reason
-                )
+                # Set the counted quantity; the ledger records the difference
+                log = set_stock(product, quantity, reason_code, reason)
                 
                 results.append({
                     "product_id": product_id,
                     "name": product.name,
-                    "previous_quantity": previous_quantity,
-                    "new_quantity": product.stock_quantity,
-                    "change": change
+                    "previous_quantity": log.balance_after - log.change,
+                    "new_quantity": log.balance_after,
+                    "change": log.change,
+                    "sequence": log.sequence
                 })
                 
             except Product.DoesNotExist:
@@ -171,7 +180,7 @@ class AdminStockAlertViewSet(viewsets.ViewSet):
                     "error": f"Product with ID {product_id} not found",
                     "data": item
                 })
-            except ValueError:
+            except (ValueError, ArithmeticError):
                 errors.append({
                     "error": "Invalid quantity value",
                     "data": item
@@ -181,4 +190,233 @@ class AdminStockAlertViewSet(viewsets.ViewSet):
             "success": len(results) > 0,
             "results": results,
             "errors": errors
-        }) 
\ No newline at end of file
+        })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+@read_from_replica
+def inventory_as_of(request):
+    """
+    Stock on hand and its value at the end of a day (?date=YYYY-MM-DD).
+    Optional filters: category, supplier, product.
+    """
+    try:
+        day = date.fromisoformat(request.query_params.get('date', ''))
+    except ValueError:
+        return Response(
+            {"error": "date is required (YYYY-MM-DD)"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    products = Product.objects.all()
+    for param, lookup in (('category', 'category_id'), ('supplier', 'supplier_id'), ('product', 'pk')):
+        value = request.query_params.get(param)
+        if not value:
+            continue
+        try:
+            products = products.filter(**{lookup: int(value)})
+        except ValueError:
+            return Response(
+                {"error": f"{param} must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    rows = stock_as_of(day, products).order_by('name').values(
+        'id', 'name', 'sku', 'unit', 'price', 'quantity_as_of',
+        'checkpoint_date', 'checkpoint_price', 'checkpoint_cost'
+    )
+    
+    result = []
+    total_value = Decimal('0')
+    total_cost_value = Decimal('0')
+    for row in rows:
+        quantity = row['quantity_as_of']
+        # Prices are only known from checkpoints; before the first one use today's
+        unit_price = row['checkpoint_price'] if row['checkpoint_price'] is not None else row['price']
+        unit_cost = row['checkpoint_cost']
+        value = quantity * unit_price
+        cost_value = quantity * unit_cost if unit_cost is not None else None
+        total_value += value
+        if cost_value is not None:
+            total_cost_value += cost_value
+        result.append({
+            'product_id': row['id'],
+            'name': row['name'],
+            'sku': row['sku'],
+            'unit': row['unit'],
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'unit_cost': unit_cost,
+            'value': value,
+            'cost_value': cost_value,
+            'checkpoint_date': row['checkpoint_date']
+        })
+    
+    return Response({
+        'date': day.isoformat(),
+        'total_products': len(result),
+        'total_value': total_value,
+        'total_cost_value': total_cost_value,
+        'products': result
+    })
+
+
+MAX_HISTORY_POINTS = 2000
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+@read_from_replica
+def product_stock_history(request, pk):
+    """
+    Stock level series of a product for charting, downsampled to at most
+    ?points= points (default 200). Optional: method (lttb or minmax),
+    from/to (YYYY-MM-DD).
+    """
+    product = Product.objects.filter(pk=pk).values('id', 'name', 'sku', 'unit', 'stock_quantity').first()
+    if product is None:
+        return Response(
+            {"error": "Product not found"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    try:
+        points = int(request.query_params.get('points', 200))
+    except ValueError:
+        points = 0
+    if not 3 <= points <= MAX_HISTORY_POINTS:
+        return Response(
+            {"error": f"points must be between 3 and {MAX_HISTORY_POINTS}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    method = request.query_params.get('method', 'lttb')
+    if method not in METHODS:
+        return Response(
+            {"error": f"Invalid method. Options: {list(METHODS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        start = request.query_params.get('from')
+        start = timezone.make_aware(datetime.combine(date.fromisoformat(start), time.min)) if start else None
+        end = request.query_params.get('to')
+        end = end_of_day(date.fromisoformat(end)) if end else None
+    except ValueError:
+        return Response(
+            {"error": "from and to must be YYYY-MM-DD"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    total, sampled = stock_history(pk, points, method, start, end)
+    
+    return Response({
+        'product_id': product['id'],
+        'name': product['name'],
+        'sku': product['sku'],
+        'unit': product['unit'],
+        'current_stock': product['stock_quantity'],
+        'method': method,
+        'total_entries': total,
+        'points': [
+            {'timestamp': timestamp, 'balance': balance, 'sequence': sequence}
+            for timestamp, balance, sequence in sampled
+        ]
+    })
+
+
+class AdminDemandForecastViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Admin-only demand forecasts and reorder suggestions (written nightly by
+    `manage.py forecast_demand`). ?needs_reorder=true keeps products whose
+    stock is at or below the suggested reorder point.
+    """
+    serializer_class = DemandForecastSerializer
+    permission_classes = [IsAdmin]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['product', 'product__category', 'product__supplier']
+    search_fields = ['product__name', 'product__sku']
+    ordering_fields = ['days_of_cover', 'reorder_point', 'smoothed_demand', 'moving_average']
+    
+    queryset = DemandForecast.objects.select_related('product').order_by('days_of_cover')
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.query_params.get('needs_reorder', '').lower() in ('1', 'true'):
+            queryset = queryset.filter(product__stock_quantity__lte=F('reorder_point'))
+        return queryset
+    
+    @read_from_replica
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['post'])
+    def apply(self, request):
+        """Use the suggested reorder points as minimum stock (body: product_ids, all if omitted)"""
+        forecasts = DemandForecast.objects.all()
+        product_ids = request.data.get('product_ids')
+        if product_ids is not None:
+            try:
+                if not isinstance(product_ids, list):
+                    raise ValueError
+                product_ids = [int(str(product_id)) for product_id in product_ids]
+            except ValueError:
+                return Response(
+                    {"error": "product_ids must be a list of integers"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            forecasts = forecasts.filter(product_id__in=product_ids)
+        
+        # One statement for all products
+        updated = Product.objects.filter(
+            pk__in=forecasts.values('product_id')
+        ).update(
+            minimum_stock=Subquery(
+                DemandForecast.objects.filter(product=OuterRef('pk')).values('reorder_point')[:1]
+            ),
+            updated_at=timezone.now()
+        )
+        
+        return Response({
+            "status": "success",
+            "updated": updated
+        })
+
+
+class AdminStockLotViewSet(viewsets.ModelViewSet):
+    """
+    Admin-only stock lots. Creating a lot receives it (its quantity is added to
+    stock); lots are used up by orders first-expiry-first-out and can't be
+    edited or deleted here.
+    """
+    serializer_class = StockLotSerializer
+    permission_classes = [IsAdmin]
+    http_method_names = ['get', 'post', 'head', 'options']
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['product', 'supplier', 'expires_on', 'received_on']
+    search_fields = ['product__name', 'product__sku', 'lot_code']
+    ordering_fields = ['expires_on', 'received_on', 'quantity_remaining']
+    
+    queryset = StockLot.objects.select_related('product', 'supplier').order_by('expires_on', 'id')
+    
+    @action(detail=False, methods=['get'])
+    @read_from_replica
+    def expiring(self, request):
+        """Lots with stock left expiring within ?days= days (default 3), expired ones included"""
+        try:
+            days = int(request.query_params.get('days', 3))
+        except ValueError:
+            return Response(
+                {"error": "days must be a number"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        lots = expiring_lots(days).select_related('product', 'supplier')
+        if request.query_params.get('product'):
+            lots = lots.filter(product_id=request.query_params['product'])
+        
+        page = self.paginate_queryset(lots)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(lots, many=True).data)
@@ -0,0 +1,210 @@
+"""
+Demand forecasts and reorder suggestions.
+
+`manage.py forecast_demand` loads the daily quantity sold of every product
+over the last INVENTORY_FORECAST_HISTORY_DAYS days with one grouped OrderItem
+query into a products x days matrix, then forecasts all products at once
+with NumPy:
+
+- moving average over the last INVENTORY_FORECAST_WINDOW days
+- day-of-week factors: each weekday's mean demand over the product's mean
+- exponential smoothing of the deseasonalized series, computed as one
+  matrix-vector product with the smoothing weights
+- lead-time demand: the smoothed level times the factors of the next
+  INVENTORY_FORECAST_LEAD_DAYS weekdays
+- reorder point: lead-time demand plus z * std(daily demand) * sqrt(lead time)
+- days of cover: current stock over the smoothed daily demand
+
+Results are upserted into DemandForecast, one row per product that sold
+anything in the history window.
+"""
+
+import logging
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.orders.models import OrderItem
+from apps.products.models import Product
+from .models import DemandForecast
+from .valuation import end_of_day
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    logger.warning("numpy not available, demand forecasting disabled. Install with: pip install numpy")
+
+QUANTITY = DecimalField(max_digits=12, decimal_places=3)
+
+MAX_DAYS_OF_COVER = 99999.9
+
+# Orders that didn't take stock out for good
+EXCLUDED_STATUSES = ['cancelled', 'returned']
+
+
+def daily_sales(product_ids, first_day, days):
+    """
+    products x days matrix of quantities sold (in each product's unit), rows in
+    the order of the sorted `product_ids` array. One query.
+    """
+    # Multiplying by a decimal avoids integer division on SQLite
+    in_product_unit = Case(
+        When(unit='kg', product__unit='ton', then=F('quantity') * Value(Decimal('0.001'))),
+        When(unit='ton', product__unit='kg', then=F('quantity') * Value(Decimal('1000'))),
+        default=F('quantity'),
+        output_field=QUANTITY
+    )
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    rows = OrderItem.objects.filter(
+        order__order_date__gte=start,
+        order__order_date__lt=end_of_day(first_day + timedelta(days=days - 1))
+    ).exclude(
+        order__status__in=EXCLUDED_STATUSES
+    ).annotate(
+        day=TruncDate('order__order_date')
+    ).order_by().values('product_id', 'day').annotate(
+        sold=Sum(in_product_unit)
+    ).values_list('product_id', 'day', 'sold')
+
+    sales = np.zeros((len(product_ids), days))
+    rows = list(rows)
+    if not rows or not len(product_ids):
+        return sales
+
+    item_products = np.array([row[0] for row in rows], dtype=np.int64)
+    offsets = np.array([(row[1] - first_day).days for row in rows], dtype=np.int64)
+    sold = np.array([float(row[2]) for row in rows])
+
+    index = np.searchsorted(product_ids, item_products).clip(max=len(product_ids) - 1)
+    # Items of products that aren't being forecast (e.g. inactive ones)
+    known = (product_ids[index] == item_products) & (offsets >= 0) & (offsets < days)
+    np.add.at(sales, (index[known], offsets[known]), sold[known])
+    return sales
+
+
+def forecast(sales, first_weekday, window, alpha, lead_days, z):
+    """
+    Forecasts for every row of a products x days sales matrix whose first
+    column is a `first_weekday` (0 = Monday). Returns a dict of arrays.
+    """
+    products, days = sales.shape
+    weekdays = (first_weekday + np.arange(days)) % 7
+
+    moving_average = sales[:, -window:].mean(axis=1)
+
+    # Mean demand per weekday (days x 7 indicator matrix) over the overall mean
+    indicator = (weekdays[:, None] == np.arange(7)).astype(float)
+    weekday_mean = (sales @ indicator) / np.maximum(indicator.sum(axis=0), 1)
+    mean = sales.mean(axis=1, keepdims=True)
+    factors = np.divide(weekday_mean, mean, out=np.ones_like(weekday_mean), where=mean > 0)
+
+    # Simple exponential smoothing started at the first day:
+    # level = (1 - a)^(n-1) * y0 + sum over t >= 1 of a * (1 - a)^(n-1-t) * yt
+    daily_factors = factors[:, weekdays]
+    # Weekdays that never sell (factor 0) count as an average day
+    deseasonalized = np.divide(
+        sales, daily_factors, out=np.repeat(mean, days, axis=1), where=daily_factors > 0
+    )
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1)
+    weights[0] = (1 - alpha) ** (days - 1)
+    smoothed = deseasonalized @ weights
+
+    upcoming = (first_weekday + days + np.arange(lead_days)) % 7
+    lead_time_demand = smoothed * factors[:, upcoming].sum(axis=1)
+    safety_stock = z * sales.std(axis=1) * np.sqrt(lead_days)
+
+    return {
+        'moving_average': moving_average,
+        'smoothed_demand': smoothed,
+        'weekday_factors': factors,
+        'lead_time_demand': lead_time_demand,
+        'safety_stock': safety_stock,
+        'reorder_point': lead_time_demand + safety_stock,
+    }
+
+
+def _quantity(value):
+    return Decimal(f'{value:.3f}')
+
+
+def _days_of_cover(stock, daily_demand):
+    if daily_demand < 0.0005:
+        return None
+    return Decimal(f'{min(float(stock) / daily_demand, MAX_DAYS_OF_COVER):.1f}')
+
+
+def write_forecasts(last_day=None, history_days=None, window=None, alpha=None, lead_days=None,
+                    z=None, batch_size=1000):
+    """
+    Forecast every active product from the sales up to `last_day` (default
+    yesterday) and upsert the results into DemandForecast. Products that sold
+    nothing in that time have no forecast. Returns the number of products
+    forecast.
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("numpy is required for demand forecasting")
+
+    last_day = last_day or timezone.localdate() - timedelta(days=1)
+    history_days = history_days or settings.INVENTORY_FORECAST_HISTORY_DAYS
+    window = min(window or settings.INVENTORY_FORECAST_WINDOW, history_days)
+    alpha = alpha or settings.INVENTORY_FORECAST_ALPHA
+    lead_days = lead_days or settings.INVENTORY_FORECAST_LEAD_DAYS
+    z = settings.INVENTORY_FORECAST_SERVICE_Z if z is None else z
+    first_day = last_day - timedelta(days=history_days - 1)
+
+    products = list(Product.objects.filter(is_active=True).order_by('pk').values_list('pk', 'stock_quantity'))
+    product_ids = np.array([pk for pk, _ in products], dtype=np.int64)
+    sales = daily_sales(product_ids, first_day, history_days)
+    result = forecast(sales, first_day.weekday(), window, alpha, lead_days, z)
+
+    now = timezone.now()
+    forecasts = []
+    written = 0
+    # Products without sales in the window get no forecast
+    for row in np.flatnonzero(sales.any(axis=1)):
+        product_id, stock = products[row]
+        smoothed = result['smoothed_demand'][row]
+        forecasts.append(DemandForecast(
+            product_id=product_id,
+            computed_at=now,
+            history_days=history_days,
+            moving_average=_quantity(result['moving_average'][row]),
+            smoothed_demand=_quantity(smoothed),
+            weekday_factors=[round(float(factor), 3) for factor in result['weekday_factors'][row]],
+            lead_time_days=lead_days,
+            lead_time_demand=_quantity(result['lead_time_demand'][row]),
+            safety_stock=_quantity(result['safety_stock'][row]),
+            reorder_point=_quantity(result['reorder_point'][row]),
+            stock_quantity=stock,
+            days_of_cover=_days_of_cover(stock, smoothed)
+        ))
+        if len(forecasts) >= batch_size:
+            written += _upsert(forecasts)
+            forecasts = []
+    if forecasts:
+        written += _upsert(forecasts)
+    # Drop forecasts of products that stopped selling or were deactivated
+    DemandForecast.objects.filter(computed_at__lt=now).delete()
+    return written
+
+
+def _upsert(forecasts):
+    DemandForecast.objects.bulk_create(
+        forecasts,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=[
+            'computed_at', 'history_days', 'moving_average', 'smoothed_demand', 'weekday_factors',
+            'lead_time_days', 'lead_time_demand', 'safety_stock', 'reorder_point', 'stock_quantity',
+            'days_of_cover'
+        ]
+    )
+    return len(forecasts)
@@ -0,0 +1,110 @@
+"""
+Stock level history for charts.
+
+Every ledger entry carries the balance after it, so a product's stock series
+is its entries' (timestamp, balance_after) in sequence order, read off the
+(product, sequence) index. Products can have tens of thousands of entries;
+the series is downsampled to a fixed number of points before it is sent:
+
+- 'minmax' keeps the lowest and highest balance of each bucket, so stock-outs
+  and peaks are never dropped. The buckets are picked in the database, so only
+  the kept entries are read.
+- 'lttb' (Largest-Triangle-Three-Buckets) keeps the points that preserve the
+  visual shape of the line. It runs on a min/max preselection of
+  LTTB_PRESELECTION times the requested points rather than the whole series.
+"""
+
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+from .ledger import balance_at
+from .models import InventoryLog
+
+METHODS = ('lttb', 'minmax')
+LTTB_PRESELECTION = 4
+
+
+def stock_history(product_id, points, method='lttb', start=None, end=None):
+    """
+    (total_entries, [(timestamp, balance, sequence), ...]) of a product in
+    ledger order, with at most `points` points. With `start`, the series
+    begins with the balance at that moment.
+    """
+    entries = InventoryLog.objects.filter(product_id=product_id)
+    opening = []
+    if start is not None:
+        entries = entries.filter(timestamp__gte=start)
+        balance = balance_at(product_id, start)
+        if balance is not None:
+            opening.append((start, balance, None))
+    if end is not None:
+        entries = entries.filter(timestamp__lt=end)
+
+    total = entries.count()
+    points -= len(opening)
+    if total <= points:
+        return total, opening + list(series_of(entries))
+    if method == 'minmax':
+        return total, opening + list(series_of(min_max(entries, points // 2)))
+    preselected = opening + list(series_of(min_max(entries, points * LTTB_PRESELECTION // 2)))
+    return total, lttb(preselected, points + len(opening))
+
+
+def series_of(entries):
+    return entries.order_by('sequence').values_list('timestamp', 'balance_after', 'sequence')
+
+
+def min_max(entries, buckets):
+    """
+    The entries with the lowest and highest balance of each of `buckets`
+    equal runs of `entries` (NTILE over sequence), chosen in one query.
+    """
+    sql, params = entries.order_by().annotate(seq=F('sequence')).values_list(
+        'id', 'balance_after', 'seq'
+    ).query.sql_with_params()
+    ranked = (
+        f'SELECT id, '
+        f'ROW_NUMBER() OVER (PARTITION BY bucket ORDER BY balance_after, seq) AS low, '
+        f'ROW_NUMBER() OVER (PARTITION BY bucket ORDER BY balance_after DESC, seq) AS high '
+        f'FROM (SELECT id, balance_after, seq, NTILE(%s) OVER (ORDER BY seq) AS bucket '
+        f'FROM ({sql}) AS entries) AS buckets'
+    )
+    return InventoryLog.objects.filter(
+        id__in=RawSQL(f'SELECT id FROM ({ranked}) AS ranked WHERE low = 1 OR high = 1', (max(buckets, 1), *params))
+    )
+
+
+def lttb(series, points):
+    """
+    Largest-Triangle-Three-Buckets: keep the first and last point and, from
+    each of points - 2 buckets, the point forming the largest triangle with
+    the previously kept point and the next bucket's average.
+    """
+    count = len(series)
+    if points < 3 or count <= points:
+        return series
+
+    xs = [row[0].timestamp() for row in series]
+    ys = [float(row[1]) for row in series]
+    every = (count - 2) / (points - 2)
+    sampled = [series[0]]
+    kept = 0
+
+    for bucket in range(points - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_start, next_end = end, min(int((bucket + 2) * every) + 1, count)
+        average_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        average_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        kept_x, kept_y = xs[kept], ys[kept]
+        largest, chosen = -1.0, start
+        for i in range(start, end):
+            area = abs((kept_x - average_x) * (ys[i] - kept_y) - (kept_x - xs[i]) * (average_y - kept_y))
+            if area > largest:
+                largest, chosen = area, i
+        sampled.append(series[chosen])
+        kept = chosen
+
+    sampled.append(series[-1])
+    return sampled
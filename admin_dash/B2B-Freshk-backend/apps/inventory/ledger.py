@@ -0,0 +1,227 @@
+"""
+Stock ledger.
+
+Every change to Product.stock_quantity goes through record_movement() (or
+set_stock()), which in one transaction locks the product row, applies the
+change and appends an InventoryLog entry carrying the next per-product
+sequence number and the resulting balance. The product lock serializes
+writers, so sequences have no gaps or duplicates and each balance_after
+follows from the previous one.
+
+Reading stock from the ledger is then one index lookup on (product, sequence)
+or (product, timestamp) instead of a sum over the product's history.
+
+Order movements of sharded products (Product.stock_slots > 0) skip the product
+lock and go through apps.inventory.sharding; they reach the ledger a few
+seconds later, in order, when the rebalancer folds them in.
+"""
+
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.products.models import Product
+from .models import InventoryLog, SlotMovement
+
+QUANTUM = Decimal('0.001')
+
+# Order movements that give an item's stock back
+RETURNING_MOVEMENTS = (InventoryLog.CANCELLATION, InventoryLog.DELETION)
+
+
+def to_quantity(value):
+    """Decimal with the 3 places stock is stored with (accepts int/float/str/Decimal)"""
+    return Decimal(str(value)).quantize(QUANTUM)
+
+
+def record_movement(product, change, reason_code, reason='', allow_negative=False,
+                    order_item=None, movement_type=''):
+    """
+    Apply `change` to the product's stock and append it to the ledger.
+
+    Stock is clamped at zero unless allow_negative is set; the entry records the
+    change that was actually applied. Updates product.stock_quantity in place
+    and returns the new InventoryLog. Use record_order_movement() for changes
+    caused by orders.
+    """
+    change = to_quantity(change)
+    with transaction.atomic():
+        stock, sharded = Product.objects.select_for_update().values_list(
+            'stock_quantity', 'stock_slots'
+        ).get(pk=product.pk)
+        if sharded:
+            stock, slots = _lock_sharded(product.pk)
+        balance = stock + change
+        if balance < 0 and not allow_negative:
+            balance = Decimal('0.000')
+            change = -stock
+        if sharded:
+            from .sharding import spread
+            spread(slots, balance)
+
+        now = timezone.now()
+        Product.objects.filter(pk=product.pk).update(stock_quantity=balance, updated_at=now)
+        entry = InventoryLog.objects.create(
+            product=product,
+            sequence=last_sequence(product.pk) + 1,
+            change=change,
+            balance_after=balance,
+            reason_code=reason_code,
+            reason=reason or dict(InventoryLog.REASON_CHOICES).get(reason_code, reason_code),
+            order_id=order_item.order_id if order_item else None,
+            order_item=order_item,
+            movement_type=movement_type
+        )
+
+    product.stock_quantity = balance
+    product.updated_at = now
+    return entry
+
+
+def record_order_movement(order_item, movement_type, change, reason_code, reason=''):
+    """
+    Record a stock movement caused by an order item, at most once per
+    (order item, movement type), and allocate or release the item's stock
+    lots to match. Returns the entry (a pending SlotMovement for sharded
+    products), or None if there was nothing to record, so callers can safely
+    run again.
+
+    Movements pair up per order item: stock is taken out (placement,
+    completion, reactivation) only while the item holds none, and returned
+    (cancellation, deletion) only as much as it holds, whatever `change`
+    says. Completing a placed order therefore takes nothing a second time.
+    """
+    from .lots import follow_order_movement
+
+    if order_movement_recorded(order_item, movement_type):
+        return None
+    try:
+        # Savepoint: a concurrent duplicate must not break the caller's transaction
+        with transaction.atomic():
+            if movement_type != InventoryLog.PLACEMENT:
+                # Serializes the item's movements so the stock it holds can't change underneath
+                type(order_item).objects.select_for_update().filter(pk=order_item.pk).exists()
+                held = held_stock(order_item)
+                if movement_type in RETURNING_MOVEMENTS:
+                    if held <= 0:
+                        return None
+                    change = held
+                elif held > 0:
+                    return None
+            entry = _apply_order_movement(order_item, movement_type, change, reason_code, reason)
+            follow_order_movement(order_item, movement_type, entry.change)
+            return entry
+    except IntegrityError:
+        if order_movement_recorded(order_item, movement_type):
+            return None
+        raise
+
+
+def held_stock(order_item):
+    """
+    Stock currently taken out for an order item: the negated sum of its order
+    movements, in the ledger and still pending in the slot journal.
+    """
+    recorded = InventoryLog.objects.filter(order_item=order_item).exclude(
+        movement_type=''
+    ).aggregate(total=Sum('change'))['total'] or Decimal('0.000')
+    pending = SlotMovement.objects.filter(order_item=order_item).exclude(
+        movement_type=''
+    ).aggregate(total=Sum('change'))['total'] or Decimal('0.000')
+    return -(recorded + pending)
+
+
+def _apply_order_movement(order_item, movement_type, change, reason_code, reason):
+    if order_item.product.stock_slots:
+        from .sharding import NotSharded, rebalancer, record_slot_movement
+        try:
+            with transaction.atomic():
+                movement = record_slot_movement(
+                    order_item.product,
+                    change,
+                    reason_code,
+                    reason,
+                    order_item=order_item,
+                    movement_type=movement_type
+                )
+            rebalancer.ensure_started()
+            return movement
+        except NotSharded:
+            order_item.product.stock_slots = 0
+    return record_movement(
+        order_item.product,
+        change,
+        reason_code,
+        reason,
+        order_item=order_item,
+        movement_type=movement_type
+    )
+
+
+def order_movement_recorded(order_item, movement_type):
+    # Probe on the (order_item, movement_type) unique index
+    if InventoryLog.objects.filter(order_item=order_item, movement_type=movement_type).exists():
+        return True
+    # Sharded products may still have it in the slot journal
+    return bool(order_item.product.stock_slots) and SlotMovement.objects.filter(
+        order_item=order_item,
+        movement_type=movement_type
+    ).exists()
+
+
+def order_has_movement(order, movement_type):
+    """Whether any item of the order had a movement of this type recorded"""
+    return (
+        order.inventory_logs.filter(movement_type=movement_type).exists()
+        or order.slot_movements.filter(movement_type=movement_type).exists()
+    )
+
+
+def set_stock(product, quantity, reason_code=InventoryLog.ADJUSTMENT, reason=''):
+    """Set stock to an absolute quantity (e.g. after a count), logging the difference"""
+    quantity = to_quantity(quantity)
+    if quantity < 0:
+        raise ValueError("Stock quantity cannot be negative")
+    with transaction.atomic():
+        stock, sharded = Product.objects.select_for_update().values_list(
+            'stock_quantity', 'stock_slots'
+        ).get(pk=product.pk)
+        if sharded:
+            stock, _ = _lock_sharded(product.pk)
+        return record_movement(product, quantity - stock, reason_code, reason)
+
+
+def _lock_sharded(product_id):
+    """
+    Lock a sharded product's slots and fold its journal into the ledger, so the
+    next entry follows the slot movements already made. Returns the stock (the
+    slot total) and the locked slots. The product row must already be locked.
+    """
+    from .sharding import fold_movements, lock_slots
+
+    slots = lock_slots(product_id)
+    fold_movements(product_id)
+    return sum((slot.quantity for slot in slots), Decimal('0.000')), slots
+
+
+def last_sequence(product_id):
+    return InventoryLog.objects.filter(product_id=product_id).order_by('-sequence').values_list(
+        'sequence', flat=True
+    ).first() or 0
+
+
+def current_balance(product_id):
+    """Stock according to the ledger (None if the product has no entries)"""
+    return InventoryLog.objects.filter(product_id=product_id).order_by('-sequence').values_list(
+        'balance_after', flat=True
+    ).first()
+
+
+def balance_at(product_id, moment):
+    """Stock of a product at `moment` according to the ledger (None before its first entry)"""
+    return InventoryLog.objects.filter(
+        product_id=product_id,
+        timestamp__lte=moment
+    ).order_by('-timestamp', '-sequence').values_list('balance_after', flat=True).first()
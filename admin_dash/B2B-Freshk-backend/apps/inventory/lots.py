@@ -0,0 +1,130 @@
+"""
+Stock lots and first-expiry-first-out allocation.
+
+Receiving a lot (receive_lot) creates a StockLot and moves the stock in
+through the ledger. When an order item takes its stock (placement, or
+completion/reactivation if it holds none), allocate() consumes the product's unexpired lots in expiry order
+and records a LotAllocation per lot. Cancelling or deleting the order returns
+those quantities to their lots (release).
+
+allocate() walks the partial (product, expires_on, id) index with a keyset
+cursor, a few lots at a time. It only reads and locks the lots it consumes
+(plus at most FETCH - 1 beyond), however many lots the product has.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .ledger import record_movement, to_quantity
+from .models import InventoryLog, LotAllocation, StockLot
+
+# Lots fetched per step; most order items are covered by the first one or two
+FETCH = 4
+
+
+def receive_lot(product, quantity, expires_on, supplier=None, received_on=None, lot_code='', reason=''):
+    """Record a received lot and add its quantity to the product's stock"""
+    quantity = to_quantity(quantity)
+    if quantity <= 0:
+        raise ValueError("Lot quantity must be greater than zero")
+    with transaction.atomic():
+        lot = StockLot.objects.create(
+            product=product,
+            supplier=supplier,
+            lot_code=lot_code,
+            quantity_received=quantity,
+            quantity_remaining=quantity,
+            received_on=received_on or timezone.localdate(),
+            expires_on=expires_on
+        )
+        record_movement(
+            product,
+            quantity,
+            InventoryLog.RESTOCK,
+            reason or f"Lot {lot_code or lot.pk} received (expires {expires_on})"
+        )
+    return lot
+
+
+def allocate(order_item, quantity, today=None):
+    """
+    Consume `quantity` from the product's unexpired lots, earliest expiry
+    first. Returns the LotAllocations; if the lots don't cover the quantity
+    the rest came from stock that isn't tracked in lots.
+    """
+    today = today or timezone.localdate()
+    remaining = to_quantity(quantity)
+    # Sharded products avoid a shared lock on their first lot; under
+    # contention a checkout may then take a slightly later lot
+    skip_locked = bool(order_item.product.stock_slots)
+    allocations = []
+    consumed = []
+    last = None
+
+    with transaction.atomic():
+        while remaining > 0:
+            lots = StockLot.objects.select_for_update(skip_locked=skip_locked).filter(
+                product_id=order_item.product_id,
+                quantity_remaining__gt=0,
+                expires_on__gte=today
+            )
+            if last is not None:
+                lots = lots.filter(
+                    Q(expires_on__gt=last.expires_on) | Q(expires_on=last.expires_on, pk__gt=last.pk)
+                )
+            batch = list(lots.order_by('expires_on', 'pk').only(
+                'pk', 'expires_on', 'quantity_remaining'
+            )[:FETCH])
+
+            for lot in batch:
+                taken = min(lot.quantity_remaining, remaining)
+                lot.quantity_remaining -= taken
+                remaining -= taken
+                consumed.append(lot)
+                allocations.append(LotAllocation(order_item=order_item, lot=lot, quantity=taken))
+                if remaining == 0:
+                    break
+            if len(batch) < FETCH:
+                break
+            last = batch[-1]
+
+        if consumed:
+            StockLot.objects.bulk_update(consumed, ['quantity_remaining'])
+            LotAllocation.objects.bulk_create(allocations)
+    return allocations
+
+
+def release(order_item):
+    """Return everything allocated to the order item to its lots"""
+    with transaction.atomic():
+        allocations = list(order_item.lot_allocations.order_by('lot_id'))
+        for allocation in allocations:
+            StockLot.objects.filter(pk=allocation.lot_id).update(
+                quantity_remaining=F('quantity_remaining') + allocation.quantity
+            )
+        LotAllocation.objects.filter(pk__in=[allocation.pk for allocation in allocations]).delete()
+    return allocations
+
+
+def follow_order_movement(order_item, movement_type, change):
+    """Keep lots in step with a stock movement just recorded for an order item"""
+    if movement_type in (InventoryLog.PLACEMENT, InventoryLog.COMPLETION, InventoryLog.REACTIVATION) and change < 0:
+        return allocate(order_item, -change)
+    if movement_type in (InventoryLog.CANCELLATION, InventoryLog.DELETION):
+        return release(order_item)
+    return []
+
+
+def expiring_lots(days=3, today=None):
+    """
+    Lots with stock left that expire within `days` days (already expired ones
+    included), soonest first. A range scan on the partial expiry index.
+    """
+    today = today or timezone.localdate()
+    return StockLot.objects.filter(
+        quantity_remaining__gt=0,
+        expires_on__lte=today + timedelta(days=days)
+    ).order_by('expires_on', 'id')
@@ -0,0 +1,117 @@
+import statistics
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.inventory import sharding
+from apps.inventory.ledger import current_balance, record_movement, set_stock
+from apps.inventory.models import InventoryLog
+from apps.products.models import Product, ProductCategory
+
+class Command(BaseCommand):
+    help = (
+        'Compare concurrent stock decrements of one product on the single-row ledger path '
+        'and in sharded-counter mode (creates and deletes a scratch product)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent checkouts')
+        parser.add_argument('--orders', type=int, default=50, help='Decrements per thread')
+        parser.add_argument('--slots', type=int, default=8, help='Stock slots in sharded mode')
+        parser.add_argument(
+            '--hold-ms',
+            type=float,
+            default=5.0,
+            help='Time each checkout transaction stays open after the decrement '
+                 '(stands in for writing the order and its items)'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite locks the whole database on write; run this against PostgreSQL for meaningful numbers'
+            ))
+
+        category = ProductCategory.objects.create(name=f'Benchmark {uuid.uuid4().hex[:8]}')
+        product = Product.objects.create(
+            name='Stock contention benchmark',
+            price=Decimal('1.000'),
+            stock_quantity=Decimal('0.000'),
+            sku=f'BENCH-{uuid.uuid4().hex[:12]}',
+            category=category,
+            is_active=False
+        )
+        try:
+            for mode in ('single-row', 'sharded'):
+                self._run(mode, product, options)
+        finally:
+            product.delete()
+            category.delete()
+
+    def _run(self, mode, product, options):
+        total = options['threads'] * options['orders']
+        sharding.disable(product)
+        set_stock(product, total, InventoryLog.ADJUSTMENT, 'Benchmark stock')
+        if mode == 'sharded':
+            sharding.enable(product, options['slots'])
+
+        latencies = []
+        errors = []
+        hold = options['hold_ms'] / 1000
+        start_gate = threading.Barrier(options['threads'])
+
+        def worker():
+            # Each thread gets its own copy so in-memory updates don't race
+            local = Product.objects.get(pk=product.pk)
+            start_gate.wait()
+            try:
+                for _ in range(options['orders']):
+                    started = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            if mode == 'sharded':
+                                sharding.record_slot_movement(local, Decimal('-1'), InventoryLog.SALE, 'Benchmark')
+                            else:
+                                record_movement(local, Decimal('-1'), InventoryLog.SALE, 'Benchmark')
+                            time.sleep(hold)
+                    except Exception as e:
+                        errors.append(type(e).__name__)
+                        continue
+                    latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if mode == 'sharded':
+            sharding.rebalance(product.pk)
+        product.refresh_from_db(fields=['stock_quantity'])
+        expected = total - len(latencies)
+        consistent = product.stock_quantity == expected == current_balance(product.pk)
+
+        self.stdout.write(f'\n{mode}:')
+        self.stdout.write(f'  checkouts: {len(latencies)} ok, {len(errors)} failed in {elapsed:.2f}s')
+        if latencies:
+            latencies.sort()
+            self.stdout.write(f'  throughput: {len(latencies) / elapsed:.0f} checkouts/s')
+            self.stdout.write(
+                f'  latency ms: p50 {statistics.median(latencies) * 1000:.1f}, '
+                f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}, '
+                f'max {latencies[-1] * 1000:.1f}'
+            )
+        if errors:
+            self.stdout.write(f'  errors: {", ".join(sorted(set(errors)))}')
+        style = self.style.SUCCESS if consistent else self.style.ERROR
+        self.stdout.write(style(
+            f'  stock {product.stock_quantity} (expected {expected}), ledger {current_balance(product.pk)}'
+        ))
@@ -0,0 +1,43 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.inventory.valuation import write_checkpoints
+
+class Command(BaseCommand):
+    help = 'Snapshot end-of-day stock, price and cost of every product (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Day to checkpoint (YYYY-MM-DD), defaults to yesterday'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=1,
+            help='Also checkpoint this many days up to --date (backfill)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Checkpoints written per statement'
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                last_day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+        else:
+            last_day = timezone.localdate() - timedelta(days=1)
+        
+        for offset in range(options['days'] - 1, -1, -1):
+            day = last_day - timedelta(days=offset)
+            written = write_checkpoints(day, batch_size=options['batch_size'])
+            self.stdout.write(f'{day}: {written} product checkpoints')
+        
+        self.stdout.write(self.style.SUCCESS('Inventory checkpoints written'))
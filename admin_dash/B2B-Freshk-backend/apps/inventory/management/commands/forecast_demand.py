@@ -0,0 +1,43 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventory.forecasting import NUMPY_AVAILABLE, write_forecasts
+
+class Command(BaseCommand):
+    help = 'Forecast daily demand of every active product and suggest reorder points (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Last day of sales history to use (YYYY-MM-DD), defaults to yesterday'
+        )
+        parser.add_argument('--history-days', type=int, help='Days of sales history')
+        parser.add_argument('--window', type=int, help='Moving average window in days')
+        parser.add_argument('--alpha', type=float, help='Exponential smoothing factor (0-1)')
+        parser.add_argument('--lead-days', type=int, help='Days until a reorder arrives')
+        parser.add_argument('--z', type=float, help='Safety stock z-score')
+
+    def handle(self, *args, **options):
+        if not NUMPY_AVAILABLE:
+            raise CommandError('numpy is not installed')
+        
+        last_day = None
+        if options['date']:
+            try:
+                last_day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+        if options['alpha'] is not None and not 0 < options['alpha'] <= 1:
+            raise CommandError('--alpha must be between 0 and 1')
+        
+        written = write_forecasts(
+            last_day=last_day,
+            history_days=options['history_days'],
+            window=options['window'],
+            alpha=options['alpha'],
+            lead_days=options['lead_days'],
+            z=options['z']
+        )
+        
+        self.stdout.write(self.style.SUCCESS(f'Demand forecasts written for {written} products'))
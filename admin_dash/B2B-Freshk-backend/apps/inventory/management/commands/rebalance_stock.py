@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.inventory.sharding import rebalancer
+
+class Command(BaseCommand):
+    help = 'Fold pending stock slot movements into the ledger and even out the slots of sharded products'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds between runs with --loop'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            folded = rebalancer.run_once()
+            if folded or not options['loop']:
+                self.stdout.write(f'{folded} slot movements folded into the ledger')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        
+        self.stdout.write(self.style.SUCCESS('Stock slots rebalanced'))
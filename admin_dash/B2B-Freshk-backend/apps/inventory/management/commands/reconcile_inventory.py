@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from apps.inventory.reconciliation import drifted_products, write_corrections
+
+class Command(BaseCommand):
+    help = 'Report products whose stock differs from their inventory ledger, optionally correcting the ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Append a correction entry to the ledger of every drifted product'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50,
+            help='Drifted products listed individually (0 lists none)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Correction entries written per transaction'
+        )
+
+    def handle(self, *args, **options):
+        drifted = drifted_products().order_by('pk').values_list(
+            'pk', 'sku', 'actual', 'ledger_balance', 'pending', 'drift'
+        )
+        
+        product_ids = []
+        total_drift = 0
+        for product_id, sku, actual, balance, pending, drift in drifted.iterator(chunk_size=5000):
+            product_ids.append(product_id)
+            total_drift += abs(drift)
+            if len(product_ids) <= options['limit']:
+                ledger = f'{balance:.3f}' + (f' + {pending:.3f} pending' if pending else '')
+                self.stdout.write(f'{sku}: stock {actual:.3f}, ledger {ledger}, drift {drift:+.3f}')
+        
+        if len(product_ids) > options['limit'] > 0:
+            self.stdout.write(f'... and {len(product_ids) - options["limit"]} more')
+        
+        if not product_ids:
+            self.stdout.write(self.style.SUCCESS('Stock and ledger agree for every product'))
+            return
+        
+        self.stdout.write(self.style.WARNING(
+            f'{len(product_ids)} products drifted, {total_drift:.3f} units in total'
+        ))
+        
+        if options['fix']:
+            written = write_corrections(product_ids, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'{written} correction entries written'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventory import sharding
+from apps.products.models import Product
+
+class Command(BaseCommand):
+    help = 'Split the stock of hot products over several slot rows (or merge it back with --slots 0)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('skus', nargs='+', help='SKUs of the products to change')
+        parser.add_argument(
+            '--slots',
+            type=int,
+            default=8,
+            help='Number of stock slots; 0 turns sharding off'
+        )
+
+    def handle(self, *args, **options):
+        if options['slots'] < 0:
+            raise CommandError('--slots cannot be negative')
+        
+        products = {product.sku: product for product in Product.objects.filter(sku__in=options['skus'])}
+        missing = [sku for sku in options['skus'] if sku not in products]
+        if missing:
+            raise CommandError(f"Unknown SKU(s): {', '.join(missing)}")
+        
+        for sku in options['skus']:
+            product = products[sku]
+            if options['slots']:
+                sharding.enable(product, options['slots'])
+                self.stdout.write(f'{sku}: {product.stock_quantity} over {options["slots"]} slots')
+            else:
+                sharding.disable(product)
+                self.stdout.write(f'{sku}: {product.stock_quantity} on the product row')
+        
+        self.stdout.write(self.style.SUCCESS('Stock slots updated'))
@@ -0,0 +1,120 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+REASON_KEYWORDS = [
+    ('initial', 'initial'),
+    ('restock', 'restock'),
+    ('cancel', 'return'),
+    ('restored', 'return'),
+    ('order', 'sale'),
+    ('damage', 'damage'),
+]
+
+
+def guess_reason_code(reason):
+    reason = reason.lower()
+    for keyword, code in REASON_KEYWORDS:
+        if keyword in reason:
+            return code
+    return 'adjustment'
+
+
+def number_entries(apps, schema_editor):
+    """
+    Give existing entries their per-product sequence, reason code and balance.
+    The old log can't be replayed to today's stock, so balances are anchored
+    on each product's current stock and worked backwards from the latest entry.
+    """
+    InventoryLog = apps.get_model('inventory', 'InventoryLog')
+    Product = apps.get_model('products', 'Product')
+
+    product_ids = InventoryLog.objects.values_list('product_id', flat=True).distinct()
+    for product_id in product_ids.iterator():
+        stock = Product.objects.filter(pk=product_id).values_list('stock_quantity', flat=True).first()
+        entries = list(
+            InventoryLog.objects.filter(product_id=product_id)
+            .order_by('timestamp', 'id')
+            .only('id', 'change', 'reason')
+        )
+        balance = stock if stock is not None else sum((entry.change for entry in entries), Decimal('0'))
+        for sequence, entry in reversed(list(enumerate(entries, start=1))):
+            entry.sequence = sequence
+            entry.balance_after = balance
+            entry.reason_code = guess_reason_code(entry.reason)
+            balance -= entry.change
+        InventoryLog.objects.bulk_update(
+            entries, ['sequence', 'balance_after', 'reason_code'], batch_size=BATCH_SIZE
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0002_alter_inventorylog_options_and_more"),
+        ("products", "0003_product_minimum_stock"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="inventorylog",
+            name="change",
+            field=models.DecimalField(decimal_places=3, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name="inventorylog",
+            name="sequence",
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name="inventorylog",
+            name="balance_after",
+            field=models.DecimalField(decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name="inventorylog",
+            name="reason_code",
+            field=models.CharField(
+                choices=[
+                    ("initial", "Initial stock"),
+                    ("restock", "Restock"),
+                    ("sale", "Sale"),
+                    ("return", "Return to stock"),
+                    ("adjustment", "Adjustment"),
+                    ("damage", "Damaged/spoiled"),
+                    ("correction", "Correction"),
+                ],
+                default="adjustment",
+                max_length=20,
+            ),
+        ),
+        migrations.RunPython(number_entries, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="inventorylog",
+            name="sequence",
+            field=models.PositiveBigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name="inventorylog",
+            name="balance_after",
+            field=models.DecimalField(decimal_places=3, max_digits=12),
+        ),
+        migrations.RemoveIndex(
+            model_name="inventorylog",
+            name="inventory_i_product_0d970b_idx",
+        ),
+        migrations.AddIndex(
+            model_name="inventorylog",
+            index=models.Index(
+                fields=["product", "timestamp", "sequence"], name="inventory_i_product_31a582_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="inventorylog",
+            constraint=models.UniqueConstraint(
+                fields=("product", "sequence"), name="inventory_log_product_sequence"
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_inventory_ledger'),
+        ('products', '0003_product_minimum_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('ledger_sequence', models.PositiveBigIntegerField(default=0)),
+                ('unit_price', models.DecimalField(decimal_places=3, max_digits=10)),
+                ('unit_cost', models.DecimalField(blank=True, decimal_places=3, max_digits=10, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_checkpoints', to='products.product')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='inventory_s_date_c6a827_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'date'), name='stock_checkpoint_product_date')],
+            },
+        ),
+    ]
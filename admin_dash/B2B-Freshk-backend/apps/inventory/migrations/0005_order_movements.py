@@ -0,0 +1,78 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:56
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+ORDER_REASON = re.compile(r'^Order #(\d+) (placed|completion|cancelled|reactivated|deletion)')
+
+MOVEMENT_TYPES = {
+    'placed': 'placement',
+    'completion': 'completion',
+    'cancelled': 'cancellation',
+    'reactivated': 'reactivation',
+    'deletion': 'deletion',
+}
+
+
+def link_order_entries(apps, schema_editor):
+    """
+    Link existing "Order #N ..." entries to their order item, so completed
+    orders aren't deducted again when they are saved. Duplicates left by the
+    old double deduction stay unlinked.
+    """
+    InventoryLog = apps.get_model('inventory', 'InventoryLog')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    entries = InventoryLog.objects.filter(reason__startswith='Order #').order_by('sequence', 'pk')
+    linked = set()
+    batch = []
+    for entry in entries.iterator():
+        match = ORDER_REASON.match(entry.reason)
+        if not match:
+            continue
+        order_id, movement_type = int(match.group(1)), MOVEMENT_TYPES[match.group(2)]
+        item_id = OrderItem.objects.filter(
+            order_id=order_id, product_id=entry.product_id
+        ).order_by('pk').values_list('pk', flat=True).first()
+        if item_id is None or (item_id, movement_type) in linked:
+            continue
+        linked.add((item_id, movement_type))
+        entry.order_id = order_id
+        entry.order_item_id = item_id
+        entry.movement_type = movement_type
+        batch.append(entry)
+    InventoryLog.objects.bulk_update(batch, ['order', 'order_item', 'movement_type'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_stockcheckpoint'),
+        ('orders', '0003_order_address'),
+        ('products', '0003_product_minimum_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventorylog',
+            name='movement_type',
+            field=models.CharField(blank=True, choices=[('placement', 'Order placed'), ('completion', 'Order completed'), ('cancellation', 'Order cancelled'), ('reactivation', 'Order reactivated'), ('deletion', 'Order deleted')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='inventorylog',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_logs', to='orders.order'),
+        ),
+        migrations.AddField(
+            model_name='inventorylog',
+            name='order_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_logs', to='orders.orderitem'),
+        ),
+        migrations.AddConstraint(
+            model_name='inventorylog',
+            constraint=models.UniqueConstraint(fields=('order_item', 'movement_type'), name='inventory_log_order_item_movement'),
+        ),
+        migrations.RunPython(link_order_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_order_movements'),
+        ('orders', '0003_order_address'),
+        ('products', '0004_product_stock_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('change', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('reason_code', models.CharField(choices=[('initial', 'Initial stock'), ('restock', 'Restock'), ('sale', 'Sale'), ('return', 'Return to stock'), ('adjustment', 'Adjustment'), ('damage', 'Damaged/spoiled'), ('correction', 'Correction')], max_length=20)),
+                ('reason', models.CharField(max_length=255)),
+                ('movement_type', models.CharField(blank=True, choices=[('placement', 'Order placed'), ('completion', 'Order completed'), ('cancellation', 'Order cancelled'), ('reactivation', 'Order reactivated'), ('deletion', 'Order deleted')], default='', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='slot_movements', to='orders.order')),
+                ('order_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='slot_movements', to='orders.orderitem')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_movements', to='products.product')),
+            ],
+            options={
+                'ordering': ['id'],
+                'constraints': [models.UniqueConstraint(fields=('order_item', 'movement_type'), name='slot_movement_order_item_movement')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='products.product')),
+            ],
+            options={
+                'ordering': ['product', 'slot'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'slot'), name='stock_slot_product_slot')],
+            },
+        ),
+    ]
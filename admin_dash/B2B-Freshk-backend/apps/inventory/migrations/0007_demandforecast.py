@@ -0,0 +1,37 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stock_slots'),
+        ('products', '0004_product_stock_slots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('computed_at', models.DateTimeField()),
+                ('history_days', models.PositiveSmallIntegerField()),
+                ('moving_average', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('smoothed_demand', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('weekday_factors', models.JSONField(default=list)),
+                ('lead_time_days', models.PositiveSmallIntegerField()),
+                ('lead_time_demand', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('safety_stock', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('reorder_point', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('stock_quantity', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('days_of_cover', models.DecimalField(blank=True, decimal_places=1, max_digits=10, null=True)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecast', to='products.product')),
+            ],
+            options={
+                'ordering': ['days_of_cover'],
+                'indexes': [models.Index(fields=['days_of_cover'], name='inventory_d_days_of_cc233c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_demandforecast'),
+        ('orders', '0003_order_address'),
+        ('products', '0004_product_stock_slots'),
+        ('users', '0008_last_activity_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lot_code', models.CharField(blank=True, max_length=50)),
+                ('quantity_received', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('quantity_remaining', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('received_on', models.DateField()),
+                ('expires_on', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='products.product')),
+                ('supplier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_lots', to='users.supplierprofile')),
+            ],
+            options={
+                'ordering': ['expires_on', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LotAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lot_allocations', to='orders.orderitem')),
+                ('lot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='inventory.stocklot')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='stocklot',
+            index=models.Index(condition=models.Q(('quantity_remaining__gt', 0)), fields=['product', 'expires_on', 'id'], name='stock_lot_fefo'),
+        ),
+        migrations.AddIndex(
+            model_name='stocklot',
+            index=models.Index(condition=models.Q(('quantity_remaining__gt', 0)), fields=['expires_on'], name='stock_lot_expiry'),
+        ),
+    ]
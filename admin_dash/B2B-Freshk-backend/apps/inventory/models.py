@@ -2,17 +2,242 @@ from django.db import models
 from apps.products.models import Product
 
 class InventoryLog(models.Model):
+    """
+    Append-only stock ledger. Entries are written by apps.inventory.ledger,
+    which numbers them per product and records the stock after each change,
+    so the latest entry of a product is its current stock.
+    """
+    INITIAL = 'initial'
+    RESTOCK = 'restock'
+    SALE = 'sale'
+    RETURN = 'return'
+    ADJUSTMENT = 'adjustment'
+    DAMAGE = 'damage'
+    CORRECTION = 'correction'
+    REASON_CHOICES = [
+        (INITIAL, 'Initial stock'),
+        (RESTOCK, 'Restock'),
+        (SALE, 'Sale'),
+        (RETURN, 'Return to stock'),
+        (ADJUSTMENT, 'Adjustment'),
+        (DAMAGE, 'Damaged/spoiled'),
+        (CORRECTION, 'Correction'),
+    ]
+
+    # Order-driven movements; each happens at most once per order item
+    PLACEMENT = 'placement'
+    COMPLETION = 'completion'
+    CANCELLATION = 'cancellation'
+    REACTIVATION = 'reactivation'
+    DELETION = 'deletion'
+    MOVEMENT_CHOICES = [
+        (PLACEMENT, 'Order placed'),
+        (COMPLETION, 'Order completed'),
+        (CANCELLATION, 'Order cancelled'),
+        (REACTIVATION, 'Order reactivated'),
+        (DELETION, 'Order deleted'),
+    ]
+
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='inventory_logs')
-    change = models.IntegerField()  # Positive for addition, negative for reduction
+    # Per-product position in the ledger, 1, 2, 3, ...
+    sequence = models.PositiveBigIntegerField()
+    change = models.DecimalField(max_digits=12, decimal_places=3)  # Positive for addition, negative for reduction
+    balance_after = models.DecimalField(max_digits=12, decimal_places=3)
+    reason_code = models.CharField(max_length=20, choices=REASON_CHOICES, default=ADJUSTMENT)
     timestamp = models.DateTimeField(auto_now_add=True)
     reason = models.CharField(max_length=255, help_text="Reason for the stock change (e.g., restock, sale, adjustment)")
+    # Set for movements caused by an order; entries outlive deleted orders
+    order = models.ForeignKey(
+        'orders.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='inventory_logs'
+    )
+    order_item = models.ForeignKey(
+        'orders.OrderItem', on_delete=models.SET_NULL, null=True, blank=True, related_name='inventory_logs'
+    )
+    movement_type = models.CharField(max_length=20, choices=MOVEMENT_CHOICES, blank=True, default='')
 
     def __str__(self):
         return f"{self.change} for {self.product.name} on {self.timestamp}"
-    
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None and not kwargs.get('force_insert'):
+            raise ValueError("Inventory ledger entries cannot be changed, record a correction instead")
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-timestamp']
+        constraints = [
+            # Also the index behind "latest entry of a product"
+            models.UniqueConstraint(fields=['product', 'sequence'], name='inventory_log_product_sequence'),
+            # Makes order movements idempotent; the dedup check is a probe on this index
+            models.UniqueConstraint(
+                fields=['order_item', 'movement_type'], name='inventory_log_order_item_movement'
+            ),
+        ]
         indexes = [
-            models.Index(fields=['product']),
+            # Balance of a product at a point in time
+            models.Index(fields=['product', 'timestamp', 'sequence']),
             models.Index(fields=['timestamp']),
         ]
+
+
+class StockCheckpoint(models.Model):
+    """
+    Stock of a product at the end of a day, with the price and cost used to
+    value it. Written by `manage.py checkpoint_inventory`; point-in-time
+    queries start from the nearest checkpoint instead of the whole ledger.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_checkpoints')
+    date = models.DateField()
+    quantity = models.DecimalField(max_digits=12, decimal_places=3)
+    # Last ledger entry included in quantity (0 if the product had none yet)
+    ledger_sequence = models.PositiveBigIntegerField(default=0)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=3)
+    unit_cost = models.DecimalField(max_digits=10, decimal_places=3, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.product.name} on {self.date}: {self.quantity}"
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            # Also the index behind "nearest checkpoint of a product"
+            models.UniqueConstraint(fields=['product', 'date'], name='stock_checkpoint_product_date'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+
+class StockSlot(models.Model):
+    """
+    One shard of a product's stock in sharded-counter mode
+    (Product.stock_slots > 0). See apps.inventory.sharding.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='slots')
+    slot = models.PositiveSmallIntegerField()
+    quantity = models.DecimalField(max_digits=12, decimal_places=3)
+
+    def __str__(self):
+        return f"{self.product.name} slot {self.slot}: {self.quantity}"
+
+    class Meta:
+        ordering = ['product', 'slot']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'slot'], name='stock_slot_product_slot'),
+        ]
+
+
+class SlotMovement(models.Model):
+    """
+    Stock movement already applied to a product's slots and waiting to be
+    appended to the ledger (by sharding.fold_movements).
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='slot_movements')
+    change = models.DecimalField(max_digits=12, decimal_places=3)
+    reason_code = models.CharField(max_length=20, choices=InventoryLog.REASON_CHOICES)
+    reason = models.CharField(max_length=255)
+    order = models.ForeignKey(
+        'orders.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='slot_movements'
+    )
+    order_item = models.ForeignKey(
+        'orders.OrderItem', on_delete=models.SET_NULL, null=True, blank=True, related_name='slot_movements'
+    )
+    movement_type = models.CharField(
+        max_length=20, choices=InventoryLog.MOVEMENT_CHOICES, blank=True, default=''
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.change} for {self.product.name} (pending)"
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            # Same idempotency guarantee as the ledger while the movement is pending
+            models.UniqueConstraint(
+                fields=['order_item', 'movement_type'], name='slot_movement_order_item_movement'
+            ),
+        ]
+
+
+class DemandForecast(models.Model):
+    """
+    Latest demand forecast and reorder suggestion for a product, written by
+    `manage.py forecast_demand` (see apps.inventory.forecasting). Quantities
+    are in the product's unit, per day unless noted.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='demand_forecast')
+    computed_at = models.DateTimeField()
+    # Days of sales history the forecast was computed from
+    history_days = models.PositiveSmallIntegerField()
+    moving_average = models.DecimalField(max_digits=12, decimal_places=3)
+    smoothed_demand = models.DecimalField(max_digits=12, decimal_places=3)
+    # Demand per weekday relative to the average, Monday first
+    weekday_factors = models.JSONField(default=list)
+    lead_time_days = models.PositiveSmallIntegerField()
+    # Seasonal forecast of the demand over the lead time
+    lead_time_demand = models.DecimalField(max_digits=12, decimal_places=3)
+    safety_stock = models.DecimalField(max_digits=12, decimal_places=3)
+    reorder_point = models.DecimalField(max_digits=12, decimal_places=3)
+    stock_quantity = models.DecimalField(max_digits=12, decimal_places=3)
+    # Days the stock lasts at the smoothed demand (null without demand)
+    days_of_cover = models.DecimalField(max_digits=10, decimal_places=1, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.product.name}: reorder at {self.reorder_point}"
+
+    class Meta:
+        ordering = ['days_of_cover']
+        indexes = [
+            models.Index(fields=['days_of_cover']),
+        ]
+
+
+class StockLot(models.Model):
+    """
+    A received batch of a product. Order items consume lots first-expiry-
+    first-out (apps.inventory.lots); stock received outside lots isn't tracked
+    here. Quantities are in the product's unit.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='lots')
+    supplier = models.ForeignKey(
+        'users.SupplierProfile', on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_lots'
+    )
+    lot_code = models.CharField(max_length=50, blank=True)
+    quantity_received = models.DecimalField(max_digits=12, decimal_places=3)
+    quantity_remaining = models.DecimalField(max_digits=12, decimal_places=3)
+    received_on = models.DateField()
+    expires_on = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.product.name} lot {self.lot_code or self.pk} (expires {self.expires_on})"
+
+    class Meta:
+        ordering = ['expires_on', 'id']
+        indexes = [
+            # Only lots with stock left are indexed, so both indexes stay as
+            # small as the open lots however long the lot history gets
+            models.Index(
+                fields=['product', 'expires_on', 'id'],
+                name='stock_lot_fefo',
+                condition=models.Q(quantity_remaining__gt=0)
+            ),
+            models.Index(
+                fields=['expires_on'],
+                name='stock_lot_expiry',
+                condition=models.Q(quantity_remaining__gt=0)
+            ),
+        ]
+
+
+class LotAllocation(models.Model):
+    """Quantity of a lot consumed by an order item (returned to the lot if the order is cancelled)"""
+    order_item = models.ForeignKey('orders.OrderItem', on_delete=models.CASCADE, related_name='lot_allocations')
+    lot = models.ForeignKey(StockLot, on_delete=models.CASCADE, related_name='allocations')
+    quantity = models.DecimalField(max_digits=12, decimal_places=3)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.quantity} of lot {self.lot_id} for order item {self.order_item_id}"
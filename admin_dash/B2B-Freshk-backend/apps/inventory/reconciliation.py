@@ -0,0 +1,111 @@
+"""
+Stock/ledger reconciliation.
+
+A product's ledger balance (its latest entry's balance_after, plus pending
+slot movements for sharded products) should always equal its stock. Stock
+changed behind the ledger's back (raw UPDATEs, admin edits of
+stock_quantity, old code paths) shows up as drift. drifted_products() finds
+every drifted product in one query: each product costs two probes on the
+(product, sequence) index, and only drifted rows leave the database.
+write_corrections() appends one CORRECTION entry per drifted product, in
+bulk, so the ledger agrees with the stock again.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from apps.products.models import Product
+from .ledger import to_quantity
+from .models import InventoryLog, SlotMovement, StockSlot
+
+QUANTITY = DecimalField(max_digits=12, decimal_places=3)
+ZERO = Value(Decimal('0.000'), output_field=QUANTITY)
+# Half the smallest stock unit, absorbs SQLite's float arithmetic
+TOLERANCE = Decimal('0.0005')
+
+CORRECTION_REASON = 'Reconciliation: ledger brought in line with stock'
+
+
+def _total(queryset, field):
+    return Subquery(
+        queryset.filter(product=OuterRef('pk')).order_by().values('product').annotate(
+            total=Sum(field)
+        ).values('total'),
+        output_field=QUANTITY
+    )
+
+
+def drifted_products(products=None):
+    """
+    Products whose stock differs from their ledger, annotated with `actual`
+    (stock, the slot total for sharded products), `ledger_balance`, `pending`
+    (unfolded slot movements), `ledger_sequence` and `drift`
+    (actual - ledger_balance - pending). Evaluates as one query.
+    """
+    products = Product.objects.all() if products is None else products
+    latest = InventoryLog.objects.filter(product=OuterRef('pk')).order_by('-sequence')
+
+    return products.annotate(
+        ledger_balance=Coalesce(Subquery(latest.values('balance_after')[:1]), ZERO),
+        ledger_sequence=Coalesce(Subquery(latest.values('sequence')[:1]), Value(0)),
+        pending=Case(
+            When(stock_slots__gt=0, then=Coalesce(_total(SlotMovement.objects, 'change'), ZERO)),
+            default=ZERO,
+            output_field=QUANTITY
+        ),
+        actual=Case(
+            When(stock_slots__gt=0, then=Coalesce(_total(StockSlot.objects, 'quantity'), ZERO)),
+            default=F('stock_quantity'),
+            output_field=QUANTITY
+        )
+    ).annotate(
+        drift=F('actual') - F('ledger_balance') - F('pending')
+    ).filter(
+        Q(drift__gte=TOLERANCE) | Q(drift__lte=-TOLERANCE)
+    )
+
+
+def write_corrections(product_ids, batch_size=1000):
+    """
+    Append a CORRECTION entry to the ledger of each drifted product among
+    `product_ids`, making the ledger agree with the stock. Drift is measured
+    again under the product locks, so concurrent movements are never
+    overwritten. Returns the number of entries written.
+    """
+    product_ids = sorted(product_ids)
+    written = 0
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        with transaction.atomic():
+            # Same lock order as the ledger: product rows, then slots
+            list(Product.objects.select_for_update().filter(pk__in=batch).order_by('pk').values_list('pk'))
+            list(StockSlot.objects.select_for_update().filter(product_id__in=batch).order_by(
+                'product_id', 'slot'
+            ).values_list('pk'))
+
+            entries = []
+            sharded = {}
+            for product_id, sequence, balance, drift, slots in drifted_products(
+                Product.objects.filter(pk__in=batch)
+            ).values_list('pk', 'ledger_sequence', 'ledger_balance', 'drift', 'stock_slots'):
+                drift = to_quantity(drift)
+                balance_after = to_quantity(balance) + drift
+                entries.append(InventoryLog(
+                    product_id=product_id,
+                    sequence=sequence + 1,
+                    change=drift,
+                    balance_after=balance_after,
+                    reason_code=InventoryLog.CORRECTION,
+                    reason=CORRECTION_REASON
+                ))
+                if slots:
+                    # Pending slot movements are folded on top of stock_quantity
+                    sharded[product_id] = balance_after
+            InventoryLog.objects.bulk_create(entries)
+            for product_id, balance_after in sharded.items():
+                Product.objects.filter(pk=product_id).update(stock_quantity=balance_after)
+            written += len(entries)
+    return written
@@ -1,7 +1,67 @@
+from django.utils import timezone
 from rest_framework import serializers
-from .models import InventoryLog
+from .models import DemandForecast, InventoryLog, StockLot
+from .ledger import record_movement
+from .lots import receive_lot
 
 class InventoryLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = InventoryLog
         fields = '__all__'
+        read_only_fields = ['sequence', 'balance_after', 'timestamp', 'order', 'order_item', 'movement_type']
+
+    def create(self, validated_data):
+        # New entries move stock through the ledger
+        return record_movement(
+            validated_data['product'],
+            validated_data['change'],
+            validated_data.get('reason_code', InventoryLog.ADJUSTMENT),
+            validated_data.get('reason', '')
+        )
+
+
+class DemandForecastSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    sku = serializers.CharField(source='product.sku', read_only=True)
+    unit = serializers.CharField(source='product.unit', read_only=True)
+    minimum_stock = serializers.DecimalField(
+        source='product.minimum_stock', max_digits=10, decimal_places=3, read_only=True
+    )
+
+    class Meta:
+        model = DemandForecast
+        fields = '__all__'
+
+
+class StockLotSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    sku = serializers.CharField(source='product.sku', read_only=True)
+    days_to_expiry = serializers.SerializerMethodField()
+    received_on = serializers.DateField(required=False)
+
+    class Meta:
+        model = StockLot
+        fields = '__all__'
+        read_only_fields = ['quantity_remaining', 'created_at']
+
+    def get_days_to_expiry(self, obj):
+        return (obj.expires_on - timezone.localdate()).days
+
+    def validate(self, data):
+        if data['quantity_received'] <= 0:
+            raise serializers.ValidationError({'quantity_received': 'Quantity must be greater than zero'})
+        received_on = data.get('received_on') or timezone.localdate()
+        if data['expires_on'] < received_on:
+            raise serializers.ValidationError({'expires_on': 'Expiry cannot be before the receiving date'})
+        return data
+
+    def create(self, validated_data):
+        # Receiving a lot adds its quantity to stock through the ledger
+        return receive_lot(
+            validated_data['product'],
+            validated_data['quantity_received'],
+            validated_data['expires_on'],
+            supplier=validated_data.get('supplier'),
+            received_on=validated_data.get('received_on'),
+            lot_code=validated_data.get('lot_code', '')
+        )
@@ -0,0 +1,271 @@
+"""
+Sharded stock counters.
+
+Every ledger write locks the product row, so during ordering peaks all
+checkouts of a staple product queue up behind each other. A product with
+Product.stock_slots = N instead keeps its stock in N StockSlot rows:
+
+- Order movements decrement one randomly chosen slot with a conditional
+  UPDATE (`quantity >= wanted`) and journal the movement in SlotMovement. They
+  never lock the product row, so concurrent checkouts mostly touch different
+  rows. Only when no slot can cover the quantity are all slots locked.
+- Reads (Product.available_stock()) sum the slots.
+- The rebalancer (`manage.py rebalance_stock --loop`) periodically folds the journal into the ledger (sequence and
+  balance_after, as for any other entry), refreshes Product.stock_quantity and
+  spreads the stock evenly over the slots again so decrements keep finding a
+  slot that can cover them.
+
+Lock order is product row, then slots by slot number, everywhere.
+"""
+
+import logging
+import random
+import threading
+import time
+from decimal import ROUND_DOWN
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from apps.products.models import Product
+from .ledger import QUANTUM, last_sequence, to_quantity
+from .models import InventoryLog, SlotMovement, StockSlot
+
+logger = logging.getLogger(__name__)
+
+# Random slots tried with a conditional update before locking all of them
+TAKE_ATTEMPTS = 3
+
+
+class NotSharded(Exception):
+    """The product has no stock slots (sharding was turned off meanwhile)"""
+
+
+def slot_total(product_id):
+    return to_quantity(StockSlot.objects.filter(product_id=product_id).aggregate(
+        total=Sum('quantity')
+    )['total'] or 0)
+
+
+def split(total, slots):
+    """`total` spread over `slots` amounts (the remainder goes to the first one)"""
+    share = (total / slots).quantize(QUANTUM, rounding=ROUND_DOWN)
+    return [total - share * (slots - 1)] + [share] * (slots - 1)
+
+
+def spread(slots, total):
+    """Set locked StockSlot rows to an even split of `total`"""
+    for slot, quantity in zip(slots, split(total, len(slots))):
+        slot.quantity = quantity
+    StockSlot.objects.bulk_update(slots, ['quantity'])
+
+
+def lock_slots(product_id):
+    return list(StockSlot.objects.select_for_update().filter(product_id=product_id).order_by('slot'))
+
+
+def enable(product, slots):
+    """Move the product's stock into `slots` slot rows (re-splits an already sharded product)"""
+    if slots < 1:
+        raise ValueError("A sharded product needs at least one slot")
+    with transaction.atomic():
+        Product.objects.select_for_update().filter(pk=product.pk).exists()
+        fold_movements(product.pk)
+        stock = Product.objects.values_list('stock_quantity', flat=True).get(pk=product.pk)
+        StockSlot.objects.filter(product_id=product.pk).delete()
+        StockSlot.objects.bulk_create([
+            StockSlot(product_id=product.pk, slot=slot, quantity=quantity)
+            for slot, quantity in enumerate(split(stock, slots))
+        ])
+        Product.objects.filter(pk=product.pk).update(stock_slots=slots)
+    product.stock_slots = slots
+    product.stock_quantity = stock
+
+
+def disable(product):
+    """Fold pending movements and keep the stock on the product row only again"""
+    with transaction.atomic():
+        Product.objects.select_for_update().filter(pk=product.pk).exists()
+        lock_slots(product.pk)
+        fold_movements(product.pk)
+        StockSlot.objects.filter(product_id=product.pk).delete()
+        Product.objects.filter(pk=product.pk).update(stock_slots=0)
+    product.stock_slots = 0
+    product.refresh_from_db(fields=['stock_quantity'])
+
+
+def take(product_id, slots, quantity):
+    """
+    Remove up to `quantity` from the product's slots; returns the quantity
+    actually removed (less than asked only if the product runs out).
+    """
+    for slot in random.sample(range(slots), min(slots, TAKE_ATTEMPTS)):
+        if StockSlot.objects.filter(
+            product_id=product_id,
+            slot=slot,
+            quantity__gte=quantity
+        ).update(quantity=F('quantity') - quantity):
+            return quantity
+
+    # No single slot could cover it: take across all slots under lock
+    locked = lock_slots(product_id)
+    if not locked:
+        raise NotSharded(product_id)
+    taken = min(quantity, sum(slot.quantity for slot in locked))
+    remaining = taken
+    for slot in sorted(locked, key=lambda slot: slot.quantity, reverse=True):
+        part = min(slot.quantity, remaining)
+        slot.quantity -= part
+        remaining -= part
+    StockSlot.objects.bulk_update(locked, ['quantity'])
+    return taken
+
+
+def give(product_id, slots, quantity):
+    """Add `quantity` to a random slot"""
+    if StockSlot.objects.filter(
+        product_id=product_id,
+        slot=random.randrange(slots)
+    ).update(quantity=F('quantity') + quantity):
+        return
+    # The product was re-split into fewer slots meanwhile
+    slot = StockSlot.objects.filter(product_id=product_id).values_list('slot', flat=True).first()
+    if slot is None:
+        raise NotSharded(product_id)
+    StockSlot.objects.filter(product_id=product_id, slot=slot).update(quantity=F('quantity') + quantity)
+
+
+def record_slot_movement(product, change, reason_code, reason='', order_item=None, movement_type=''):
+    """
+    Apply `change` to a sharded product's slots and journal it for the ledger.
+    Like ledger.record_movement() stock is clamped at zero and the journal
+    records the change actually applied, but the product row isn't locked.
+    Returns the SlotMovement.
+    """
+    change = to_quantity(change)
+    with transaction.atomic():
+        # Journal first: the (order_item, movement_type) index rejects a
+        # duplicate before any slot is touched
+        movement = SlotMovement.objects.create(
+            product_id=product.pk,
+            change=change,
+            reason_code=reason_code,
+            reason=reason or dict(InventoryLog.REASON_CHOICES).get(reason_code, reason_code),
+            order_id=order_item.order_id if order_item else None,
+            order_item=order_item,
+            movement_type=movement_type
+        )
+        if change < 0:
+            taken = take(product.pk, product.stock_slots, -change)
+            if taken != -change:
+                movement.change = -taken
+                movement.save(update_fields=['change'])
+        else:
+            give(product.pk, product.stock_slots, change)
+    return movement
+
+
+def fold_movements(product_id):
+    """
+    Append the product's journaled slot movements to the ledger in order and
+    set Product.stock_quantity to the resulting balance. Returns the number of
+    movements folded.
+    """
+    with transaction.atomic():
+        stock = Product.objects.select_for_update().values_list(
+            'stock_quantity', flat=True
+        ).get(pk=product_id)
+        movements = list(SlotMovement.objects.filter(product_id=product_id).order_by('id'))
+        if not movements:
+            return 0
+
+        sequence = last_sequence(product_id)
+        balance = stock
+        entries = []
+        for movement in movements:
+            sequence += 1
+            balance += movement.change
+            entries.append(InventoryLog(
+                product_id=product_id,
+                sequence=sequence,
+                change=movement.change,
+                balance_after=balance,
+                reason_code=movement.reason_code,
+                reason=movement.reason,
+                order_id=movement.order_id,
+                order_item_id=movement.order_item_id,
+                movement_type=movement.movement_type
+            ))
+        InventoryLog.objects.bulk_create(entries)
+        SlotMovement.objects.filter(pk__in=[movement.pk for movement in movements]).delete()
+        Product.objects.filter(pk=product_id).update(stock_quantity=balance, updated_at=timezone.now())
+    return len(movements)
+
+
+def rebalance(product_id):
+    """Fold the product's journal and spread its stock evenly over its slots"""
+    with transaction.atomic():
+        Product.objects.select_for_update().filter(pk=product_id).exists()
+        slots = lock_slots(product_id)
+        folded = fold_movements(product_id)
+        if slots:
+            spread(slots, sum(slot.quantity for slot in slots))
+    return folded
+
+
+def rebalance_all():
+    """
+    Rebalance the sharded products with journaled movements; returns the
+    number of movements folded. Products without any aren't locked.
+    """
+    folded = 0
+    product_ids = SlotMovement.objects.filter(product__stock_slots__gt=0).values_list(
+        'product_id', flat=True
+    ).order_by('product_id').distinct()
+    for product_id in list(product_ids):
+        try:
+            folded += rebalance(product_id)
+        except Exception as e:
+            logger.error(f"Failed to rebalance stock slots of product {product_id}: {e}")
+    return folded
+
+
+class StockRebalancer:
+    """
+    Lazily started daemon thread running rebalance_all() every
+    INVENTORY_REBALANCE_INTERVAL seconds, when INVENTORY_REBALANCE_IN_PROCESS
+    is set. Off by default: every web worker would run its own. Deployments
+    run `manage.py rebalance_stock --loop` as one separate process instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def ensure_started(self):
+        if not settings.INVENTORY_REBALANCE_IN_PROCESS:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='stock-rebalancer', daemon=True)
+            self._thread.start()
+
+    def run_once(self):
+        try:
+            return rebalance_all()
+        finally:
+            # Don't hold a connection between runs
+            connections.close_all()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.INVENTORY_REBALANCE_INTERVAL)
+            self.run_once()
+
+
+rebalancer = StockRebalancer()
@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.inventory.models import DemandForecast
+from apps.products.models import Product, ProductCategory
+from apps.users.models import CustomUser
+
+
+class AdminInventoryParamsTests(TestCase):
+    """Malformed parameters are a 400, not a 500"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user('admin', password='pass', role='admin')
+        category = ProductCategory.objects.create(name='Vegetables')
+        cls.product = Product.objects.create(
+            name='Tomatoes', price=Decimal('2.00'), unit='kg', stock_quantity=0, sku='TOM', category=category
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_inventory_as_of_rejects_non_integer_filters(self):
+        for param in ('category', 'supplier', 'product'):
+            response = self.client.get('/api/admin/inventory/as_of/', {'date': '2024-01-01', param: 'abc'})
+            self.assertEqual(response.status_code, 400, param)
+
+    def test_inventory_as_of_filters_by_product(self):
+        response = self.client.get('/api/admin/inventory/as_of/', {'date': '2999-01-01', 'product': self.product.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['product_id'] for row in response.data['products']], [self.product.pk])
+
+    def test_apply_forecasts_rejects_non_integer_product_ids(self):
+        for product_ids in (['abc'], [1.5], 'abc', {'id': 1}):
+            response = self.client.post(
+                '/api/admin/inventory/forecasts/apply/', {'product_ids': product_ids}, format='json'
+            )
+            self.assertEqual(response.status_code, 400, product_ids)
+
+    def test_apply_forecasts_to_listed_products(self):
+        quantity = Decimal('0')
+        DemandForecast.objects.create(
+            product=self.product, computed_at=timezone.now(), history_days=28, moving_average=quantity,
+            smoothed_demand=quantity, lead_time_days=2, lead_time_demand=quantity, safety_stock=quantity,
+            reorder_point=Decimal('12.000'), stock_quantity=Decimal('100.000')
+        )
+
+        response = self.client.post(
+            '/api/admin/inventory/forecasts/apply/', {'product_ids': [str(self.product.pk)]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.minimum_stock, Decimal('12.000'))
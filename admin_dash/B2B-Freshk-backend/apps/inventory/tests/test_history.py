@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.inventory.history import stock_history
+from apps.inventory.ledger import record_movement
+from apps.inventory.models import InventoryLog
+from apps.products.models import Product, ProductCategory
+from apps.users.models import CustomUser
+
+
+class StockHistoryTests(TestCase):
+
+    def setUp(self):
+        category = ProductCategory.objects.create(name='Vegetables')
+        # New products start with 100 in stock (products.signals)
+        self.product = Product.objects.create(
+            name='Tomatoes', price=Decimal('2.00'), unit='kg', stock_quantity=0, sku='TOM', category=category
+        )
+        # A saw tooth with one stock-out and one peak
+        for i in range(60):
+            record_movement(self.product, -5 if i % 2 else 5, InventoryLog.ADJUSTMENT, 'Count')
+        record_movement(self.product, -200, InventoryLog.ADJUSTMENT, 'Stock-out')
+        record_movement(self.product, 500, InventoryLog.RESTOCK, 'Peak')
+        for i in range(60):
+            record_movement(self.product, -5 if i % 2 else 5, InventoryLog.ADJUSTMENT, 'Count')
+        self.total = InventoryLog.objects.filter(product=self.product).count()
+
+    def test_short_series_is_returned_whole(self):
+        total, series = stock_history(self.product.pk, 1000)
+        self.assertEqual(total, self.total)
+        self.assertEqual([sequence for _, _, sequence in series], list(range(1, self.total + 1)))
+
+    def test_minmax_keeps_extremes_in_order(self):
+        total, series = stock_history(self.product.pk, 20, 'minmax')
+
+        self.assertEqual(total, self.total)
+        self.assertLessEqual(len(series), 20)
+        balances = [balance for _, balance, _ in series]
+        self.assertIn(Decimal('0.000'), balances)
+        self.assertIn(Decimal('500.000'), balances)
+        sequences = [sequence for _, _, sequence in series]
+        self.assertEqual(sequences, sorted(sequences))
+
+    def test_minmax_reads_only_the_kept_entries(self):
+        with CaptureQueriesContext(connection) as queries:
+            stock_history(self.product.pk, 20, 'minmax')
+        self.assertIn('NTILE', queries.captured_queries[-1]['sql'])
+
+    def test_lttb_returns_the_requested_points(self):
+        total, series = stock_history(self.product.pk, 20)
+        self.assertEqual(len(series), 20)
+        self.assertIn(Decimal('500.000'), [balance for _, balance, _ in series])
+
+    def test_endpoint(self):
+        admin = CustomUser.objects.create_user('admin', password='pass', role='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        response = client.get(f'/api/admin/inventory/products/{self.product.pk}/history/?points=10&method=minmax')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_entries'], self.total)
+        self.assertLessEqual(len(response.data['points']), 10)
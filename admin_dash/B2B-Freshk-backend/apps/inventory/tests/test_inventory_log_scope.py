@@ -0,0 +1,107 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.inventory.ledger import record_movement
+from apps.inventory.models import InventoryLog
+from apps.orders.models import Order, OrderItem, PurchasedProduct
+from apps.products.models import Product, ProductCategory
+from apps.users.models import CustomUser, SupplierProfile
+
+URL = '/api/inventory-logs/'
+
+
+class InventoryLogScopeTests(TestCase):
+    """Which ledger entries each role sees, and at what query cost"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user('admin', password='pass', role='admin')
+        cls.supplier = CustomUser.objects.create_user('supplier', password='pass', role='supplier')
+        cls.profile = SupplierProfile.objects.create(
+            user=cls.supplier, company_name='Farm', contact_person='Sam', phone='123', address='Road 1'
+        )
+        cls.retailer = CustomUser.objects.create_user('retailer', password='pass', role='retailer')
+        cls.other_retailer = CustomUser.objects.create_user('other', password='pass', role='retailer')
+        cls.category = ProductCategory.objects.create(name='Vegetables')
+
+        cls.tomatoes = cls.make_product('TOM')
+        cls.potatoes = cls.make_product('POT')
+        cls.onions = cls.make_product('ONI', supplier=None)
+        cls.order(cls.retailer, cls.tomatoes)
+        cls.order(cls.other_retailer, cls.potatoes)
+
+    @classmethod
+    def make_product(cls, sku, supplier=True):
+        product = Product.objects.create(
+            name=sku, price=Decimal('2.50'), unit='kg', stock_quantity=0, sku=sku,
+            category=cls.category, supplier=cls.profile if supplier else None
+        )
+        record_movement(product, 100, InventoryLog.RESTOCK, 'Initial stock')
+        return product
+
+    @classmethod
+    def order(cls, user, product, quantity=1):
+        order = Order.objects.create(user=user, total_amount=product.price * quantity)
+        return OrderItem.objects.create(order=order, product=product, quantity=quantity)
+
+    def list_logs(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        return {row['product'] for row in response.data['results']}, queries
+
+    def test_order_items_add_to_purchase_set(self):
+        self.assertTrue(PurchasedProduct.objects.filter(user=self.retailer, product=self.tomatoes).exists())
+        # Ordering the same product again keeps a single entry
+        self.order(self.retailer, self.tomatoes)
+        self.assertEqual(PurchasedProduct.objects.filter(user=self.retailer, product=self.tomatoes).count(), 1)
+
+    def test_editing_an_item_only_touches_the_purchase_set_on_product_change(self):
+        item = OrderItem.objects.get(order__user=self.retailer, product=self.tomatoes)
+        item.quantity = 2
+        with CaptureQueriesContext(connection) as queries:
+            item.save()
+        self.assertFalse([q for q in queries.captured_queries if 'orders_purchasedproduct' in q['sql']])
+
+        item.product = self.onions
+        item.save()
+        self.assertTrue(PurchasedProduct.objects.filter(user=self.retailer, product=self.onions).exists())
+
+    def test_retailer_sees_purchased_products_only(self):
+        products, _ = self.list_logs(self.retailer)
+        self.assertEqual(products, {self.tomatoes.pk})
+
+        self.order(self.retailer, self.onions)
+        products, _ = self.list_logs(self.retailer)
+        self.assertEqual(products, {self.tomatoes.pk, self.onions.pk})
+
+    def test_supplier_and_admin_scope(self):
+        products, _ = self.list_logs(self.supplier)
+        self.assertEqual(products, {self.tomatoes.pk, self.potatoes.pk})
+        products, _ = self.list_logs(self.admin)
+        self.assertEqual(products, {self.tomatoes.pk, self.potatoes.pk, self.onions.pk})
+
+    def test_retailer_scope_does_not_read_orders(self):
+        _, queries = self.list_logs(self.retailer)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertIn('orders_purchasedproduct', sql)
+        self.assertNotIn('orders_orderitem', sql)
+
+    def test_query_count_does_not_grow_with_history(self):
+        before = {user.username: len(self.list_logs(user)[1]) for user in (self.admin, self.supplier, self.retailer)}
+
+        for index in range(5):
+            product = self.make_product(f'EXTRA-{index}')
+            for _ in range(3):
+                self.order(self.retailer, product)
+            record_movement(product, 10, InventoryLog.RESTOCK, 'Top up')
+
+        for user in (self.admin, self.supplier, self.retailer):
+            _, queries = self.list_logs(user)
+            self.assertEqual(len(queries), before[user.username], user.username)
@@ -0,0 +1,130 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+
+from apps.inventory.ledger import current_balance, record_movement, set_stock, to_quantity
+from apps.inventory.models import InventoryLog
+from apps.products.models import Product, ProductCategory
+
+
+class LedgerTests(TestCase):
+
+    def setUp(self):
+        category = ProductCategory.objects.create(name='Fruit')
+        # New products start with 100 in stock (products.signals)
+        self.product = Product.objects.create(
+            name='Apples', price=Decimal('3.00'), unit='kg', stock_quantity=0, sku='APL', category=category
+        )
+
+    def entries(self):
+        return list(InventoryLog.objects.filter(product=self.product).order_by('sequence').values_list(
+            'sequence', 'change', 'balance_after', 'reason_code'
+        ))
+
+    def test_to_quantity(self):
+        self.assertEqual(to_quantity(1.1), Decimal('1.100'))
+        self.assertEqual(to_quantity('2.0004'), Decimal('2.000'))
+
+    def test_movements_are_numbered_and_carry_the_balance(self):
+        record_movement(self.product, Decimal('12.5'), InventoryLog.RESTOCK, 'Delivery')
+        entry = record_movement(self.product, -2, InventoryLog.DAMAGE)
+
+        self.assertEqual(self.entries(), [
+            (1, Decimal('100.000'), Decimal('100.000'), InventoryLog.INITIAL),
+            (2, Decimal('12.500'), Decimal('112.500'), InventoryLog.RESTOCK),
+            (3, Decimal('-2.000'), Decimal('110.500'), InventoryLog.DAMAGE),
+        ])
+        self.assertEqual(entry.reason, 'Damaged/spoiled')
+        # The caller's instance follows, as does the product row
+        self.assertEqual(self.product.stock_quantity, Decimal('110.500'))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, Decimal('110.500'))
+        self.assertEqual(current_balance(self.product.pk), Decimal('110.500'))
+
+    def test_stock_is_clamped_at_zero(self):
+        entry = record_movement(self.product, -150, InventoryLog.SALE)
+
+        # The entry records what was actually taken
+        self.assertEqual(entry.change, Decimal('-100.000'))
+        self.assertEqual(entry.balance_after, Decimal('0.000'))
+        self.assertEqual(self.product.stock_quantity, Decimal('0.000'))
+
+    def test_negative_stock_when_allowed(self):
+        entry = record_movement(self.product, -150, InventoryLog.CORRECTION, allow_negative=True)
+        self.assertEqual((entry.change, entry.balance_after), (Decimal('-150.000'), Decimal('-50.000')))
+
+    def test_set_stock_logs_the_difference(self):
+        entry = set_stock(self.product, Decimal('87.25'), reason='Count')
+
+        self.assertEqual(entry.change, Decimal('-12.750'))
+        self.assertEqual(entry.balance_after, Decimal('87.250'))
+        self.assertEqual((entry.reason_code, entry.reason), (InventoryLog.ADJUSTMENT, 'Count'))
+
+    def test_set_stock_rejects_negative_quantities(self):
+        with self.assertRaises(ValueError):
+            set_stock(self.product, -1)
+        self.assertEqual(len(self.entries()), 1)
+
+    def test_entries_cannot_be_changed(self):
+        entry = record_movement(self.product, 5, InventoryLog.RESTOCK)
+        entry.change = Decimal('50')
+        with self.assertRaises(ValueError):
+            entry.save()
+
+
+class InventoryLedgerMigrationTests(TransactionTestCase):
+    """0003_inventory_ledger numbers the entries of the old log"""
+
+    before = [('inventory', '0002_alter_inventorylog_options_and_more'), ('products', '0003_product_minimum_stock')]
+    after = [('inventory', '0003_inventory_ledger'), ('products', '0003_product_minimum_stock')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        self.old_apps = executor.loader.project_state(self.before).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def migrate(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.after)
+        return executor.loader.project_state(self.after).apps
+
+    def test_backfill_anchors_balances_on_current_stock(self):
+        Category = self.old_apps.get_model('products', 'ProductCategory')
+        Product = self.old_apps.get_model('products', 'Product')
+        OldLog = self.old_apps.get_model('inventory', 'InventoryLog')
+        category = Category.objects.create(name='Fruit')
+        apples = Product.objects.create(
+            name='Apples', price=Decimal('3.00'), stock_quantity=Decimal('70'), sku='APL', category=category
+        )
+        pears = Product.objects.create(
+            name='Pears', price=Decimal('3.00'), stock_quantity=Decimal('5'), sku='PER', category=category
+        )
+        for change, reason in ((100, 'Initial stock'), (-40, 'Order #1'), (20, 'Restock delivery'),
+                               (-15, 'Damaged crate'), (5, 'Order #1 cancelled')):
+            OldLog.objects.create(product=apples, change=change, reason=reason)
+        OldLog.objects.create(product=pears, change=8, reason='Counted')
+
+        new_apps = self.migrate()
+
+        Log = new_apps.get_model('inventory', 'InventoryLog')
+        self.assertEqual(list(Log.objects.filter(product_id=apples.pk).order_by('sequence').values_list(
+            'sequence', 'change', 'balance_after', 'reason_code'
+        )), [
+            (1, Decimal('100.000'), Decimal('100.000'), 'initial'),
+            (2, Decimal('-40.000'), Decimal('60.000'), 'sale'),
+            (3, Decimal('20.000'), Decimal('80.000'), 'restock'),
+            (4, Decimal('-15.000'), Decimal('65.000'), 'damage'),
+            (5, Decimal('5.000'), Decimal('70.000'), 'return'),
+        ])
+        # Balances end on today's stock even when the old log doesn't add up to it
+        self.assertEqual(list(Log.objects.filter(product_id=pears.pk).values_list(
+            'sequence', 'balance_after', 'reason_code'
+        )), [(1, Decimal('5.000'), 'adjustment')])
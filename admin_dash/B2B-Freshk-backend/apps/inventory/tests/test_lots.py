@@ -0,0 +1,139 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.inventory import lots
+from apps.inventory.ledger import record_order_movement
+from apps.inventory.models import InventoryLog, LotAllocation, StockLot
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product, ProductCategory
+from apps.users.models import CustomUser
+
+
+class StockLotTests(TestCase):
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        category = ProductCategory.objects.create(name='Fruit')
+        # New products start with 100 in stock (products.signals), not tracked in lots
+        self.product = Product.objects.create(
+            name='Apples', price=Decimal('3.00'), unit='kg', stock_quantity=0, sku='APL', category=category
+        )
+        self.retailer = CustomUser.objects.create_user('retailer', password='pass', role='retailer')
+        self.order = Order.objects.create(user=self.retailer, total_amount=Decimal('0.00'))
+
+    def lot(self, quantity, expires_in, code=''):
+        return StockLot.objects.create(
+            product=self.product, lot_code=code, quantity_received=quantity, quantity_remaining=quantity,
+            received_on=self.today, expires_on=self.today + timedelta(days=expires_in)
+        )
+
+    def unsaved_item(self, quantity):
+        """An order item that hasn't taken its stock yet"""
+        item = OrderItem(order=self.order, product=self.product, quantity=quantity, price=Decimal('3.00'), unit='kg')
+        OrderItem.objects.bulk_create([item])
+        return item
+
+    def remaining(self, *lots_):
+        return [StockLot.objects.get(pk=lot.pk).quantity_remaining for lot in lots_]
+
+    def test_allocates_earliest_expiry_first_across_lots(self):
+        late = self.lot(10, 9, 'LATE')
+        early = self.lot(4, 2, 'EARLY')
+        middle = self.lot(5, 5, 'MIDDLE')
+
+        allocations = lots.allocate(self.unsaved_item(12), 12, today=self.today)
+
+        self.assertEqual([(a.lot.lot_code, a.quantity) for a in allocations], [
+            ('EARLY', Decimal('4.000')), ('MIDDLE', Decimal('5.000')), ('LATE', Decimal('3.000')),
+        ])
+        self.assertEqual(self.remaining(early, middle, late), [Decimal('0.000'), Decimal('0.000'), Decimal('7.000')])
+
+    def test_skips_expired_and_empty_lots(self):
+        expired = self.lot(10, -1)
+        empty = self.lot(0, 1)
+        fresh = self.lot(10, 3)
+
+        [allocation] = lots.allocate(self.unsaved_item(6), 6, today=self.today)
+
+        self.assertEqual(allocation.lot_id, fresh.pk)
+        self.assertEqual(
+            self.remaining(expired, empty, fresh), [Decimal('10.000'), Decimal('0.000'), Decimal('4.000')]
+        )
+
+    def test_rest_comes_from_untracked_stock(self):
+        only = self.lot(3, 1)
+        allocations = lots.allocate(self.unsaved_item(8), 8, today=self.today)
+        self.assertEqual([a.quantity for a in allocations], [Decimal('3.000')])
+        self.assertEqual(self.remaining(only), [Decimal('0.000')])
+
+    def test_keyset_cursor_goes_past_the_first_fetch(self):
+        # Lots sharing an expiry date are ordered by id
+        created = [self.lot(1, 1 + i // 3) for i in range(lots.FETCH * 2 + 2)]
+        allocations = lots.allocate(self.unsaved_item(lots.FETCH * 2 + 1), lots.FETCH * 2 + 1, today=self.today)
+
+        self.assertEqual([a.lot_id for a in allocations], [lot.pk for lot in created[:lots.FETCH * 2 + 1]])
+        self.assertEqual(self.remaining(created[-1]), [Decimal('1.000')])
+
+    def test_placed_item_allocates_and_cancellation_releases(self):
+        first = self.lot(5, 1)
+        second = self.lot(5, 2)
+        item = OrderItem.objects.create(order=self.order, product=self.product, quantity=7)
+
+        self.assertEqual(self.remaining(first, second), [Decimal('0.000'), Decimal('3.000')])
+
+        record_order_movement(item, InventoryLog.CANCELLATION, 7, InventoryLog.RETURN)
+        self.assertEqual(self.remaining(first, second), [Decimal('5.000'), Decimal('5.000')])
+        self.assertFalse(LotAllocation.objects.filter(order_item=item).exists())
+
+        # Reactivating takes the lots again
+        record_order_movement(item, InventoryLog.REACTIVATION, -7, InventoryLog.SALE)
+        self.assertEqual(self.remaining(first, second), [Decimal('0.000'), Decimal('3.000')])
+
+    def test_deletion_releases(self):
+        lot = self.lot(10, 1)
+        item = OrderItem.objects.create(order=self.order, product=self.product, quantity=4)
+
+        record_order_movement(item, InventoryLog.DELETION, 4, InventoryLog.RETURN)
+
+        self.assertEqual(self.remaining(lot), [Decimal('10.000')])
+
+    def test_receive_lot_adds_stock_through_the_ledger(self):
+        lot = lots.receive_lot(self.product, 20, self.today + timedelta(days=5), lot_code='L1')
+        self.assertEqual(lot.quantity_remaining, Decimal('20.000'))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, Decimal('120.000'))
+        with self.assertRaises(ValueError):
+            lots.receive_lot(self.product, 0, self.today)
+
+    def test_expiring_lots(self):
+        expired = self.lot(1, -2)
+        soon = self.lot(1, 2)
+        self.lot(1, 10)
+        self.lot(0, 1)
+
+        self.assertEqual(list(lots.expiring_lots(days=3, today=self.today)), [expired, soon])
+
+    def test_lot_serializer_rejections(self):
+        admin = CustomUser.objects.create_user('admin', password='pass', role='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+        lot = {
+            'product': self.product.pk, 'quantity_received': '5',
+            'received_on': '2025-06-10', 'expires_on': '2025-06-15'
+        }
+
+        response = client.post('/api/admin/inventory/lots/', {**lot, 'quantity_received': '0'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quantity_received', response.data)
+
+        response = client.post('/api/admin/inventory/lots/', {**lot, 'expires_on': '2025-06-09'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('expires_on', response.data)
+
+        response = client.post('/api/admin/inventory/lots/', lot, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.data['quantity_remaining']), Decimal('5'))
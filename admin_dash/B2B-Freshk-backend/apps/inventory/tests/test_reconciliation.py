@@ -0,0 +1,100 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.inventory import sharding
+from apps.inventory.ledger import current_balance, record_movement
+from apps.inventory.models import InventoryLog, StockSlot
+from apps.inventory.reconciliation import drifted_products, write_corrections
+from apps.products.models import Product, ProductCategory
+
+
+class ReconciliationTests(TestCase):
+
+    def setUp(self):
+        self.category = ProductCategory.objects.create(name='Vegetables')
+        # New products start with 100 in stock (products.signals)
+        self.products = [self.product(f'P{i}') for i in range(3)]
+
+    def product(self, sku):
+        return Product.objects.create(
+            name=sku, price=Decimal('2.00'), unit='kg', stock_quantity=0, sku=sku, category=self.category
+        )
+
+    def drift(self):
+        return {product.sku: product.drift for product in drifted_products()}
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_inventory', *args, stdout=out)
+        return out.getvalue()
+
+    def test_ledger_only_history_has_no_drift(self):
+        record_movement(self.products[0], -30, InventoryLog.SALE)
+        record_movement(self.products[1], Decimal('12.5'), InventoryLog.RESTOCK)
+        self.assertEqual(self.drift(), {})
+        self.assertIn('agree for every product', self.reconcile())
+
+    def test_stock_changed_behind_the_ledger(self):
+        Product.objects.filter(pk=self.products[1].pk).update(stock_quantity=Decimal('93.5'))
+
+        self.assertEqual(self.drift(), {'P1': Decimal('-6.5')})
+        output = self.reconcile('--fix')
+        self.assertIn('P1: stock 93.500, ledger 100.000, drift -6.500', output)
+        self.assertIn('1 correction entries written', output)
+
+        entry = InventoryLog.objects.filter(product=self.products[1]).order_by('-sequence').first()
+        self.assertEqual((entry.sequence, entry.change, entry.reason_code), (2, Decimal('-6.500'), 'correction'))
+        self.assertEqual(current_balance(self.products[1].pk), Decimal('93.500'))
+        # A second run finds nothing
+        self.assertEqual(self.drift(), {})
+        self.assertEqual(write_corrections([product.pk for product in self.products]), 0)
+
+    def test_pending_slot_movements_are_not_drift(self):
+        product = self.products[2]
+        sharding.enable(product, 4)
+        sharding.record_slot_movement(product, -10, InventoryLog.SALE, 'Sale')
+        self.assertEqual(self.drift(), {})
+
+        # A slot changed by hand is
+        slot = StockSlot.objects.filter(product=product, quantity__gte=5).first()
+        StockSlot.objects.filter(pk=slot.pk).update(quantity=F('quantity') - 5)
+        [drifted] = drifted_products()
+        self.assertEqual((drifted.pending, drifted.drift), (Decimal('-10'), Decimal('-5')))
+
+        write_corrections([product.pk])
+        self.assertEqual(self.drift(), {})
+        sharding.fold_movements(product.pk)
+        self.assertEqual(current_balance(product.pk), Decimal('85.000'))
+        self.assertEqual(product.available_stock(), Decimal('85.000'))
+
+    def test_report_is_one_query_however_many_products(self):
+        for product in self.products:
+            Product.objects.filter(pk=product.pk).update(stock_quantity=Decimal('1'))
+        with self.assertNumQueries(1):
+            self.reconcile()
+
+        for i in range(10):
+            Product.objects.filter(pk=self.product(f'Q{i}').pk).update(stock_quantity=Decimal('1'))
+        with self.assertNumQueries(1):
+            self.reconcile()
+
+    def test_fix_query_count_does_not_grow_with_products(self):
+        def fix_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.reconcile('--fix')
+            return len(queries.captured_queries)
+
+        for product in self.products:
+            Product.objects.filter(pk=product.pk).update(stock_quantity=Decimal('1'))
+        few = fix_queries()
+
+        for product in self.products + [self.product(f'Q{i}') for i in range(10)]:
+            Product.objects.filter(pk=product.pk).update(stock_quantity=Decimal('2'))
+        self.assertEqual(fix_queries(), few)
+        self.assertEqual(self.drift(), {})
@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from apps.inventory import sharding
+from apps.inventory.ledger import current_balance, record_movement, record_order_movement
+from apps.inventory.models import InventoryLog, SlotMovement, StockSlot
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product, ProductCategory
+from apps.users.models import CustomUser
+
+
+class ShardedStockTests(TestCase):
+
+    def setUp(self):
+        category = ProductCategory.objects.create(name='Vegetables')
+        # New products start with 100 in stock (products.signals)
+        self.product = Product.objects.create(
+            name='Tomatoes', price=Decimal('2.00'), unit='kg', stock_quantity=0, sku='TOM', category=category
+        )
+        sharding.enable(self.product, 4)
+        self.retailer = CustomUser.objects.create_user('retailer', password='pass', role='retailer')
+
+    def slots(self):
+        return list(StockSlot.objects.filter(product=self.product).order_by('slot').values_list('quantity', flat=True))
+
+    def test_enable_splits_stock_over_slots(self):
+        self.assertEqual(self.slots(), [Decimal('25.000')] * 4)
+        self.assertEqual(self.product.available_stock(), Decimal('100.000'))
+
+    def test_take_from_one_slot(self):
+        self.assertEqual(sharding.take(self.product.pk, 4, Decimal('10')), Decimal('10'))
+        self.assertEqual(sorted(self.slots()), [Decimal('15.000')] + [Decimal('25.000')] * 3)
+
+    def test_take_across_slots_when_no_slot_covers_it(self):
+        self.assertEqual(sharding.take(self.product.pk, 4, Decimal('60')), Decimal('60'))
+        self.assertEqual(sum(self.slots()), Decimal('40.000'))
+        self.assertTrue(all(quantity >= 0 for quantity in self.slots()))
+
+    def test_take_clamps_at_zero(self):
+        self.assertEqual(sharding.take(self.product.pk, 4, Decimal('150')), Decimal('100.000'))
+        self.assertEqual(sum(self.slots()), Decimal('0.000'))
+
+    def test_take_without_slots_raises_not_sharded(self):
+        StockSlot.objects.filter(product=self.product).delete()
+        with self.assertRaises(sharding.NotSharded):
+            sharding.take(self.product.pk, 4, Decimal('10'))
+
+    def test_slot_movements_reach_the_ledger_when_folded(self):
+        entries = InventoryLog.objects.filter(product=self.product).count()
+        sharding.record_slot_movement(self.product, -10, InventoryLog.SALE, 'Sale')
+        sharding.record_slot_movement(self.product, 4, InventoryLog.RETURN, 'Return')
+        sharding.record_slot_movement(self.product, -200, InventoryLog.SALE, 'Clamped sale')
+
+        # Stock moved at once, the ledger only after folding
+        self.assertEqual(self.product.available_stock(), Decimal('0.000'))
+        self.assertEqual(InventoryLog.objects.filter(product=self.product).count(), entries)
+
+        self.assertEqual(sharding.fold_movements(self.product.pk), 3)
+        self.assertFalse(SlotMovement.objects.filter(product=self.product).exists())
+        folded = list(InventoryLog.objects.filter(product=self.product).order_by('sequence').values_list(
+            'sequence', 'change', 'balance_after'
+        ))[-3:]
+        self.assertEqual(folded, [
+            (entries + 1, Decimal('-10.000'), Decimal('90.000')),
+            (entries + 2, Decimal('4.000'), Decimal('94.000')),
+            (entries + 3, Decimal('-94.000'), Decimal('0.000')),
+        ])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, Decimal('0.000'))
+        self.assertEqual(sharding.fold_movements(self.product.pk), 0)
+
+    def test_other_movements_fold_the_journal_first(self):
+        sharding.record_slot_movement(self.product, -10, InventoryLog.SALE, 'Sale')
+        entry = record_movement(self.product, 5, InventoryLog.RESTOCK, 'Restock')
+
+        self.assertEqual(entry.balance_after, Decimal('95.000'))
+        self.assertEqual(sum(self.slots()), Decimal('95.000'))
+        self.assertFalse(SlotMovement.objects.filter(product=self.product).exists())
+
+    def test_order_movement_falls_back_to_the_ledger_when_sharding_was_turned_off(self):
+        order = Order.objects.create(user=self.retailer, total_amount=Decimal('0.00'))
+        # This copy still thinks the product is sharded
+        stale = Product.objects.get(pk=self.product.pk)
+        sharding.disable(Product.objects.get(pk=self.product.pk))
+        item = OrderItem(order=order, product=stale, quantity=Decimal('5'), price=Decimal('2.00'), unit='kg')
+        OrderItem.objects.bulk_create([item])
+
+        entry = record_order_movement(item, InventoryLog.PLACEMENT, Decimal('-5'), InventoryLog.SALE)
+
+        self.assertIsInstance(entry, InventoryLog)
+        self.assertEqual(stale.stock_slots, 0)
+        self.assertEqual(current_balance(self.product.pk), Decimal('95.000'))
+
+    def test_rebalance_all_only_touches_products_with_movements(self):
+        sharding.take(self.product.pk, 4, Decimal('60'))
+        # Nothing journaled: left as it is
+        self.assertEqual(sharding.rebalance_all(), 0)
+        self.assertNotEqual(len(set(self.slots())), 1)
+
+        sharding.record_slot_movement(self.product, -4, InventoryLog.SALE, 'Sale')
+        self.assertEqual(sharding.rebalance_all(), 1)
+        self.assertEqual(self.slots(), [Decimal('9.000')] * 4)
@@ -0,0 +1,89 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.inventory.ledger import balance_at, record_movement
+from apps.inventory.models import InventoryLog, StockCheckpoint
+from apps.inventory.valuation import end_of_day, stock_as_of, write_checkpoints
+from apps.products.models import Product, ProductCategory
+
+
+class StockAsOfTests(TestCase):
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.category = ProductCategory.objects.create(name='Vegetables')
+        # New products start with 100 in stock (products.signals), 10 days ago here
+        self.tomatoes = self.product('TOM', [(-5, -20), (-3, 50), (-1, -10)])
+        self.potatoes = self.product('POT', [(-6, 15), (-2, -40)])
+
+    def day(self, offset):
+        return self.today + timedelta(days=offset)
+
+    def product(self, sku, movements):
+        product = Product.objects.create(
+            name=sku, price=Decimal('2.00'), unit='kg', stock_quantity=0, sku=sku, category=self.category
+        )
+        for _, change in movements:
+            record_movement(product, change, InventoryLog.ADJUSTMENT)
+        # Back-date the product and its entries: one entry per day at noon
+        self.move_to(Product.objects.filter(pk=product.pk), 'created_at', -10)
+        entries = InventoryLog.objects.filter(product=product)
+        self.move_to(entries.filter(sequence=1), 'timestamp', -10)
+        for sequence, (offset, _) in enumerate(movements, start=2):
+            self.move_to(entries.filter(sequence=sequence), 'timestamp', offset)
+        return product
+
+    def move_to(self, queryset, field, offset):
+        moment = timezone.make_aware(datetime.combine(self.day(offset), time(12)))
+        queryset.update(**{field: moment})
+
+    def as_of(self, day):
+        return dict(stock_as_of(day).values_list('sku', 'quantity_as_of'))
+
+    def ledger_as_of(self, day):
+        return {
+            product.sku: balance_at(product.pk, end_of_day(day) - timedelta(microseconds=1))
+            for product in (self.tomatoes, self.potatoes)
+        }
+
+    def test_checkpoint_plus_ledger_delta_matches_the_ledger(self):
+        write_checkpoints(self.day(-4))
+        write_checkpoints(self.day(-7))
+
+        for offset in range(-9, 1):
+            self.assertEqual(self.as_of(self.day(offset)), self.ledger_as_of(self.day(offset)), offset)
+        self.assertEqual(self.as_of(self.day(-2)), {'TOM': Decimal('130.000'), 'POT': Decimal('75.000')})
+
+    def test_products_without_a_checkpoint_use_the_ledger(self):
+        self.assertFalse(StockCheckpoint.objects.exists())
+        self.assertEqual(self.as_of(self.day(-4)), {'TOM': Decimal('80.000'), 'POT': Decimal('115.000')})
+        # Not created yet
+        self.assertEqual(self.as_of(self.day(-11)), {})
+
+    def test_checkpoints_carry_price_and_sequence(self):
+        write_checkpoints(self.day(-4))
+        checkpoint = StockCheckpoint.objects.get(product=self.tomatoes)
+        self.assertEqual(
+            (checkpoint.quantity, checkpoint.ledger_sequence, checkpoint.unit_price),
+            (Decimal('80.000'), 2, Decimal('2.000'))
+        )
+
+    def test_rerunning_a_day_replaces_its_checkpoints(self):
+        out = StringIO()
+        call_command('checkpoint_inventory', '--date', str(self.day(-4)), stdout=out)
+        Product.objects.filter(pk=self.tomatoes.pk).update(price=Decimal('2.50'))
+        call_command('checkpoint_inventory', '--date', str(self.day(-4)), stdout=out)
+
+        self.assertEqual(StockCheckpoint.objects.count(), 2)
+        self.assertEqual(StockCheckpoint.objects.get(product=self.tomatoes).unit_price, Decimal('2.500'))
+        self.assertIn('2 product checkpoints', out.getvalue())
+
+    def test_as_of_is_one_query(self):
+        write_checkpoints(self.day(-4))
+        with self.assertNumQueries(1):
+            list(stock_as_of(self.day(-2)).values('pk', 'quantity_as_of', 'checkpoint_price', 'checkpoint_cost'))
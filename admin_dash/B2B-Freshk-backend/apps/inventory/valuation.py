@@ -0,0 +1,119 @@
+"""
+Point-in-time stock and valuation.
+
+`manage.py checkpoint_inventory` snapshots every product's stock, price and
+cost at the end of a day into StockCheckpoint. Stock at the end of any day D
+is then the product's nearest checkpoint on or before D plus the ledger
+entries recorded after it, so a catalog-wide valuation is one query whose cost
+doesn't grow with the length of the ledger. Products without a checkpoint fall
+back to the ledger balance lookup.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.orders.models import OrderItem
+from apps.products.models import Product
+from .models import InventoryLog, StockCheckpoint
+
+ZERO = Value(Decimal('0.000'), output_field=DecimalField(max_digits=12, decimal_places=3))
+QUANTITY = DecimalField(max_digits=12, decimal_places=3)
+
+
+def end_of_day(day):
+    """First moment after `day` in the current timezone"""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def _last_entry_before(moment):
+    return InventoryLog.objects.filter(
+        product=OuterRef('pk'),
+        timestamp__lt=moment
+    ).order_by('-timestamp', '-sequence')
+
+
+def stock_as_of(day, products=None):
+    """
+    Products annotated with their stock at the end of `day` (`quantity_as_of`)
+    and the checkpoint price/cost to value it with. Evaluates as one query.
+    """
+    end = end_of_day(day)
+    products = Product.objects.all() if products is None else products
+
+    checkpoint = StockCheckpoint.objects.filter(
+        product=OuterRef('pk'),
+        date__lte=day
+    ).order_by('-date')
+    delta = InventoryLog.objects.filter(
+        product=OuterRef('pk'),
+        sequence__gt=OuterRef('checkpoint_sequence'),
+        timestamp__lt=end
+    ).order_by().values('product').annotate(total=Sum('change')).values('total')
+
+    return products.filter(created_at__lt=end).annotate(
+        checkpoint_date=Subquery(checkpoint.values('date')[:1]),
+        checkpoint_quantity=Subquery(checkpoint.values('quantity')[:1]),
+        checkpoint_sequence=Subquery(checkpoint.values('ledger_sequence')[:1]),
+        checkpoint_price=Subquery(checkpoint.values('unit_price')[:1]),
+        checkpoint_cost=Subquery(checkpoint.values('unit_cost')[:1]),
+    ).annotate(
+        quantity_as_of=Case(
+            When(
+                checkpoint_date__isnull=False,
+                then=F('checkpoint_quantity') + Coalesce(Subquery(delta), ZERO)
+            ),
+            default=Coalesce(Subquery(_last_entry_before(end).values('balance_after')[:1]), ZERO),
+            output_field=QUANTITY
+        )
+    )
+
+
+def write_checkpoints(day, batch_size=1000):
+    """Snapshot every product's stock at the end of `day`; returns the number written"""
+    end = end_of_day(day)
+    last_entry = _last_entry_before(end)
+    last_cost = OrderItem.objects.filter(
+        product=OuterRef('pk'),
+        cost_price__isnull=False,
+        order__order_date__lt=end
+    ).order_by('-order__order_date').values('cost_price')[:1]
+
+    rows = Product.objects.filter(created_at__lt=end).annotate(
+        # Products never tracked in the ledger are taken at their current stock
+        ledger_quantity=Coalesce(Subquery(last_entry.values('balance_after')[:1]), F('stock_quantity')),
+        ledger_sequence=Coalesce(Subquery(last_entry.values('sequence')[:1]), Value(0)),
+        last_cost=Subquery(last_cost)
+    ).order_by('pk').values_list('pk', 'ledger_quantity', 'ledger_sequence', 'price', 'last_cost')
+
+    written = 0
+    batch = []
+    for product_id, quantity, sequence, price, cost in rows.iterator(chunk_size=batch_size):
+        batch.append(StockCheckpoint(
+            product_id=product_id,
+            date=day,
+            quantity=quantity,
+            ledger_sequence=sequence,
+            unit_price=price,
+            unit_cost=cost
+        ))
+        if len(batch) >= batch_size:
+            written += _upsert(batch)
+            batch = []
+    if batch:
+        written += _upsert(batch)
+    return written
+
+
+def _upsert(checkpoints):
+    # Re-running the job for a day replaces its checkpoints
+    StockCheckpoint.objects.bulk_create(
+        checkpoints,
+        update_conflicts=True,
+        unique_fields=['product', 'date'],
+        update_fields=['quantity', 'ledger_sequence', 'unit_price', 'unit_cost']
+    )
+    return len(checkpoints)
@@ -1,4 +1,5 @@
 from rest_framework import viewsets
+from rest_framework.exceptions import PermissionDenied
 from .models import InventoryLog
 from .serializers import InventoryLogSerializer
 from apps.users.permissions import IsAdmin, IsAdminOrSupplier
@@ -7,13 +8,23 @@ from rest_framework.permissions import IsAuthenticated
 class InventoryLogViewSet(viewsets.ModelViewSet):
     queryset = InventoryLog.objects.all()
     serializer_class = InventoryLogSerializer
+    # Ledger entries are never edited or deleted
+    http_method_names = ['get', 'post', 'head', 'options']
     
-    """
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action == 'create':
             return [IsAdminOrSupplier()]
         return [IsAuthenticated()]
-    """
+    
+    def perform_create(self, serializer):
+        # Suppliers can only move stock of their own products
+        product = serializer.validated_data['product']
+        if self.request.user.role != 'admin' and (
+            not hasattr(self.request.user, 'supplier_profile')
+            or product.supplier_id != self.request.user.supplier_profile.pk
+        ):
+            raise PermissionDenied("You can only record stock changes for your own products.")
+        serializer.save()
     
     def get_queryset(self):
         # Short-circuit for schema generation
@@ -26,9 +37,8 @@ class InventoryLogViewSet(viewsets.ModelViewSet):
         # Suppliers can only see logs for their products
         elif self.request.user.role == 'supplier' and hasattr(self.request.user, 'supplier_profile'):
             return InventoryLog.objects.filter(product__supplier=self.request.user.supplier_profile)
-        # Retailers can see logs for products they've ordered
+        # Retailers can see logs for products they've ordered (a join on
+        # their purchase set, see orders.PurchasedProduct)
         elif self.request.user.role == 'retailer':
-            return InventoryLog.objects.filter(
-                product__in=self.request.user.orders.values_list('items__product', flat=True).distinct()
-            )
+            return InventoryLog.objects.filter(product__purchasers__user=self.request.user)
         return InventoryLog.objects.none()
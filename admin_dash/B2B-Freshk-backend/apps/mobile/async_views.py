@@ -0,0 +1,128 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+from apps.products.models import Product, ProductCategory
+from .serializers import MobileProductSerializer
+from .views import CatalogThrottle
+
+# Async variants of the public catalog listings, served when ASYNC_READ_VIEWS
+# is on and the app runs under freshk.asgi. Responses match the DRF viewsets,
+# including the PageNumberPagination envelope.
+
+
+async def _apaginate(request, queryset):
+    """
+    Slice one page out of queryset the way PageNumberPagination does.
+    Returns (objects, envelope) or None for an out-of-range page.
+    """
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    try:
+        page_number = int(request.GET.get('page', 1))
+    except ValueError:
+        page_number = 0
+
+    count = await queryset.acount()
+    num_pages = max(1, -(-count // page_size))
+    if page_number < 1 or page_number > num_pages:
+        return None
+
+    offset = (page_number - 1) * page_size
+    objects = [obj async for obj in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, 'page', page_number + 1) if page_number < num_pages else None
+    if page_number <= 1:
+        previous_url = None
+    elif page_number == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', page_number - 1)
+    return objects, {'count': count, 'next': next_url, 'previous': previous_url}
+
+
+def _paginated_response(envelope, results):
+    return JsonResponse({**envelope, 'results': results}, encoder=JSONEncoder)
+
+
+def _invalid_page():
+    return JsonResponse({'detail': 'Invalid page.'}, status=404)
+
+
+async def _throttled(request):
+    """Apply the catalog rate limit the viewsets use; returns a 429 response or None"""
+    throttle = CatalogThrottle()
+    if await sync_to_async(throttle.allow_request)(request, None):
+        return None
+    wait = throttle.wait()
+    response = JsonResponse({'detail': f'Request was throttled. Expected available in {int(wait) + 1} seconds.'}, status=429)
+    response['Retry-After'] = str(int(wait) + 1)
+    return response
+
+
+@require_GET
+async def product_list(request):
+    """Async version of MobileProductViewSet.list"""
+    throttled = await _throttled(request)
+    if throttled:
+        return throttled
+
+    # Filter only active products
+    queryset = Product.objects.filter(is_active=True).select_related('category')
+
+    # Filter by category if provided
+    category_id = request.GET.get('category')
+    if category_id:
+        queryset = queryset.filter(category_id=category_id)
+
+    # Filter by search term if provided
+    search = request.GET.get('search')
+    if search:
+        queryset = queryset.filter(name__icontains=search)
+
+    # Filter by supplier if provided
+    supplier_id = request.GET.get('supplier')
+    if supplier_id:
+        queryset = queryset.filter(supplier_id=supplier_id)
+
+    page = await _apaginate(request, queryset)
+    if page is None:
+        return _invalid_page()
+    objects, envelope = page
+
+    # Image encoding reads files from storage, so keep it off the event loop
+    serializer = MobileProductSerializer(objects, many=True, context={'request': request})
+    results = await sync_to_async(lambda: serializer.data, thread_sensitive=False)()
+    return _paginated_response(envelope, results)
+
+
+@require_GET
+async def category_list(request):
+    """Async version of MobileCategoryViewSet.list"""
+    throttled = await _throttled(request)
+    if throttled:
+        return throttled
+
+    queryset = ProductCategory.objects.annotate(
+        active_product_count=Count('products', filter=Q(products__is_active=True))
+    ).order_by('pk')
+
+    page = await _apaginate(request, queryset)
+    if page is None:
+        return _invalid_page()
+    objects, envelope = page
+
+    results = [
+        {
+            'id': category.id,
+            'name': category.name,
+            'description': category.description,
+            'product_count': category.active_product_count,
+        }
+        for category in objects
+    ]
+    return _paginated_response(envelope, results)
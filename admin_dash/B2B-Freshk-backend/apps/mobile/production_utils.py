@@ -1,11 +1,9 @@
-import random
-import string
-from datetime import datetime, timedelta
-from django.utils import timezone
-from django.conf import settings
 from decouple import config
 import logging
 
+from apps.users.otp_store import get_otp_store, generate_code, PHONE
+from apps.notifications.dispatcher import send_sms
+
 logger = logging.getLogger(__name__)
 
 # Production Twilio integration
@@ -18,15 +16,15 @@ except ImportError:
 
 def generate_production_otp(length=6):
     """Generate a cryptographically secure OTP for production use"""
-    return ''.join(random.choices(string.digits, k=length))
+    return generate_code(length)
 
 def is_production_otp_valid(user, otp):
-    """Check if the OTP is valid for the user in production"""
-    if not user.otp or not user.otp_expiry:
+    """Check if the OTP is valid for the user in production (consumes it if so)"""
+    if not user.phone_number:
         return False
     
-    # Check if OTP matches and has not expired
-    is_valid = user.otp == otp and timezone.now() <= user.otp_expiry
+    # Wrong guesses count against the code's attempt limit
+    is_valid = get_otp_store().verify(PHONE, user.phone_number, otp) is not None
     
     # Log security events
     if not is_valid:
@@ -36,10 +34,13 @@ def is_production_otp_valid(user, otp):
 
 def send_production_otp_via_sms(phone_number, otp):
     """
-    Send OTP via Twilio SMS in production
+    Queue an OTP SMS for delivery via Twilio in production
+    
+    The message is handed to the notification dispatcher, so Twilio latency
+    and retries happen outside the request.
     
     Returns:
-        bool: True if SMS was sent successfully, False otherwise
+        bool: True if the SMS was queued, False if SMS delivery isn't configured
     """
     # Check if Twilio is enabled
     twilio_enabled = config('TWILIO_ENABLED', default=False, cast=bool)
@@ -52,34 +53,26 @@ def send_production_otp_via_sms(phone_number, otp):
         logger.error("Twilio library not installed. Install with: pip install twilio")
         return False
     
+    # Get Twilio credentials from environment
+    account_sid = config('TWILIO_ACCOUNT_SID', default='')
+    auth_token = config('TWILIO_AUTH_TOKEN', default='')
+    twilio_phone = config('TWILIO_PHONE_NUMBER', default='')
+    
+    if not all([account_sid, auth_token, twilio_phone]):
+        logger.error("Missing Twilio credentials in environment variables")
+        return False
+    
     try:
-        # Get Twilio credentials from environment
-        account_sid = config('TWILIO_ACCOUNT_SID', default='')
-        auth_token = config('TWILIO_AUTH_TOKEN', default='')
-        twilio_phone = config('TWILIO_PHONE_NUMBER', default='')
-        
-        if not all([account_sid, auth_token, twilio_phone]):
-            logger.error("Missing Twilio credentials in environment variables")
-            return False
-        
-        # Initialize Twilio client
-        client = Client(account_sid, auth_token)
-        
         # Compose message
         message_body = f"Your FreshK verification code is: {otp}. This code expires in 10 minutes. Do not share this code with anyone."
         
-        # Send SMS
-        message = client.messages.create(
-            body=message_body,
-            from_=twilio_phone,
-            to=phone_number
-        )
+        message = send_sms(phone_number, message_body, sensitive=True)
         
-        logger.info(f"OTP sent successfully to {phone_number}. Message SID: {message.sid}")
+        logger.info(f"OTP queued for {phone_number} (message {message.pk})")
         return True
         
     except Exception as e:
-        logger.error(f"Failed to send OTP to {phone_number}: {str(e)}")
+        logger.error(f"Failed to queue OTP for {phone_number}: {str(e)}")
         return False
 
 def set_production_user_otp(user, expiry_minutes=10):
@@ -93,10 +86,13 @@ def set_production_user_otp(user, expiry_minutes=10):
     Returns:
         str: Generated OTP
     """
-    otp = generate_production_otp()
-    user.otp = otp
-    user.otp_expiry = timezone.now() + timedelta(minutes=expiry_minutes)
-    user.save(update_fields=['otp', 'otp_expiry'])
+    otp = get_otp_store().issue(
+        PHONE,
+        user.phone_number,
+        subject=user.pk,
+        ttl=expiry_minutes * 60,
+        code=generate_production_otp()
+    )
     
     # Log OTP generation for security audit
     logger.info(f"OTP generated for user {user.phone_number}")
@@ -104,10 +100,8 @@ def set_production_user_otp(user, expiry_minutes=10):
     return otp
 
 def clear_user_otp(user):
-    """Clear OTP data from user after successful verification"""
-    user.otp = None
-    user.otp_expiry = None
-    user.save(update_fields=['otp', 'otp_expiry'])
+    """Discard any outstanding OTP for the user"""
+    get_otp_store().discard(PHONE, user.phone_number)
     
     logger.info(f"OTP cleared for user {user.phone_number}")
 
@@ -132,28 +126,3 @@ def validate_phone_number(phone_number):
         return False
     
     return True
-
-def rate_limit_check(user, max_attempts=3, window_minutes=60):
-    """
-    Check if user has exceeded OTP request rate limit
-    
-    Args:
-        user: User instance
-        max_attempts: Maximum OTP requests allowed
-        window_minutes: Time window in minutes
-    
-    Returns:
-        bool: True if within rate limit, False if exceeded
-    """
-    from django.core.cache import cache
-    
-    cache_key = f"otp_rate_limit_{user.id}"
-    attempts = cache.get(cache_key, 0)
-    
-    if attempts >= max_attempts:
-        logger.warning(f"Rate limit exceeded for user {user.phone_number}")
-        return False
-    
-    # Increment counter
-    cache.set(cache_key, attempts + 1, timeout=window_minutes * 60)
-    return True 
\ No newline at end of file
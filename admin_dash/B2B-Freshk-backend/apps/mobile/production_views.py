@@ -1,21 +1,24 @@
 from rest_framework import status, permissions
 from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
-from rest_framework.throttling import AnonRateThrottle
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
+from apps.users.serializers import CustomTokenObtainPairSerializer
 from django.utils import timezone
-from django.db import transaction
 import logging
 
 from .production_utils import (
     set_production_user_otp, 
+    generate_production_otp,
     send_production_otp_via_sms, 
     is_production_otp_valid,
-    clear_user_otp,
-    validate_phone_number,
-    rate_limit_check
+    validate_phone_number
 )
+from apps.users.registrations import (
+    start_registration,
+    cancel_registration,
+    complete_registration
+)
+from freshk.throttling import TokenBucketThrottle, check_rate
 from .serializers import (
     PhoneAuthSerializer,
     PhoneVerifySerializer,
@@ -25,9 +28,8 @@ from .serializers import (
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
-class ProductionOTPThrottle(AnonRateThrottle):
-    """Custom throttle for production OTP requests"""
-    rate = '5/hour'  # 5 requests per hour per IP
+class ProductionOTPThrottle(TokenBucketThrottle):
+    """Custom throttle for production OTP requests (per IP, see DEFAULT_THROTTLE_RATES)"""
     scope = 'production_otp'
 
 @api_view(['POST'])
@@ -57,6 +59,13 @@ def production_phone_auth_request(request):
                 "error": "Invalid phone number format. Please use international format (+1234567890)"
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        # Check rate limiting for this phone number (sign-ups included)
+        if not check_rate('otp_phone', phone_number):
+            logger.warning(f"Rate limit exceeded for phone {phone_number}")
+            return Response({
+                "error": "Too many OTP requests. Please try again later."
+            }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
         # Check if user exists
         user_exists = User.objects.filter(phone_number=phone_number).exists()
 
@@ -64,13 +73,6 @@ def production_phone_auth_request(request):
             # Login flow
             user = User.objects.get(phone_number=phone_number)
             
-            # Check rate limiting for this user
-            if not rate_limit_check(user):
-                logger.warning(f"Rate limit exceeded for user {phone_number}")
-                return Response({
-                    "error": "Too many OTP requests. Please try again later."
-                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-            
             # Generate and send OTP
             otp = set_production_user_otp(user)
             sms_sent = send_production_otp_via_sms(phone_number, otp)
@@ -89,42 +91,23 @@ def production_phone_auth_request(request):
             }, status=status.HTTP_200_OK)
             
         else:
-            # Registration flow - create a temporary user
-            with transaction.atomic():
-                username = f"user_{phone_number.replace('+', '').replace(' ', '')}"
-                
-                # Ensure username is unique
-                counter = 1
-                original_username = username
-                while User.objects.filter(username=username).exists():
-                    username = f"{original_username}_{counter}"
-                    counter += 1
-                
-                user = User.objects.create_user(
-                    username=username,
-                    phone_number=phone_number,
-                    role='retailer',  # Default role for mobile users
-                    is_active=False  # Will be activated after verification
-                )
-                
-                # Generate and send OTP
-                otp = set_production_user_otp(user)
-                sms_sent = send_production_otp_via_sms(phone_number, otp)
-                
-                if not sms_sent:
-                    # Rollback user creation if SMS fails
-                    user.delete()
-                    logger.error(f"Failed to send SMS during registration: {phone_number}")
-                    return Response({
-                        "error": "Failed to send verification code. Please try again."
-                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-                
-                logger.info(f"Production OTP sent for registration: {phone_number}")
+            # Registration flow - the user is only created once the code is verified
+            otp = start_registration(phone_number, code=generate_production_otp())
+            sms_sent = send_production_otp_via_sms(phone_number, otp)
+            
+            if not sms_sent:
+                cancel_registration(phone_number)
+                logger.error(f"Failed to send SMS during registration: {phone_number}")
                 return Response({
-                    "message": "Verification code sent successfully",
-                    "is_new_user": True,
-                    "expires_in": 600  # 10 minutes
-                }, status=status.HTTP_200_OK)
+                    "error": "Failed to send verification code. Please try again."
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            
+            logger.info(f"Production OTP sent for registration: {phone_number}")
+            return Response({
+                "message": "Verification code sent successfully",
+                "is_new_user": True,
+                "expires_in": 600  # 10 minutes
+            }, status=status.HTTP_200_OK)
 
     except Exception as e:
         logger.error(f"Unexpected error in production_phone_auth_request: {str(e)}")
@@ -161,52 +144,50 @@ def production_phone_auth_verify(request):
                 "error": "Invalid phone number format"
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            user = User.objects.get(phone_number=phone_number)
+        user = User.objects.filter(phone_number=phone_number).first()
 
-            if is_production_otp_valid(user, otp):
-                with transaction.atomic():
-                    # Mark phone as verified
-                    user.phone_verified = True
+        if user is None:
+            # New user - create the account from the pending registration
+            user = complete_registration(phone_number, otp)
+            if user is None:
+                logger.warning(f"Invalid or expired registration code for {phone_number}")
+                return Response({
+                    "error": "Invalid or expired verification code"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            logger.info(f"New user registered: {phone_number}")
+        elif not is_production_otp_valid(user, otp):
+            logger.warning(f"Invalid OTP attempt for {phone_number}")
+            return Response({
+                "error": "Invalid or expired verification code"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            # Mark phone as verified
+            user.phone_verified = True
 
-                    # If this is a new user, activate them
-                    if not user.is_active:
-                        user.is_active = True
-                        logger.info(f"New user activated: {phone_number}")
+            # Accounts created inactive before pending registrations existed
+            if not user.is_active:
+                user.is_active = True
+                logger.info(f"New user activated: {phone_number}")
 
-                    # Update last login
-                    user.last_login = timezone.now()
-                    
-                    # Save user changes
-                    user.save(update_fields=['phone_verified', 'is_active', 'last_login'])
-                    
-                    # Clear OTP after successful verification
-                    clear_user_otp(user)
+        # Update last login
+        user.last_login = timezone.now()
+        
+        # Save user changes (the OTP was consumed by the check)
+        user.save(update_fields=['phone_verified', 'is_active', 'last_login'])
 
-                    # Generate JWT tokens
-                    refresh = RefreshToken.for_user(user)
+        # Generate JWT tokens
+        refresh = CustomTokenObtainPairSerializer.get_token(user)
 
-                    # Log successful authentication
-                    logger.info(f"Successful production authentication: {phone_number}")
+        # Log successful authentication
+        logger.info(f"Successful production authentication: {phone_number}")
 
-                    # Return user data and tokens
-                    return Response({
-                        'refresh': str(refresh),
-                        'access': str(refresh.access_token),
-                        'user': MobileUserSerializer(user).data,
-                        'message': 'Authentication successful'
-                    }, status=status.HTTP_200_OK)
-            else:
-                logger.warning(f"Invalid OTP attempt for {phone_number}")
-                return Response({
-                    "error": "Invalid or expired verification code"
-                }, status=status.HTTP_400_BAD_REQUEST)
-                
-        except User.DoesNotExist:
-            logger.warning(f"Verification attempted for non-existent user: {phone_number}")
-            return Response({
-                "error": "No user found with this phone number"
-            }, status=status.HTTP_404_NOT_FOUND)
+        # Return user data and tokens
+        return Response({
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+            'user': MobileUserSerializer(user).data,
+            'message': 'Authentication successful'
+        }, status=status.HTTP_200_OK)
 
     except Exception as e:
         logger.error(f"Unexpected error in production_phone_auth_verify: {str(e)}")
@@ -230,7 +211,7 @@ def production_resend_otp(request):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Check rate limiting
-        if not rate_limit_check(user):
+        if not check_rate('otp_phone', user.phone_number):
             logger.warning(f"Rate limit exceeded for OTP resend: {user.phone_number}")
             return Response({
                 "error": "Too many OTP requests. Please try again later."
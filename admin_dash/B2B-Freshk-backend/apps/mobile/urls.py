@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
+from . import async_views
 from .views import (
     MobileProductViewSet,
     MobileCategoryViewSet,
@@ -32,3 +34,10 @@ urlpatterns = [
     # Production Authentication endpoints (include production URLs)
     path('', include('apps.mobile.production_urls')),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    # Async catalog listings take precedence over the router's list routes
+    urlpatterns = [
+        path('products/', async_views.product_list, name='mobile-products-list'),
+        path('categories/', async_views.category_list, name='productcategory-list'),
+    ] + urlpatterns
@@ -1,13 +1,16 @@
 from rest_framework import viewsets, status, permissions
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
+from apps.users.serializers import CustomTokenObtainPairSerializer
 from django.utils import timezone
 from django.db import transaction
 from decimal import Decimal
 
 from apps.users.utils import set_user_otp, send_otp_via_sms, is_otp_valid
+from apps.users.registrations import start_registration, complete_registration
+from apps.users.views import OTPVerifyThrottle
+from freshk.throttling import TokenBucketThrottle, check_rate
 from apps.products.models import Product, ProductCategory
 from apps.orders.models import Order, OrderItem, PaymentTransaction
 from apps.cart.models import Cart, CartItem
@@ -27,6 +30,16 @@ from .serializers import (
 User = get_user_model()
 
 
+class CatalogThrottle(TokenBucketThrottle):
+    """Public product/category browsing, per user or IP"""
+    scope = 'catalog'
+
+
+class OTPRequestThrottle(TokenBucketThrottle):
+    """OTP requests on the testing auth endpoint, per IP"""
+    scope = 'otp_request'
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def get_current_user(request):
@@ -37,6 +50,7 @@ def get_current_user(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([OTPRequestThrottle])
 def phone_auth_request(request):
     """
     Request OTP for phone authentication (login or registration)
@@ -46,6 +60,13 @@ def phone_auth_request(request):
 
     phone_number = serializer.validated_data['phone_number']
 
+    # Limit codes per number too, so rotating IPs can't flood one phone
+    if not check_rate('otp_phone', phone_number):
+        return Response(
+            {"error": "Too many OTP requests. Please try again later."},
+            status=status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
     # Check if user exists
     user_exists = User.objects.filter(phone_number=phone_number).exists()
 
@@ -59,15 +80,8 @@ def phone_auth_request(request):
             "is_new_user": False
         }, status=status.HTTP_200_OK)
     else:
-        # Registration flow - create a temporary user
-        username = f"user_{phone_number.replace('+', '')}"
-        user = User.objects.create_user(
-            username=username,
-            phone_number=phone_number,
-            role='retailer',  # Default role for mobile users is retailer
-            is_active=False  # Will be activated after verification
-        )
-        otp = set_user_otp(user)
+        # Registration flow - the user is created once the OTP is verified
+        otp = start_registration(phone_number)
         send_otp_via_sms(phone_number, otp)
         return Response({
             "message": "OTP sent successfully",
@@ -77,6 +91,7 @@ def phone_auth_request(request):
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@throttle_classes([OTPVerifyThrottle])
 def phone_auth_verify(request):
     """
     Verify OTP and complete authentication
@@ -87,43 +102,42 @@ def phone_auth_verify(request):
     phone_number = serializer.validated_data['phone_number']
     otp = serializer.validated_data['otp']
 
-    try:
-        user = User.objects.get(phone_number=phone_number)
-
-        if is_otp_valid(user, otp):
-            # Mark phone as verified
-            user.phone_verified = True
+    user = User.objects.filter(phone_number=phone_number).first()
 
-            # If this is a new user, activate them
-            if not user.is_active:
-                user.is_active = True
-
-            # Clear OTP
-            user.otp = None
-            user.otp_expiry = None
-            user.save(update_fields=['phone_verified',
-                      'is_active', 'otp', 'otp_expiry'])
-
-            # Generate tokens
-            refresh = RefreshToken.for_user(user)
-
-            # Return user data and tokens
-            return Response({
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-                'user': MobileUserSerializer(user).data
-            }, status=status.HTTP_200_OK)
-        else:
+    if user is None:
+        # New user - create the account from the pending registration
+        user = complete_registration(phone_number, otp)
+        if user is None:
             return Response(
                 {"error": "Invalid or expired OTP"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-    except User.DoesNotExist:
+    elif is_otp_valid(user, otp):
+        # Mark phone as verified
+        user.phone_verified = True
+
+        # Accounts created inactive before pending registrations existed
+        if not user.is_active:
+            user.is_active = True
+
+        # The OTP itself was consumed by is_otp_valid
+        user.save(update_fields=['phone_verified', 'is_active'])
+    else:
         return Response(
-            {"error": "No user found with this phone number"},
-            status=status.HTTP_404_NOT_FOUND
+            {"error": "Invalid or expired OTP"},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
+    # Generate tokens
+    refresh = CustomTokenObtainPairSerializer.get_token(user)
+
+    # Return user data and tokens
+    return Response({
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+        'user': MobileUserSerializer(user).data
+    }, status=status.HTTP_200_OK)
+
 
 class MobileProductViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -131,6 +145,7 @@ class MobileProductViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = MobileProductSerializer
     permission_classes = [permissions.AllowAny]  # Products can be viewed by anyone
+    throttle_classes = [CatalogThrottle]
 
     def get_queryset(self):
         # Filter only active products
@@ -167,6 +182,7 @@ class MobileCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = ProductCategory.objects.all()
     serializer_class = MobileProductCategorySerializer
     permission_classes = [permissions.AllowAny]  # Categories can be viewed by anyone
+    throttle_classes = [CatalogThrottle]
 
 
 class MobileAddressViewSet(viewsets.ReadOnlyModelViewSet):
@@ -0,0 +1,21 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import OutboundMessage
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = ['channel', 'recipient', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['channel', 'status', 'created_at']
+    search_fields = ['recipient', 'subject', 'provider_id']
+    readonly_fields = ['attempts', 'claimed_at', 'last_error', 'provider_id', 'created_at', 'sent_at']
+    actions = ['retry_now']
+    
+    def retry_now(self, request, queryset):
+        """Requeue failed or pending messages for immediate delivery"""
+        count = queryset.exclude(status=OutboundMessage.SENT).update(
+            status=OutboundMessage.PENDING,
+            next_attempt_at=timezone.now(),
+            attempts=0
+        )
+        self.message_user(request, f'{count} messages requeued.')
+    retry_now.short_description = "Retry selected messages now"
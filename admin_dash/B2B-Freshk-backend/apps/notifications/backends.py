@@ -0,0 +1,149 @@
+"""
+Delivery backends for the notification dispatcher.
+
+A backend turns OutboundMessage rows into provider calls. send_messages()
+receives a batch for one channel and returns one result per message: the
+provider's message id on success, or the exception that made it fail. Backends
+are created once per process and shared by the worker threads, so provider
+clients are kept per thread and reused across batches.
+"""
+
+import json
+import logging
+import threading
+
+from decouple import config
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+try:
+    from twilio.rest import Client
+    TWILIO_AVAILABLE = True
+except ImportError:
+    TWILIO_AVAILABLE = False
+
+
+class BaseBackend:
+    def send_messages(self, messages):
+        results = []
+        for message in messages:
+            try:
+                results.append(self.send(message) or '')
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def send(self, message):
+        raise NotImplementedError
+
+
+class ConsoleBackend(BaseBackend):
+    """
+    Logs messages instead of sending them (development and tests). Bodies are
+    only logged at DEBUG, and never for sensitive messages (OTP codes, reset
+    links).
+    """
+
+    def send(self, message):
+        logger.info(f"[{message.channel}] message {message.pk} to {message.recipient}: {message.subject}")
+        body = '[sensitive, not logged]' if message.sensitive else message.body
+        logger.debug(f"[{message.channel}] message {message.pk} body: {body}")
+        return f'console-{message.pk}'
+
+
+class FileBackend(BaseBackend):
+    """Appends messages as JSON lines to NOTIFICATIONS_FILE_PATH"""
+
+    _lock = threading.Lock()
+
+    def send_messages(self, messages):
+        lines = [
+            json.dumps({
+                'id': message.pk,
+                'channel': message.channel,
+                'recipient': message.recipient,
+                'subject': message.subject,
+                'body': message.body,
+                'sent_at': timezone.now().isoformat(),
+            })
+            for message in messages
+        ]
+        try:
+            with self._lock, open(settings.NOTIFICATIONS_FILE_PATH, 'a', encoding='utf-8') as f:
+                f.write(''.join(f'{line}\n' for line in lines))
+        except OSError as e:
+            return [e] * len(messages)
+        return [f'file-{message.pk}' for message in messages]
+
+
+class TwilioSMSBackend(BaseBackend):
+    """Twilio SMS with one REST client (and HTTP session) per worker thread"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self.from_number = config('TWILIO_PHONE_NUMBER', default='')
+
+    @property
+    def client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            if not TWILIO_AVAILABLE:
+                raise RuntimeError("Twilio library not installed. Install with: pip install twilio")
+            client = Client(
+                config('TWILIO_ACCOUNT_SID', default=''),
+                config('TWILIO_AUTH_TOKEN', default='')
+            )
+            self._local.client = client
+        return client
+
+    def send(self, message):
+        result = self.client.messages.create(
+            body=message.body,
+            from_=self.from_number,
+            to=message.recipient
+        )
+        return result.sid
+
+
+class DjangoEmailBackend(BaseBackend):
+    """Email through Django's EMAIL_BACKEND, one connection per batch"""
+
+    def send_messages(self, messages):
+        results = []
+        connection = get_connection()
+        try:
+            connection.open()
+            for message in messages:
+                email = EmailMessage(
+                    subject=message.subject,
+                    body=message.body,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[message.recipient],
+                    connection=connection
+                )
+                try:
+                    email.send()
+                    results.append(f'email-{message.pk}')
+                except Exception as e:
+                    results.append(e)
+        except Exception as e:
+            # Couldn't connect: every message in the batch failed
+            results.extend([e] * (len(messages) - len(results)))
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        return results
+
+
+def load_backends():
+    """{channel: backend instance} from settings.NOTIFICATION_BACKENDS"""
+    return {
+        channel: import_string(path)()
+        for channel, path in settings.NOTIFICATION_BACKENDS.items()
+    }
@@ -0,0 +1,240 @@
+"""
+Outbound notification dispatcher.
+
+Callers enqueue SMS/email as OutboundMessage rows and return immediately;
+provider latency and outages no longer reach the request. Worker threads
+(`manage.py process_notifications` as a separate process, or
+NOTIFICATION_WORKERS per web process) claim due messages in batches, hand them to the channel's
+backend and record the outcome:
+
+- failures are retried with exponential backoff and jitter, up to
+  NOTIFICATION_MAX_ATTEMPTS attempts;
+- each channel has a circuit breaker: after repeated failures the channel is
+  paused and claimed messages are put back without using up attempts;
+- messages left in 'sending' by a crashed worker are claimed again after
+  NOTIFICATION_CLAIM_TIMEOUT seconds.
+"""
+
+import logging
+import random
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .backends import load_backends
+from .breaker import CircuitBreaker
+from .models import OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+UPDATE_FIELDS = ['status', 'attempts', 'next_attempt_at', 'claimed_at', 'last_error', 'provider_id', 'sent_at', 'body']
+
+
+def retry_delay(attempts):
+    """Seconds before the next attempt after `attempts` failures"""
+    delay = min(
+        settings.NOTIFICATION_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+        settings.NOTIFICATION_RETRY_MAX_DELAY
+    )
+    return delay * random.uniform(0.8, 1.2)
+
+
+class NotificationDispatcher:
+    def __init__(self):
+        self._backends = None
+        self._breakers = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        self._claim_lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    @property
+    def backends(self):
+        if self._backends is None:
+            with self._lock:
+                if self._backends is None:
+                    self._backends = load_backends()
+        return self._backends
+
+    def breaker(self, channel):
+        with self._lock:
+            if channel not in self._breakers:
+                self._breakers[channel] = CircuitBreaker(
+                    failure_threshold=settings.NOTIFICATION_BREAKER_THRESHOLD,
+                    reset_timeout=settings.NOTIFICATION_BREAKER_RESET_TIMEOUT
+                )
+            return self._breakers[channel]
+
+    def enqueue(self, channel, recipient, body, subject='', sensitive=False):
+        """Queue a message; delivery starts once the current transaction commits"""
+        message = OutboundMessage.objects.create(
+            channel=channel,
+            recipient=recipient,
+            subject=subject,
+            body=body,
+            sensitive=sensitive
+        )
+        if settings.NOTIFICATION_WORKERS:
+            self.start()
+            transaction.on_commit(self._wakeup.set)
+        return message
+
+    def claim(self, limit):
+        """Mark up to `limit` due messages as sending and return them"""
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.NOTIFICATION_CLAIM_TIMEOUT)
+        due = (
+            Q(status=OutboundMessage.PENDING, next_attempt_at__lte=now) |
+            Q(status=OutboundMessage.SENDING, claimed_at__lte=stale)
+        )
+        # skip_locked keeps workers in other processes off the same rows (PostgreSQL);
+        # the lock does the same for threads on backends without row locks
+        with self._claim_lock, transaction.atomic():
+            messages = list(
+                OutboundMessage.objects
+                .select_for_update(skip_locked=True)
+                .filter(due)
+                .order_by('next_attempt_at')[:limit]
+            )
+            OutboundMessage.objects.filter(pk__in=[m.pk for m in messages]).update(
+                status=OutboundMessage.SENDING,
+                claimed_at=now
+            )
+        for message in messages:
+            message.status = OutboundMessage.SENDING
+            message.claimed_at = now
+        return messages
+
+    def process_batch(self):
+        """Deliver one batch of due messages; returns how many were claimed"""
+        messages = self.claim(settings.NOTIFICATION_BATCH_SIZE)
+        by_channel = defaultdict(list)
+        for message in messages:
+            by_channel[message.channel].append(message)
+
+        for channel, group in by_channel.items():
+            self._deliver(channel, group)
+
+        if messages:
+            OutboundMessage.objects.bulk_update(messages, UPDATE_FIELDS)
+        return len(messages)
+
+    def _deliver(self, channel, messages):
+        backend = self.backends.get(channel)
+        if backend is None:
+            for message in messages:
+                self._mark_failed(message, f"No backend configured for channel {channel!r}", final=True)
+            return
+
+        breaker = self.breaker(channel)
+        probing = breaker.state == CircuitBreaker.HALF_OPEN
+        if not breaker.allow():
+            self._defer(messages, breaker.retry_after())
+            return
+        if probing:
+            # Only one message tests a recovering provider
+            self._defer(messages[1:], settings.NOTIFICATION_POLL_INTERVAL)
+            messages = messages[:1]
+
+        try:
+            results = backend.send_messages(messages)
+        except Exception as e:
+            results = [e] * len(messages)
+
+        for message, result in zip(messages, results):
+            if isinstance(result, Exception):
+                breaker.record_failure()
+                self._mark_failed(message, str(result))
+            else:
+                breaker.record_success()
+                self._mark_sent(message, result)
+
+    def _mark_sent(self, message, provider_id):
+        message.status = OutboundMessage.SENT
+        message.attempts += 1
+        message.sent_at = timezone.now()
+        message.provider_id = str(provider_id)[:100]
+        message.last_error = ''
+        if message.sensitive:
+            message.body = ''
+
+    def _mark_failed(self, message, error, final=False):
+        message.attempts += 1
+        message.last_error = error
+        if final or message.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+            message.status = OutboundMessage.FAILED
+            if message.sensitive:
+                message.body = ''
+            logger.error(f"Giving up on {message.channel} message {message.pk} to {message.recipient}: {error}")
+        else:
+            message.status = OutboundMessage.PENDING
+            message.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(message.attempts))
+            logger.warning(f"{message.channel} message {message.pk} failed (attempt {message.attempts}): {error}")
+
+    def _defer(self, messages, seconds):
+        """Put claimed messages back without counting an attempt"""
+        next_attempt_at = timezone.now() + timedelta(seconds=seconds)
+        for message in messages:
+            message.status = OutboundMessage.PENDING
+            message.next_attempt_at = next_attempt_at
+
+    def drain(self):
+        """Deliver everything that is due now; returns the number of messages processed"""
+        total = 0
+        while True:
+            processed = self.process_batch()
+            total += processed
+            if processed < settings.NOTIFICATION_BATCH_SIZE:
+                return total
+
+    def run_worker(self):
+        while True:
+            try:
+                processed = self.process_batch()
+            except Exception as e:
+                logger.error(f"Notification worker error: {e}")
+                processed = 0
+            if processed < settings.NOTIFICATION_BATCH_SIZE:
+                # Don't hold a connection while idle
+                connections.close_all()
+                self._wakeup.wait(settings.NOTIFICATION_POLL_INTERVAL)
+                self._wakeup.clear()
+
+    def start(self, workers=None):
+        """Start the worker threads if they are not running yet"""
+        workers = workers or settings.NOTIFICATION_WORKERS
+        if len(self._threads) == workers and all(t.is_alive() for t in self._threads):
+            return
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < workers:
+                thread = threading.Thread(
+                    target=self.run_worker,
+                    name=f'notification-worker-{len(self._threads)}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+
+dispatcher = NotificationDispatcher()
+
+
+def send_sms(phone_number, body, sensitive=False):
+    return dispatcher.enqueue(OutboundMessage.SMS, phone_number, body, sensitive=sensitive)
+
+
+def send_email(recipient, subject, body, sensitive=False):
+    return dispatcher.enqueue(OutboundMessage.EMAIL, recipient, body, subject=subject, sensitive=sensitive)
+
+
+def send_templated_email(recipient, subject, template_name, context, sensitive=False):
+    """Render a template from templates/ and queue it as a plain-text email"""
+    body = render_to_string(template_name, context)
+    return send_email(recipient, subject, body, sensitive=sensitive)
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.notifications.dispatcher import dispatcher
+
+class Command(BaseCommand):
+    help = 'Deliver queued SMS and email notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Deliver everything that is due and exit (e.g. from cron)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Worker threads when running continuously'
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = dispatcher.drain()
+            self.stdout.write(
+                self.style.SUCCESS(f'Processed {processed} messages')
+            )
+            return
+        
+        self.stdout.write(f"Delivering notifications with {options['workers']} workers (Ctrl+C to stop)...")
+        dispatcher.start(options['workers'])
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped')
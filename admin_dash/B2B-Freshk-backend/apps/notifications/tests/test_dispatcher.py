@@ -0,0 +1,172 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.notifications.backends import BaseBackend
+from apps.notifications.breaker import CircuitBreaker
+from apps.notifications.dispatcher import NotificationDispatcher, retry_delay
+from apps.notifications.models import OutboundMessage
+
+
+class FailingBackend(BaseBackend):
+    """A provider that is down"""
+
+    def send(self, message):
+        raise ConnectionError('provider unavailable')
+
+
+FILE_BACKENDS = {
+    'sms': 'apps.notifications.backends.ConsoleBackend',
+    'email': 'apps.notifications.backends.FileBackend',
+}
+FAILING_BACKENDS = {
+    'sms': 'apps.notifications.tests.test_dispatcher.FailingBackend',
+    'email': 'apps.notifications.backends.FileBackend',
+}
+
+
+@override_settings(
+    NOTIFICATION_WORKERS=0,
+    NOTIFICATION_BACKENDS=FILE_BACKENDS,
+    NOTIFICATION_BATCH_SIZE=20,
+    NOTIFICATION_MAX_ATTEMPTS=3,
+    NOTIFICATION_RETRY_BASE_DELAY=10,
+    NOTIFICATION_RETRY_MAX_DELAY=60,
+    NOTIFICATION_CLAIM_TIMEOUT=300,
+    NOTIFICATION_BREAKER_THRESHOLD=2,
+    NOTIFICATION_BREAKER_RESET_TIMEOUT=60,
+)
+class NotificationDispatcherTests(TestCase):
+
+    def setUp(self):
+        handle, self.outbox = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.settings_override = override_settings(NOTIFICATIONS_FILE_PATH=self.outbox)
+        self.settings_override.enable()
+        self.dispatcher = NotificationDispatcher()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        os.remove(self.outbox)
+
+    def sent_emails(self):
+        with open(self.outbox, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_messages_are_delivered_through_their_channel_backend(self):
+        sms = self.dispatcher.enqueue(OutboundMessage.SMS, '+21620000004', 'Your code is 123456', sensitive=True)
+        email = self.dispatcher.enqueue(OutboundMessage.EMAIL, 'r@example.com', 'Welcome', subject='Hello')
+
+        self.assertEqual(self.dispatcher.drain(), 2)
+
+        sms.refresh_from_db()
+        email.refresh_from_db()
+        self.assertEqual((sms.status, sms.attempts, sms.provider_id), (OutboundMessage.SENT, 1, f'console-{sms.pk}'))
+        # Sensitive bodies aren't kept once delivered
+        self.assertEqual(sms.body, '')
+        self.assertEqual(email.status, OutboundMessage.SENT)
+        self.assertEqual(email.body, 'Welcome')
+        [line] = self.sent_emails()
+        self.assertEqual((line['recipient'], line['subject'], line['body']), ('r@example.com', 'Hello', 'Welcome'))
+
+    def test_console_backend_does_not_log_sensitive_bodies(self):
+        self.dispatcher.enqueue(OutboundMessage.SMS, '+21620000004', 'Your code is 123456', sensitive=True)
+        with self.assertLogs('apps.notifications.backends', level='DEBUG') as logs:
+            self.dispatcher.drain()
+        self.assertNotIn('123456', '\n'.join(logs.output))
+
+    def test_retry_delay_backs_off_exponentially_up_to_the_maximum(self):
+        for attempts, base in ((1, 10), (2, 20), (3, 40), (4, 60), (10, 60)):
+            delay = retry_delay(attempts)
+            self.assertGreaterEqual(delay, base * 0.8)
+            self.assertLessEqual(delay, base * 1.2)
+
+    @override_settings(NOTIFICATION_BACKENDS=FAILING_BACKENDS, NOTIFICATION_BREAKER_THRESHOLD=100)
+    def test_failures_are_retried_then_given_up(self):
+        message = self.dispatcher.enqueue(OutboundMessage.SMS, '+21620000004', 'Code 654321', sensitive=True)
+
+        before = timezone.now()
+        self.dispatcher.drain()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboundMessage.PENDING, 1))
+        self.assertIn('provider unavailable', message.last_error)
+        self.assertGreaterEqual(message.next_attempt_at, before + timedelta(seconds=8))
+        # Not due yet
+        self.assertEqual(self.dispatcher.drain(), 0)
+
+        for _ in range(2):
+            OutboundMessage.objects.filter(pk=message.pk).update(next_attempt_at=timezone.now())
+            self.dispatcher.drain()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboundMessage.FAILED, 3))
+        self.assertEqual(message.body, '')
+
+    @override_settings(NOTIFICATION_BACKENDS=FAILING_BACKENDS)
+    def test_open_breaker_defers_messages_without_using_attempts(self):
+        first = [
+            self.dispatcher.enqueue(OutboundMessage.SMS, '+21620000004', f'Message {i}') for i in range(2)
+        ]
+        self.dispatcher.drain()
+        self.assertEqual(self.dispatcher.breaker(OutboundMessage.SMS).state, CircuitBreaker.OPEN)
+
+        later = self.dispatcher.enqueue(OutboundMessage.SMS, '+21620000004', 'Later')
+        email = self.dispatcher.enqueue(OutboundMessage.EMAIL, 'r@example.com', 'Unaffected')
+        self.dispatcher.drain()
+
+        later.refresh_from_db()
+        email.refresh_from_db()
+        self.assertEqual((later.status, later.attempts), (OutboundMessage.PENDING, 0))
+        self.assertGreater(later.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        # Other channels keep flowing
+        self.assertEqual(email.status, OutboundMessage.SENT)
+        for message in first:
+            message.refresh_from_db()
+            self.assertEqual(message.attempts, 1)
+
+    def test_claimed_messages_are_not_claimed_twice(self):
+        for i in range(3):
+            self.dispatcher.enqueue(OutboundMessage.SMS, '+21620000004', f'Message {i}')
+
+        first = self.dispatcher.claim(2)
+        second = self.dispatcher.claim(2)
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({m.pk for m in first} & {m.pk for m in second})
+        self.assertEqual(self.dispatcher.claim(2), [])
+
+    def test_messages_of_a_crashed_worker_are_claimed_again(self):
+        message = self.dispatcher.enqueue(OutboundMessage.SMS, '+21620000004', 'Stuck')
+        self.dispatcher.claim(10)
+        OutboundMessage.objects.filter(pk=message.pk).update(claimed_at=timezone.now() - timedelta(seconds=301))
+
+        [claimed] = self.dispatcher.claim(10)
+        self.assertEqual(claimed.pk, message.pk)
+
+
+class CircuitBreakerTests(TestCase):
+
+    def test_opens_after_threshold_and_probes_once_when_half_open(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+
+        # reset_timeout 0: immediately half-open, one probe at a time
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_failed_probe_opens_again(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        self.assertGreater(breaker.retry_after(), 0)
@@ -7,6 +7,8 @@ from django.db import transaction
 from .models import Order, OrderItem, PaymentTransaction
 from .serializers import OrderSerializer, OrderItemSerializer, PaymentTransactionSerializer
 from apps.users.permissions import IsAdmin
+from apps.inventory.models import InventoryLog
+from apps.inventory.ledger import order_has_movement, record_order_movement
 
 
 class AdminOrderViewSet(viewsets.ModelViewSet):
@@ -48,39 +50,39 @@ class AdminOrderViewSet(viewsets.ModelViewSet):
             if previous_status == 'cancelled' and status_value in ['processing', 'shipped', 'delivered']:
                 # Check if there's enough stock
                 for item in order.items.all():
-                    if item.quantity > item.product.stock_quantity:
+                    available = item.product.available_stock()
+                    if item.quantity > available:
                         return Response(
-                            {"error": f"Not enough stock for {item.product.name}. Available: {item.product.stock_quantity}"},
+                            {"error": f"Not enough stock for {item.product.name}. Available: {available}"},
                             status=status.HTTP_400_BAD_REQUEST
                         )
                         
                 # Reduce inventory when reactivating a cancelled order
                 for item in order.items.all():
-                    product = item.product
-                    product.stock_quantity -= item.quantity
-                    product.save()
-                    
-                    # Create inventory log entry
-                    from apps.inventory.models import InventoryLog
-                    InventoryLog.objects.create(
-                        product=product,
-                        change=-item.quantity,
+                    record_order_movement(
+                        item,
+                        InventoryLog.REACTIVATION,
+                        -item.quantity_in_product_unit,
+                        InventoryLog.SALE,
                         reason=f"Order #{order.id} reactivated"
                     )
             
             # If order is being cancelled and was previously in progress
             elif status_value == 'cancelled' and previous_status in ['pending', 'processing']:
+                # Each order item's stock is returned at most once
+                if order_has_movement(order, InventoryLog.CANCELLATION):
+                    return Response(
+                        {"error": "This order was already cancelled once and its stock returned. Mark it as returned instead."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                
                 # Return items to inventory
                 for item in order.items.all():
-                    product = item.product
-                    product.stock_quantity += item.quantity
-                    product.save()
-                    
-                    # Create inventory log entry
-                    from apps.inventory.models import InventoryLog
-                    InventoryLog.objects.create(
-                        product=product,
-                        change=item.quantity,
+                    record_order_movement(
+                        item,
+                        InventoryLog.CANCELLATION,
+                        item.quantity_in_product_unit,
+                        InventoryLog.RETURN,
                         reason=f"Order #{order.id} cancelled"
                     )
             
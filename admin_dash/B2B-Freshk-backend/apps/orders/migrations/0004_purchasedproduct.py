@@ -0,0 +1,48 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_purchased_products(apps, schema_editor):
+    """One entry per (user, product) found in existing order items"""
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    PurchasedProduct = apps.get_model('orders', 'PurchasedProduct')
+
+    pairs = OrderItem.objects.values_list('order__user_id', 'product_id').order_by().distinct()
+    batch = []
+    for user_id, product_id in pairs.iterator(chunk_size=BATCH_SIZE):
+        batch.append(PurchasedProduct(user_id=user_id, product_id=product_id))
+        if len(batch) >= BATCH_SIZE:
+            PurchasedProduct.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        PurchasedProduct.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_address'),
+        ('products', '0004_product_stock_slots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchasedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_ordered_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchasers', to='products.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchased_products', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'product'), name='purchased_product_user_product')],
+            },
+        ),
+        migrations.RunPython(fill_purchased_products, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from apps.users.models import CustomUser
 from apps.products.models import Product
+from apps.inventory.models import InventoryLog
+from apps.inventory.ledger import record_order_movement
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 import uuid
@@ -136,15 +138,25 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity} {self.unit} of {self.product.name}"
     
+    # Product the row had when loaded, to tell product changes on save
+    _loaded_product_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        item = super().from_db(db, field_names, values)
+        item._loaded_product_id = item.__dict__.get('product_id')
+        return item
+    
     def clean(self):
         # Validate that the product has enough stock
-        product_quantity_in_item_unit = self.product.stock_quantity
+        available = self.product.available_stock()
+        product_quantity_in_item_unit = available
         if self.product.unit != self.unit:
             # Convert between units if necessary
             if self.product.unit == 'kg' and self.unit == 'ton':
-                product_quantity_in_item_unit = self.product.stock_quantity / 1000
+                product_quantity_in_item_unit = available / 1000
             elif self.product.unit == 'ton' and self.unit == 'kg':
-                product_quantity_in_item_unit = self.product.stock_quantity * 1000
+                product_quantity_in_item_unit = available * 1000
                 
         if product_quantity_in_item_unit < self.quantity:
             raise ValidationError({'quantity': f'Not enough stock. Available: {product_quantity_in_item_unit} {self.unit}'})
@@ -167,6 +179,15 @@ class OrderItem(models.Model):
         # Save the item first
         super().save(*args, **kwargs)
         
+        # Keep the orderer's purchase set current (a no-op if already in it);
+        # only new items and items switched to another product can add to it
+        if is_new or self.product_id != self._loaded_product_id:
+            PurchasedProduct.objects.bulk_create(
+                [PurchasedProduct(user_id=self.order.user_id, product_id=self.product_id)],
+                ignore_conflicts=True
+            )
+        self._loaded_product_id = self.product_id
+        
         # Update the order total (only if order exists and has items)
         try:
             if self.order and self.order.pk:
@@ -181,19 +202,19 @@ class OrderItem(models.Model):
         # Update product stock for new items only
         if is_new and self.product:
             try:
-                # Convert units if necessary
-                quantity_in_product_unit = self.quantity
-                if self.product.unit != self.unit:
-                    if self.unit == 'kg' and self.product.unit == 'ton':
-                        quantity_in_product_unit = self.quantity / 1000
-                    elif self.unit == 'ton' and self.product.unit == 'kg':
-                        quantity_in_product_unit = self.quantity * 1000
-                        
-                # Check if enough stock is available
-                if self.product.stock_quantity >= quantity_in_product_unit:
+                quantity_in_product_unit = self.quantity_in_product_unit
+                
+                # Check if enough stock is available (sharded products check
+                # it in the conditional slot update instead)
+                if self.product.stock_slots or self.product.stock_quantity >= quantity_in_product_unit:
                     # Reduce stock
-                    self.product.stock_quantity -= quantity_in_product_unit
-                    self.product.save(update_fields=['stock_quantity', 'updated_at'])
+                    record_order_movement(
+                        self,
+                        InventoryLog.PLACEMENT,
+                        -quantity_in_product_unit,
+                        InventoryLog.SALE,
+                        reason=f"Order #{self.order_id} placed"
+                    )
             except Exception:
                 pass  # Don't fail if stock update fails
     
@@ -202,6 +223,15 @@ class OrderItem(models.Model):
         """Calculate the subtotal for this item"""
         return self.price * self.quantity
     
+    @property
+    def quantity_in_product_unit(self):
+        """Return quantity converted to the product's unit"""
+        if self.unit == 'kg' and self.product.unit == 'ton':
+            return self.quantity / 1000
+        if self.unit == 'ton' and self.product.unit == 'kg':
+            return self.quantity * 1000
+        return self.quantity
+    
     @property
     def quantity_in_kg(self):
         """Return quantity converted to kg"""
@@ -239,6 +269,26 @@ class OrderItem(models.Model):
         ]
 
 
+class PurchasedProduct(models.Model):
+    """
+    Products a user has ever ordered, maintained by OrderItem.save(). Lets
+    retailer-scoped queries join on (user, product) instead of going through
+    all of the user's orders and items. Entries stay when an order is deleted.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='purchased_products')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='purchasers')
+    first_ordered_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user} ordered {self.product.name}"
+
+    class Meta:
+        constraints = [
+            # Also the index behind the retailer scope join
+            models.UniqueConstraint(fields=['user', 'product'], name='purchased_product_user_product'),
+        ]
+
+
 class PaymentTransaction(models.Model):
     PAYMENT_METHOD_CHOICES = (
         ('cash_on_delivery', 'Cash on Delivery'),
@@ -126,9 +126,10 @@ class OrderSerializer(serializers.ModelSerializer):
             product = item_data['product']
             requested_qty = float(item_data['quantity'])
             
-            if product.stock_quantity < requested_qty:
+            available = product.available_stock()
+            if available < requested_qty:
                 raise serializers.ValidationError({
-                    f'items[{i}].quantity': f"Insufficient stock for {product.name}. Available: {product.stock_quantity}, Requested: {requested_qty}"
+                    f'items[{i}].quantity': f"Insufficient stock for {product.name}. Available: {available}, Requested: {requested_qty}"
                 })
                 
         return data
@@ -1,22 +1,30 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from apps.inventory.models import InventoryLog
+from apps.inventory.ledger import record_order_movement
 from .models import Order
 
 @receiver(post_save, sender=Order)
 def handle_order_completion(sender, instance, created, **kwargs):
-    """Auto-deduct stock when order is completed"""
+    """
+    Take stock out for completed order items that don't hold any yet (e.g.
+    placed while out of stock). Items that took their stock when placed are
+    left alone, see record_order_movement().
+    """
     if not created and instance.status == 'completed':
-        # Simple approach - deduct stock for completed orders
-        # Only deduct if this is a status change to completed
-        for item in instance.items.all():
-            # Check if inventory log already exists for this order item
-            existing_logs = item.product.inventory_logs.filter(
-                reason__contains=f"Order #{instance.id} completion"
+        # Items whose completion is already in the ledger (one lookup on the
+        # order index) are skipped without further queries
+        recorded = set(instance.inventory_logs.filter(
+            movement_type=InventoryLog.COMPLETION
+        ).values_list('order_item_id', flat=True))
+        
+        for item in instance.items.select_related('product'):
+            if item.pk in recorded:
+                continue
+            record_order_movement(
+                item,
+                InventoryLog.COMPLETION,
+                -item.quantity_in_product_unit,
+                InventoryLog.SALE,
+                reason=f"Order #{instance.id} completion"
             )
-            
-            # Only deduct if no log exists (prevents double deduction)
-            if not existing_logs.exists():
-                item.product.update_stock(
-                    quantity_change=-int(float(item.quantity)),
-                    reason=f"Order #{instance.id} completion"
-                ) 
\ No newline at end of file
@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from apps.inventory.ledger import current_balance, held_stock, record_order_movement
+from apps.inventory.models import InventoryLog
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Product, ProductCategory
+from apps.users.models import CustomUser
+
+
+class OrderStockMovementTests(TestCase):
+    """Stock leaves once per order item, whatever steps the order goes through"""
+
+    def setUp(self):
+        self.retailer = CustomUser.objects.create_user('retailer', password='pass', role='retailer')
+        category = ProductCategory.objects.create(name='Fruit')
+        self.product = Product.objects.create(
+            name='Apples', price=Decimal('3.00'), unit='kg', stock_quantity=0, sku='APL', category=category
+        )
+        # New products start with 100 in stock (products.signals)
+        order = Order.objects.create(user=self.retailer, total_amount=Decimal('30.00'))
+        self.item = OrderItem.objects.create(order=order, product=self.product, quantity=10)
+        self.order = order
+
+    def stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock_quantity
+
+    def movement(self, movement_type, change):
+        return record_order_movement(self.item, movement_type, change, InventoryLog.SALE)
+
+    def test_placed_and_completed_order_takes_stock_once(self):
+        self.assertEqual(self.stock(), Decimal('90.000'))
+
+        self.order.status = 'completed'
+        self.order.save()
+        self.order.save()
+
+        self.assertEqual(self.stock(), Decimal('90.000'))
+        self.assertEqual(current_balance(self.product.pk), Decimal('90.000'))
+        self.assertFalse(self.item.inventory_logs.filter(movement_type=InventoryLog.COMPLETION).exists())
+        self.assertEqual(held_stock(self.item), Decimal('10.000'))
+
+    def test_cancellation_returns_what_the_item_holds(self):
+        # A wrong quantity from the caller doesn't matter
+        entry = self.movement(InventoryLog.CANCELLATION, 25)
+        self.assertEqual(entry.change, Decimal('10.000'))
+        self.assertEqual(self.stock(), Decimal('100.000'))
+
+        # Nothing left to give back
+        self.assertIsNone(self.movement(InventoryLog.DELETION, 10))
+        self.assertEqual(self.stock(), Decimal('100.000'))
+
+    def test_reactivation_pairs_with_cancellation(self):
+        self.assertIsNone(self.movement(InventoryLog.REACTIVATION, -10))
+        self.assertEqual(self.stock(), Decimal('90.000'))
+
+        self.movement(InventoryLog.CANCELLATION, 10)
+        self.movement(InventoryLog.REACTIVATION, -10)
+        self.assertEqual(self.stock(), Decimal('90.000'))
+        self.assertEqual(held_stock(self.item), Decimal('10.000'))
+
+    def test_completion_takes_stock_of_items_holding_none(self):
+        self.movement(InventoryLog.CANCELLATION, 10)
+
+        self.order.status = 'completed'
+        self.order.save()
+
+        self.assertEqual(self.stock(), Decimal('90.000'))
+        self.assertTrue(self.item.inventory_logs.filter(movement_type=InventoryLog.COMPLETION).exists())
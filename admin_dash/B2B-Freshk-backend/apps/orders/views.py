@@ -7,6 +7,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db import transaction
 from apps.products.models import Product
+from apps.inventory.models import InventoryLog
+from apps.inventory.ledger import record_order_movement
 from rest_framework import serializers
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
@@ -104,23 +106,10 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         # Use transaction to ensure atomicity
         with transaction.atomic():
-            # Update order status
+            # Update order status; the post_save signal records the
+            # completion stock movements (once per item)
             order.status = 'completed'
             order.save()
-            
-            # Update inventory for each item
-            for item in order.items.all():
-                product = item.product
-                product.stock_quantity -= item.quantity
-                product.save()
-                
-                # Create inventory log entry
-                from apps.inventory.models import InventoryLog
-                InventoryLog.objects.create(
-                    product=product,
-                    change=-item.quantity,
-                    reason=f"Order #{order.id} completion"
-                )
         
         # Return updated order
         serializer = self.get_serializer(order)
@@ -148,25 +137,12 @@ class OrderViewSet(viewsets.ModelViewSet):
         with transaction.atomic():
             # Restore product stock for each item before deleting
             for item in order.items.all():
-                product = item.product
-                
-                # Convert units if necessary
-                quantity_in_product_unit = item.quantity
-                if product.unit != item.unit:
-                    if item.unit == 'kg' and product.unit == 'ton':
-                        quantity_in_product_unit = item.quantity / 1000
-                    elif item.unit == 'ton' and product.unit == 'kg':
-                        quantity_in_product_unit = item.quantity * 1000
-                
-                # Restore stock
-                product.stock_quantity += quantity_in_product_unit
-                product.save(update_fields=['stock_quantity', 'updated_at'])
-                
-                # Create inventory log entry
-                from apps.inventory.models import InventoryLog
-                InventoryLog.objects.create(
-                    product=product,
-                    change=quantity_in_product_unit,
+                # Restore the stock the item holds
+                record_order_movement(
+                    item,
+                    InventoryLog.DELETION,
+                    item.quantity_in_product_unit,
+                    InventoryLog.RETURN,
                     reason=f"Order #{order.id} deletion - stock restored"
                 )
             
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_minimum_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_slots',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
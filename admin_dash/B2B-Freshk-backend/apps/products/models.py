@@ -55,6 +55,9 @@ class Product(models.Model):
         validators=[MinValueValidator(Decimal('0'), message="Minimum stock cannot be negative")],
         help_text="Minimum stock level for alerts"
     )
+    # Sharded stock counter: number of StockSlot rows holding this product's
+    # stock (0 = stock is kept on this row only, see apps.inventory.sharding)
+    stock_slots = models.PositiveSmallIntegerField(default=0)
     is_active = models.BooleanField(default=True, help_text="Inactive products won't appear in listings")
     sku = models.CharField(
         max_length=50, 
@@ -91,30 +94,28 @@ class Product(models.Model):
         if self.minimum_stock < 0:
             raise ValidationError({'minimum_stock': 'Minimum stock cannot be negative'})
     
-    def update_stock(self, quantity_change, reason=""):
-        """Update stock and create inventory log"""
+    def update_stock(self, quantity_change, reason="", reason_code=None):
+        """Update stock and record the change in the inventory ledger"""
+        from apps.inventory.ledger import record_movement
         from apps.inventory.models import InventoryLog
         
-        # Update stock quantity
-        old_quantity = self.stock_quantity
-        self.stock_quantity += Decimal(str(quantity_change))
-        
-        # Ensure stock doesn't go negative
-        if self.stock_quantity < 0:
-            self.stock_quantity = Decimal('0')
-        
-        self.updated_at = timezone.now()
-        self.save(update_fields=['stock_quantity', 'updated_at'])
-        
-        # Create inventory log
-        InventoryLog.objects.create(
-            product=self,
-            change=int(quantity_change),
-            reason=reason or f"Stock adjustment"
+        # Stock doesn't go negative; the ledger records the change actually applied
+        record_movement(
+            self,
+            quantity_change,
+            reason_code or InventoryLog.ADJUSTMENT,
+            reason=reason or "Stock adjustment"
         )
         
         return self.stock_quantity
     
+    def available_stock(self):
+        """Stock available right now; sharded products sum their stock slots"""
+        if not self.stock_slots:
+            return self.stock_quantity
+        from apps.inventory.sharding import slot_total
+        return slot_total(self.pk)
+    
     @property
     def is_low_stock(self):
         """Check if product is below minimum stock level"""
@@ -13,3 +13,5 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
+        # Changed with `manage.py shard_stock`, which moves the stock
+        read_only_fields = ['stock_slots']
@@ -1,13 +1,16 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from apps.inventory.models import InventoryLog
 from .models import Product
 
 @receiver(post_save, sender=Product)
 def create_initial_inventory(sender, instance, created, **kwargs):
     """Create initial inventory when a new product is created"""
-    if created:
+    # Fixtures bring their own inventory ledger
+    if created and not kwargs.get('raw'):
         initial_stock = 100  # Set your default initial stock
         instance.update_stock(
             quantity_change=initial_stock,
-            reason="Initial stock for new product"
+            reason="Initial stock for new product",
+            reason_code=InventoryLog.INITIAL
         ) 
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""
+Throttled last-activity tracking.
+
+CustomUser.last_activity used to be auto_now, so it changed on every save of the
+row for whatever reason and never on plain API use. ActivityTrackingMiddleware
+now notes the authenticated user of each request in an in-process table (no
+I/O on the request path). Every USER_ACTIVITY_FLUSH_INTERVAL seconds a
+background thread writes the latest timestamps to the users table with one
+UPDATE ... FROM (VALUES ...), at most once per user per
+USER_ACTIVITY_WRITE_INTERVAL minutes across all workers (claimed in the cache).
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections
+
+from .models import CustomUser
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def _written_key(user_id):
+    return f'activity:written:{user_id}'
+
+
+def write_last_activity(seen):
+    """Bulk-update last_activity from {user_id: datetime}, never moving it backwards"""
+    if not seen:
+        return 0
+    table = connection.ops.quote_name(CustomUser._meta.db_table)
+    placeholders = ', '.join(['(%s, %s)'] * len(seen))
+    params = []
+    for user_id, timestamp in seen.items():
+        params.extend([user_id, connection.ops.adapt_datetimefield_value(timestamp)])
+
+    # VALUES columns are named column1, column2 by PostgreSQL and SQLite 3.33+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET last_activity = v.column2 '
+            f'FROM (VALUES {placeholders}) AS v '
+            f'WHERE {table}.id = v.column1 '
+            f'AND ({table}.last_activity IS NULL OR {table}.last_activity < v.column2)',
+            params
+        )
+        return cursor.rowcount
+
+
+class ActivityTracker:
+    """Per-process table of users seen since their last write, with a flusher thread"""
+
+    def __init__(self):
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def touch(self, user_id, timestamp):
+        self._seen[user_id] = timestamp
+        self._ensure_thread()
+
+    def flush(self):
+        """Write pending activity; returns the number of users written"""
+        with self._lock:
+            seen, self._seen = self._seen, {}
+        if not seen:
+            return 0
+
+        # The first worker to claim a user's write slot writes; the others keep
+        # their entry for a later flush
+        window = settings.USER_ACTIVITY_WRITE_INTERVAL * 60
+        due = {}
+        for user_id, timestamp in seen.items():
+            if cache.add(_written_key(user_id), 1, timeout=window):
+                due[user_id] = timestamp
+            else:
+                with self._lock:
+                    if self._seen.get(user_id, timestamp) <= timestamp:
+                        self._seen[user_id] = timestamp
+
+        items = list(due.items())
+        written = 0
+        for start in range(0, len(items), BATCH_SIZE):
+            try:
+                written += write_last_activity(dict(items[start:start + BATCH_SIZE]))
+            except Exception as e:
+                logger.error(f"Failed to write last activity for {len(items[start:start + BATCH_SIZE])} users: {e}")
+        return written
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='activity-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(settings.USER_ACTIVITY_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Activity flush failed: {e}")
+            finally:
+                # Don't hold a connection between flushes
+                connections.close_all()
+
+
+activity_tracker = ActivityTracker()
+
+atexit.register(activity_tracker.flush)
@@ -0,0 +1,42 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+from .authentication import CachedJWTAuthentication
+
+
+async def aget_jwt_user(request):
+    """
+    Resolve the user behind the request's Bearer token from a plain async view.
+    Returns None when no valid token is supplied.
+    """
+    try:
+        result = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return result[0] if result else None
+
+
+def async_admin_required(view_func):
+    """
+    Async counterpart of the IsAdmin permission for views that run outside DRF.
+    Mirrors DRF's 401/403 response bodies so clients see the same errors.
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_jwt_user(request)
+        if user is None:
+            return JsonResponse(
+                {'detail': 'Authentication credentials were not provided.'},
+                status=401
+            )
+        if user.role != 'admin':
+            return JsonResponse(
+                {'detail': 'You do not have permission to perform this action.'},
+                status=403
+            )
+        request.user = user
+        return await view_func(request, *args, **kwargs)
+    return wrapper
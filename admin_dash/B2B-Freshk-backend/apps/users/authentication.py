@@ -0,0 +1,65 @@
+"""
+JWT authentication with a short-lived user cache.
+
+simplejwt's JWTAuthentication loads the (wide) CustomUser row on every
+authenticated request. CachedJWTAuthentication keeps the resolved user in the
+cache for JWT_USER_CACHE_TTL seconds under a key that includes a per-user
+version number. Saving or deleting a user bumps the version (see signals.py),
+so the next request reloads the row; bumping instead of deleting also stops a
+request that read the old row from caching it again after the change.
+
+Tokens carry role and is_active claims (CustomTokenObtainPairSerializer), so a
+token issued for an inactive account is rejected without any lookup.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+def _version_key(user_id):
+    return f'auth:user_version:{user_id}'
+
+
+def _user_key(user_id, version):
+    return f'auth:user:{user_id}:{version}'
+
+
+def invalidate_cached_user(user_id):
+    """Make cached copies of the user unreachable"""
+    key = _version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Never cached with a version, or evicted: any new value differs from 0
+        cache.set(key, 1, timeout=None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves users from the cache when it can"""
+
+    def get_user(self, validated_token):
+        if validated_token.get('is_active') is False:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        # Revocation checks compare against the current password hash
+        if api_settings.CHECK_REVOKE_TOKEN or not settings.JWT_USER_CACHE_TTL:
+            return super().get_user(validated_token)
+
+        version = cache.get(_version_key(user_id), 0)
+        user_key = _user_key(user_id, version)
+        user = cache.get(user_key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(user_key, user, timeout=settings.JWT_USER_CACHE_TTL)
+        elif not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -7,6 +7,7 @@ from django.utils import timezone
 from django.db.models import Count, Q
 from .models import RetailerProfile, SupplierProfile
 from .serializers import CustomUserSerializer
+from freshk.db_router import read_from_replica
 
 User = get_user_model()
 
@@ -16,6 +17,7 @@ class DashboardUserViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     @action(detail=False, methods=['get'])
+    @read_from_replica
     def statistics(self, request):
         """Get user statistics for dashboard"""
         total_users = User.objects.count()
@@ -28,7 +30,7 @@ class DashboardUserViewSet(viewsets.ModelViewSet):
         new_users = User.objects.filter(date_joined__gte=thirty_days_ago).count()
         
         # Users by role
-        users_by_role = User.objects.values('role').annotate(count=Count('id'))
+        users_by_role = list(User.objects.values('role').annotate(count=Count('id')))
         
         return Response({
             'total_users': total_users,
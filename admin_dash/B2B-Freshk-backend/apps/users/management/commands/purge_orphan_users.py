@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = 'Delete inactive, never-verified users left behind by unfinished phone sign-ups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=24,
+            help='Only purge accounts created at least this many hours ago'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Users deleted per statement'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many users would be deleted'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['older_than'])
+        
+        # Phone sign-ups used to create these before the OTP was verified
+        orphans = User.objects.filter(
+            is_active=False,
+            phone_verified=False,
+            last_login__isnull=True,
+            role='retailer',
+            username__startswith='user_',
+            date_joined__lt=cutoff,
+            orders__isnull=True,
+            addresses__isnull=True,
+            retailer_profile__isnull=True
+        ).order_by('pk')
+        
+        if options['dry_run']:
+            self.stdout.write(f'{orphans.count()} orphaned users would be deleted')
+            return
+        
+        deleted = 0
+        while True:
+            batch = list(orphans.values_list('pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            User.objects.filter(pk__in=batch).delete()
+            deleted += len(batch)
+            self.stdout.write(f'Deleted {deleted} users...')
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {deleted} orphaned users')
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from apps.users.otp_store import get_otp_store
+from apps.users.password_reset import sweep_reset_tokens
+
+class Command(BaseCommand):
+    help = 'Delete expired one-time codes and expired or used password reset tokens'
+
+    def handle(self, *args, **options):
+        # The cache store expires entries by itself, so this is a no-op there
+        deleted = get_otp_store().sweep()
+        tokens = sweep_reset_tokens()
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {deleted} expired codes and {tokens} password reset tokens')
+        )
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.utils import timezone
+
+from .activity import activity_tracker
+
+
+class ActivityTrackingMiddleware:
+    """Record the last time each authenticated user made a request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        # DRF authenticates inside the view and sets request.user on the way
+        user = getattr(request, 'user', None)
+        if settings.USER_ACTIVITY_TRACKING and user is not None and user.is_authenticated:
+            activity_tracker.touch(user.pk, timezone.now())
+
+        return response
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.3 on 2026-10-19 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_useraddress'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customuser',
+            name='otp',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='otp_expiry',
+        ),
+        migrations.CreateModel(
+            name='OTPCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('purpose', models.CharField(max_length=20)),
+                ('key_hash', models.CharField(max_length=64)),
+                ('code_hash', models.CharField(max_length=64)),
+                ('subject', models.CharField(blank=True, max_length=64)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='users_otpco_expires_10477f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('purpose', 'key_hash'), name='unique_otp_code_key')],
+            },
+        ),
+    ]
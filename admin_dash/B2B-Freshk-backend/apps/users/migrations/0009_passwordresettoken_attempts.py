@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_last_activity_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passwordresettoken',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -25,16 +25,13 @@ class CustomUser(AbstractUser):
     )
     phone_verified = models.BooleanField(default=False)
     
-    # For OTP verification
-    otp = models.CharField(max_length=6, blank=True, null=True)
-    otp_expiry = models.DateTimeField(blank=True, null=True)
-    
     # Additional fields for dashboard integration
     profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True)
     last_login_ip = models.GenericIPAddressField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     date_joined = models.DateTimeField(auto_now_add=True)
-    last_activity = models.DateTimeField(auto_now=True)
+    # Maintained by ActivityTrackingMiddleware (see activity.py), not on save
+    last_activity = models.DateTimeField(null=True, blank=True)
     
     # Additional metadata
     notes = models.TextField(blank=True, null=True)
@@ -49,8 +46,50 @@ class CustomUser(AbstractUser):
             models.Index(fields=['role']),
             models.Index(fields=['email']),
             models.Index(fields=['username']),
+            models.Index(fields=['last_activity']),
+        ]
+
+
+class OTPCode(models.Model):
+    """Hashed one-time code used by the database OTP store (see otp_store.py)"""
+    purpose = models.CharField(max_length=20)
+    key_hash = models.CharField(max_length=64)
+    code_hash = models.CharField(max_length=64)
+    subject = models.CharField(max_length=64, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['purpose', 'key_hash'], name='unique_otp_code_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.purpose} code (expires {self.expires_at})"
+
+
+class PasswordResetToken(models.Model):
+    """Single-use password reset token, stored hashed (see password_reset.py)"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='password_reset_tokens')
+    token_hash = models.CharField(max_length=64, unique=True)
+    # Wrong codes entered for this token
+    attempts = models.PositiveSmallIntegerField(default=0)
+    expires_at = models.DateTimeField()
+    used_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at']),
         ]
 
+    def __str__(self):
+        return f"Password reset for {self.user.username} (expires {self.expires_at})"
+
 
 class RetailerProfile(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='retailer_profile')
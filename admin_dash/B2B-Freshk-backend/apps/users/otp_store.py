@@ -0,0 +1,221 @@
+"""
+One-time code storage.
+
+OTPs used to live in the otp/otp_expiry columns of CustomUser, so every code
+request and every failed attempt was a write to the users table. They are kept
+in a separate store instead, and user rows are only written once a code has
+been verified.
+
+Codes are never stored in clear: both the lookup key (usually a phone number)
+and the code are HMAC-SHA256'd with SECRET_KEY. Each code has a TTL and a
+bounded number of verification attempts, and is single use.
+
+OTP_STORE selects the backend:
+- 'cache': Django's cache (use a shared cache such as Redis in production)
+- 'database': the OTPCode table, swept with `manage.py sweep_otp_codes`
+"""
+
+import hashlib
+import hmac
+import logging
+import random
+import string
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Purposes keep codes for different flows apart
+PHONE = 'phone'
+REGISTRATION = 'registration'
+PASSWORD_RESET = 'password_reset'
+
+_random = random.SystemRandom()
+
+
+def generate_code(length=6):
+    """Random numeric code from the OS CSPRNG"""
+    return ''.join(_random.choices(string.digits, k=length))
+
+
+def _digest(*parts):
+    message = ':'.join(str(part) for part in parts).encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def key_hash(purpose, key):
+    return _digest('key', purpose, key)
+
+
+def code_hash(purpose, key, code):
+    return _digest('code', purpose, key, code)
+
+
+class BaseOTPStore:
+    """Interface shared by the OTP store backends"""
+
+    def __init__(self, ttl=None, max_attempts=None):
+        self.ttl = ttl or settings.OTP_TTL_SECONDS
+        self.max_attempts = max_attempts or settings.OTP_MAX_ATTEMPTS
+
+    def issue(self, purpose, key, subject=None, ttl=None, code=None):
+        """
+        Create a code for key, replacing any outstanding one, and return it.
+        subject (defaults to key) is handed back by verify().
+        """
+        code = code or generate_code()
+        self._save(
+            purpose,
+            key_hash(purpose, key),
+            code_hash(purpose, key, code),
+            str(key if subject is None else subject),
+            ttl or self.ttl
+        )
+        return code
+
+    def verify(self, purpose, key, code):
+        """Consume the code; returns its subject, or None if invalid or expired"""
+        return self._check(purpose, key_hash(purpose, key), code_hash(purpose, key, code))
+
+    def discard(self, purpose, key):
+        self._delete(purpose, key_hash(purpose, key))
+
+    def sweep(self):
+        """Delete expired codes; returns how many were removed"""
+        return 0
+
+    def _save(self, purpose, hashed_key, hashed_code, subject, ttl):
+        raise NotImplementedError
+
+    def _check(self, purpose, hashed_key, hashed_code):
+        raise NotImplementedError
+
+    def _delete(self, purpose, hashed_key):
+        raise NotImplementedError
+
+
+class CacheOTPStore(BaseOTPStore):
+    """Codes in Django's cache; expiry is left to the cache itself"""
+
+    prefix = 'otp'
+
+    def _cache_key(self, purpose, hashed_key):
+        return f'{self.prefix}:{purpose}:{hashed_key}'
+
+    def _save(self, purpose, hashed_key, hashed_code, subject, ttl):
+        cache_key = self._cache_key(purpose, hashed_key)
+        cache.set_many({
+            cache_key: {
+                'code': hashed_code,
+                'subject': subject,
+                'expires_at': time.time() + ttl,
+            },
+            f'{cache_key}:attempts': 0,
+        }, timeout=ttl)
+
+    def _check(self, purpose, hashed_key, hashed_code):
+        cache_key = self._cache_key(purpose, hashed_key)
+        entry = cache.get(cache_key)
+        if entry is None or entry['expires_at'] <= time.time():
+            return None
+
+        # incr is atomic on Redis/Memcached, so concurrent guesses are all counted
+        try:
+            attempts = cache.incr(f'{cache_key}:attempts')
+        except ValueError:
+            return None
+        if attempts > self.max_attempts:
+            self._delete(purpose, hashed_key)
+            return None
+
+        if not hmac.compare_digest(entry['code'], hashed_code):
+            if attempts >= self.max_attempts:
+                logger.warning(f"OTP attempts exhausted for {purpose} code, discarding it")
+                self._delete(purpose, hashed_key)
+            return None
+
+        self._delete(purpose, hashed_key)
+        return entry['subject']
+
+    def _delete(self, purpose, hashed_key):
+        cache_key = self._cache_key(purpose, hashed_key)
+        cache.delete_many([cache_key, f'{cache_key}:attempts'])
+
+
+class DatabaseOTPStore(BaseOTPStore):
+    """Codes in the OTPCode table; expired rows are removed by sweep()"""
+
+    def _save(self, purpose, hashed_key, hashed_code, subject, ttl):
+        from .models import OTPCode
+
+        OTPCode.objects.update_or_create(
+            purpose=purpose,
+            key_hash=hashed_key,
+            defaults={
+                'code_hash': hashed_code,
+                'subject': subject,
+                'attempts': 0,
+                'expires_at': timezone.now() + timedelta(seconds=ttl),
+            }
+        )
+
+    def _check(self, purpose, hashed_key, hashed_code):
+        from .models import OTPCode
+
+        entry = OTPCode.objects.filter(
+            purpose=purpose,
+            key_hash=hashed_key,
+            expires_at__gt=timezone.now(),
+            attempts__lt=self.max_attempts
+        ).first()
+        if entry is None:
+            return None
+
+        if not hmac.compare_digest(entry.code_hash, hashed_code):
+            # Conditional update so concurrent guesses can't exceed the limit
+            OTPCode.objects.filter(pk=entry.pk, attempts__lt=self.max_attempts).update(
+                attempts=F('attempts') + 1
+            )
+            return None
+
+        # Only one of several concurrent verifications gets to delete the row
+        deleted, _ = OTPCode.objects.filter(pk=entry.pk, code_hash=hashed_code).delete()
+        return entry.subject if deleted else None
+
+    def _delete(self, purpose, hashed_key):
+        from .models import OTPCode
+
+        OTPCode.objects.filter(purpose=purpose, key_hash=hashed_key).delete()
+
+    def sweep(self):
+        from .models import OTPCode
+
+        deleted, _ = OTPCode.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+OTP_STORE_BACKENDS = {
+    'cache': CacheOTPStore,
+    'database': DatabaseOTPStore,
+}
+
+_store = None
+
+
+def get_otp_store():
+    """The process-wide OTP store selected by settings.OTP_STORE"""
+    global _store
+    if _store is None:
+        try:
+            backend = OTP_STORE_BACKENDS[settings.OTP_STORE]
+        except KeyError:
+            raise ValueError(
+                f"Unknown OTP_STORE {settings.OTP_STORE!r}, expected one of {sorted(OTP_STORE_BACKENDS)}"
+            )
+        _store = backend()
+    return _store
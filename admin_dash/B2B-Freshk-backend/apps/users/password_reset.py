@@ -0,0 +1,102 @@
+"""
+Password reset tokens.
+
+Reset codes are sent by SMS (6 digits) or as an email link. The confirm step
+receives the code together with the phone number or email it was sent to, and
+only that user's outstanding token is checked, so a code can't be matched
+against every user's. Tokens are kept HMAC'd in PasswordResetToken, are single
+use, expire after PASSWORD_RESET_TTL_SECONDS and are discarded after
+PASSWORD_RESET_MAX_ATTEMPTS wrong codes. `manage.py sweep_otp_codes` deletes
+them afterwards.
+"""
+
+import hmac
+import logging
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import PasswordResetToken
+from .otp_store import generate_code, key_hash, PASSWORD_RESET
+
+logger = logging.getLogger(__name__)
+
+# Outstanding tokens must be unique, so retry the rare colliding code
+MAX_ISSUE_ATTEMPTS = 5
+
+
+def token_hash(token):
+    return key_hash(PASSWORD_RESET, token)
+
+
+def issue_reset_token(user, length=6, numeric=True):
+    """
+    Create a reset token for user, revoking earlier unused ones; returns the token.
+    Numeric tokens are typed from an SMS; others are URL-safe strings for links.
+    """
+    expires_at = timezone.now() + timedelta(seconds=settings.PASSWORD_RESET_TTL_SECONDS)
+    PasswordResetToken.objects.filter(user=user, used_at__isnull=True).delete()
+
+    for _ in range(MAX_ISSUE_ATTEMPTS):
+        token = generate_code(length) if numeric else secrets.token_urlsafe(length)
+        try:
+            with transaction.atomic():
+                PasswordResetToken.objects.create(
+                    user=user,
+                    token_hash=token_hash(token),
+                    expires_at=expires_at
+                )
+            return token
+        except IntegrityError:
+            continue
+
+    raise RuntimeError("Could not generate a unique password reset token")
+
+
+def consume_reset_token(user, token):
+    """
+    Mark the user's outstanding token used and return True if `token` matches
+    it. A wrong token counts as an attempt; after PASSWORD_RESET_MAX_ATTEMPTS
+    the token is no longer accepted.
+    """
+    now = timezone.now()
+    max_attempts = settings.PASSWORD_RESET_MAX_ATTEMPTS
+    reset_token = PasswordResetToken.objects.filter(
+        user=user,
+        used_at__isnull=True,
+        expires_at__gt=now,
+        attempts__lt=max_attempts
+    ).order_by('-created_at').first()
+    if reset_token is None:
+        return False
+
+    if not hmac.compare_digest(reset_token.token_hash, token_hash(token)):
+        # Conditional update so concurrent guesses can't exceed the limit
+        PasswordResetToken.objects.filter(pk=reset_token.pk, attempts__lt=max_attempts).update(
+            attempts=F('attempts') + 1
+        )
+        if reset_token.attempts + 1 >= max_attempts:
+            logger.warning(f"Password reset attempts exhausted for user {user.pk}, token discarded")
+        return False
+
+    # Conditional update so a token can't be redeemed twice concurrently
+    claimed = PasswordResetToken.objects.filter(
+        pk=reset_token.pk, used_at__isnull=True, attempts__lt=max_attempts
+    ).update(used_at=now)
+    if not claimed:
+        return False
+
+    logger.info(f"Password reset token used for user {user.pk}")
+    return True
+
+
+def sweep_reset_tokens():
+    """Delete expired and used tokens; returns how many were removed"""
+    deleted, _ = PasswordResetToken.objects.filter(
+        Q(expires_at__lte=timezone.now()) | Q(used_at__isnull=False)
+    ).delete()
+    return deleted
@@ -0,0 +1,69 @@
+"""
+Pending phone sign-ups.
+
+Requesting an OTP for an unknown phone number used to create an inactive
+CustomUser straight away, so every bot request or mistyped number left a junk
+row in the users table. A pending registration is now just a REGISTRATION code
+in the OTP store (bounded by its TTL, swept with the other codes), and the user
+is only created once that code has been verified.
+"""
+
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+
+from .otp_store import get_otp_store, REGISTRATION
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def registration_username(phone_number):
+    """A free username derived from the phone number"""
+    username = f"user_{phone_number.replace('+', '').replace(' ', '')}"
+    candidate = username
+    counter = 1
+    while User.objects.filter(username=candidate).exists():
+        candidate = f"{username}_{counter}"
+        counter += 1
+    return candidate
+
+
+def start_registration(phone_number, expiry_minutes=10, code=None):
+    """Open (or restart) a pending registration; returns the OTP to send"""
+    return get_otp_store().issue(
+        REGISTRATION,
+        phone_number,
+        ttl=expiry_minutes * 60,
+        code=code
+    )
+
+
+def cancel_registration(phone_number):
+    get_otp_store().discard(REGISTRATION, phone_number)
+
+
+def complete_registration(phone_number, otp, role='retailer'):
+    """
+    Verify the sign-up code and create the (active, phone-verified) user.
+    Returns the user, or None if there is no valid pending registration.
+    """
+    if get_otp_store().verify(REGISTRATION, phone_number, otp) is None:
+        return None
+
+    try:
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=registration_username(phone_number),
+                phone_number=phone_number,
+                role=role,
+                phone_verified=True
+            )
+    except IntegrityError:
+        # A concurrent verification for the same number won the race
+        user = User.objects.get(phone_number=phone_number)
+
+    logger.info(f"Registration completed for {phone_number}")
+    return user
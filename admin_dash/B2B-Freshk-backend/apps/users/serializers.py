@@ -13,6 +13,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         # Add custom claims
         token['username'] = user.username
         token['role'] = user.role
+        token['is_active'] = user.is_active
         return token
 
 
@@ -66,11 +67,16 @@ class PasswordResetRequestSerializer(serializers.Serializer):
 
 
 class PasswordResetConfirmSerializer(serializers.Serializer):
+    # The email or phone number the token was sent to
+    email = serializers.EmailField(required=False)
+    phone_number = serializers.CharField(required=False)
     token = serializers.CharField()
     password = serializers.CharField(write_only=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True)
 
     def validate(self, attrs):
+        if not attrs.get('email') and not attrs.get('phone_number'):
+            raise serializers.ValidationError("Either email or phone_number must be provided")
         if attrs['password'] != attrs['password2']:
             raise serializers.ValidationError({"password": "Password fields didn't match."})
         return attrs
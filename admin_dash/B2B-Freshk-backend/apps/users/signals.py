@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import CustomUser
+from .authentication import invalidate_cached_user
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_authentication_cache(sender, instance, **kwargs):
+    """Drop the cached user used by JWT authentication when the user changes"""
+    invalidate_cached_user(instance.pk)
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.users.activity import activity_tracker, write_last_activity
+from apps.users.models import CustomUser
+
+
+class ActivityTrackingTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('retailer', password='pass', role='retailer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_tracking_is_off_under_tests(self):
+        self.client.get('/api/users/profile/')
+        self.assertEqual(activity_tracker.flush(), 0)
+
+    @override_settings(USER_ACTIVITY_TRACKING=True)
+    def test_requests_are_written_on_flush(self):
+        self.client.get('/api/users/profile/')
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_activity)
+
+        self.assertEqual(activity_tracker.flush(), 1)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_activity)
+
+    def test_last_activity_never_moves_backwards(self):
+        now = timezone.now()
+        write_last_activity({self.user.pk: now})
+        self.assertEqual(write_last_activity({self.user.pk: now - timedelta(minutes=1)}), 0)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_activity, now)
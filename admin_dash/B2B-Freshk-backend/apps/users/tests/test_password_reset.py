@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.users.models import CustomUser, PasswordResetToken
+from apps.users.password_reset import issue_reset_token
+from freshk.throttling import reset_buckets
+
+URL = '/api/users/password_reset_confirm/'
+PHONE = '+21620000001'
+
+
+class PasswordResetConfirmTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            'retailer', password='old-Passw0rd!', role='retailer', phone_number=PHONE, email='r@example.com'
+        )
+        self.other = CustomUser.objects.create_user(
+            'other', password='old-Passw0rd!', role='retailer', phone_number='+21620000002'
+        )
+        self.code = issue_reset_token(self.user)
+        reset_buckets()
+        self.client = APIClient()
+
+    def confirm(self, token, **identifier):
+        return self.client.post(URL, {
+            'token': token, 'password': 'new-Passw0rd!', 'password2': 'new-Passw0rd!', **identifier
+        }, format='json')
+
+    def wrong_code(self):
+        return '000000' if self.code != '000000' else '111111'
+
+    def test_code_resets_the_password_of_its_account(self):
+        response = self.confirm(self.code, phone_number=PHONE)
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('new-Passw0rd!'))
+        # Single use
+        self.assertEqual(self.confirm(self.code, phone_number=PHONE).status_code, 400)
+
+    def test_identifier_is_required(self):
+        self.assertEqual(self.confirm(self.code).status_code, 400)
+
+    def test_code_is_only_checked_against_its_account(self):
+        response = self.confirm(self.code, phone_number=self.other.phone_number)
+        self.assertEqual(response.status_code, 400)
+        self.other.refresh_from_db()
+        self.assertTrue(self.other.check_password('old-Passw0rd!'))
+
+    def test_email_link_token(self):
+        token = issue_reset_token(self.user, length=32, numeric=False)
+        self.assertEqual(self.confirm(token, email='r@example.com').status_code, 200)
+
+    def test_token_discarded_after_max_attempts(self):
+        for _ in range(settings.PASSWORD_RESET_MAX_ATTEMPTS):
+            self.assertEqual(self.confirm(self.wrong_code(), phone_number=PHONE).status_code, 400)
+        self.assertEqual(PasswordResetToken.objects.get(user=self.user).attempts, settings.PASSWORD_RESET_MAX_ATTEMPTS)
+
+        # Even the right code no longer works
+        self.assertEqual(self.confirm(self.code, phone_number=PHONE).status_code, 400)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('old-Passw0rd!'))
+
+    def test_confirmations_are_throttled(self):
+        rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'password_reset': '2/hour'}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            self.confirm(self.wrong_code(), phone_number=PHONE)
+            self.confirm(self.wrong_code(), phone_number=PHONE)
+            self.assertEqual(self.confirm(self.code, phone_number=PHONE).status_code, 429)
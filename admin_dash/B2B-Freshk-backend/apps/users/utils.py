@@ -1,11 +1,7 @@
-import random
-import string
-from datetime import datetime, timedelta
-from django.utils import timezone
-from django.conf import settings
-from decouple import config
 import logging
 
+from .otp_store import get_otp_store, generate_code, PHONE
+
 # Set up logger
 logger = logging.getLogger(__name__)
 
@@ -14,15 +10,13 @@ TWILIO_AVAILABLE = False
 
 def generate_otp(length=6):
     """Generate a random OTP of specified length"""
-    return ''.join(random.choices(string.digits, k=length))
+    return generate_code(length)
 
 def is_otp_valid(user, otp):
-    """Check if the OTP is valid for the user"""
-    if not user.otp or not user.otp_expiry:
+    """Check the user's OTP; a valid code is consumed and can't be reused"""
+    if not user.phone_number:
         return False
-    
-    # Check if OTP matches and has not expired
-    return user.otp == otp and timezone.now() <= user.otp_expiry
+    return get_otp_store().verify(PHONE, user.phone_number, otp) is not None
 
 def send_otp_via_sms(phone_number, otp):
     """
@@ -39,9 +33,5 @@ def send_otp_via_sms(phone_number, otp):
     return True
 
 def set_user_otp(user, expiry_minutes=10):
-    """Generate and set OTP for a user"""
-    otp = generate_otp()
-    user.otp = otp
-    user.otp_expiry = timezone.now() + timedelta(minutes=expiry_minutes)
-    user.save(update_fields=['otp', 'otp_expiry'])
-    return otp
+    """Generate an OTP for the user's phone number (the user row is not written)"""
+    return get_otp_store().issue(PHONE, user.phone_number, subject=user.pk, ttl=expiry_minutes * 60)
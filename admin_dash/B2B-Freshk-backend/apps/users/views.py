@@ -3,8 +3,9 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.utils import timezone
+from django.conf import settings
+from urllib.parse import urlencode
 from rest_framework.exceptions import ValidationError
 
 from .models import RetailerProfile, SupplierProfile, Supplier, UserAddress
@@ -24,10 +25,23 @@ from .serializers import (
     UserDetailUpdateSerializer
 )
 from .utils import set_user_otp, send_otp_via_sms, is_otp_valid
+from .password_reset import issue_reset_token, consume_reset_token
+from apps.notifications.dispatcher import send_templated_email
+from freshk.throttling import TokenBucketThrottle
 
 User = get_user_model()
 
 
+class PasswordResetThrottle(TokenBucketThrottle):
+    """Password reset codes entered, per IP"""
+    scope = 'password_reset'
+
+
+class OTPVerifyThrottle(TokenBucketThrottle):
+    """OTP codes entered for verification or login, per IP"""
+    scope = 'otp_verify'
+
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
@@ -36,6 +50,13 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
 
+    def get_throttles(self):
+        if self.action == 'password_reset_confirm':
+            return [PasswordResetThrottle()]
+        if self.action in ['phone_verification_confirm', 'phone_login']:
+            return [OTPVerifyThrottle()]
+        return super().get_throttles()
+
     def get_permissions(self):
         # Public endpoints - no authentication required
         if self.action in ['create', 'phone_verification_request', 'phone_verification_confirm', 'phone_login', 'password_reset_request', 'password_reset_confirm']:
@@ -94,10 +115,7 @@ class UserViewSet(viewsets.ModelViewSet):
 
             if is_otp_valid(user, otp):
                 user.phone_verified = True
-                user.otp = None
-                user.otp_expiry = None
-                user.save(update_fields=[
-                          'phone_verified', 'otp', 'otp_expiry'])
+                user.save(update_fields=['phone_verified'])
 
                 return Response({"message": "Phone number verified successfully"}, status=status.HTTP_200_OK)
             else:
@@ -128,14 +146,10 @@ class UserViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
+            # The code is consumed by a successful check
             if is_otp_valid(user, otp):
-                # Clear OTP after successful login
-                user.otp = None
-                user.otp_expiry = None
-                user.save(update_fields=['otp', 'otp_expiry'])
-
                 # Generate tokens
-                refresh = RefreshToken.for_user(user)
+                refresh = CustomTokenObtainPairSerializer.get_token(user)
 
                 return Response({
                     'refresh': str(refresh),
@@ -165,7 +179,17 @@ class UserViewSet(viewsets.ModelViewSet):
         if email:
             try:
                 user = User.objects.get(email=email)
-                # Send password reset email (implementation not shown)
+                token = issue_reset_token(user, length=32, numeric=False)
+                send_templated_email(
+                    user.email,
+                    "Reset your FreshK password",
+                    'users/password_reset_email.html',
+                    {
+                        'user': user,
+                        'reset_url': f"{settings.PASSWORD_RESET_URL}?{urlencode({'email': user.email, 'token': token})}",
+                    },
+                    sensitive=True
+                )
                 return Response({"message": "Password reset email sent"}, status=status.HTTP_200_OK)
             except User.DoesNotExist:
                 pass  # Don't reveal if email exists or not
@@ -174,7 +198,7 @@ class UserViewSet(viewsets.ModelViewSet):
         if phone_number:
             try:
                 user = User.objects.get(phone_number=phone_number)
-                otp = set_user_otp(user)
+                otp = issue_reset_token(user)
                 send_otp_via_sms(phone_number, otp)
                 return Response({"message": "OTP sent for password reset"}, status=status.HTTP_200_OK)
             except User.DoesNotExist:
@@ -188,34 +212,28 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = PasswordResetConfirmSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
+        email = serializer.validated_data.get('email')
+        phone_number = serializer.validated_data.get('phone_number')
         token = serializer.validated_data.get('token')
         password = serializer.validated_data.get('password')
 
-        # For phone-based reset, the token is actually the OTP
-        # Try to find a user with this OTP
-        try:
-            user = User.objects.get(otp=token)
-
-            if is_otp_valid(user, token):
-                # Reset the password
-                user.set_password(password)
-                # Clear OTP after password reset
-                user.otp = None
-                user.otp_expiry = None
-                user.save(update_fields=['password', 'otp', 'otp_expiry'])
-
-                return Response({"message": "Password reset successful"}, status=status.HTTP_200_OK)
-            else:
-                return Response(
-                    {"error": "Invalid or expired token"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-        except User.DoesNotExist:
+        # The token is only checked against the account it was sent to
+        if email:
+            user = User.objects.filter(email=email).first()
+        else:
+            user = User.objects.filter(phone_number=phone_number).first()
+        if user is None or not consume_reset_token(user, token):
             return Response(
-                {"error": "Invalid token"},
+                {"error": "Invalid or expired token"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Reset the password
+        user.set_password(password)
+        user.save(update_fields=['password'])
+
+        return Response({"message": "Password reset successful"}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get', 'put', 'patch'])
     def profile(self, request):
         """Get or update current user's profile"""
@@ -0,0 +1,111 @@
+"""
+Database routing for the optional read replica.
+
+When DATABASE_REPLICA_URL is set, a second alias named ``replica`` is
+configured. Reads are sent to it only inside code explicitly marked as
+read-only (``use_replica()``, ``@read_from_replica`` or ``ReplicaReadMixin``),
+so checkout and every other write path keeps reading from the primary.
+
+Read-your-writes: once a marked block performs a write, the rest of that block
+reads from the primary again, and reads inside a transaction on the primary
+never leave it.
+"""
+
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = 'replica'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+_wrote_to_primary = contextvars.ContextVar('wrote_to_primary', default=False)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """Send reads made inside the block to the replica, if one is configured"""
+    reads_token = _replica_reads.set(True)
+    wrote_token = _wrote_to_primary.set(False)
+    try:
+        yield
+    finally:
+        _wrote_to_primary.reset(wrote_token)
+        _replica_reads.reset(reads_token)
+
+
+def read_from_replica(func):
+    """Decorator form of use_replica() for views, viewset actions and helpers"""
+    if iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with use_replica():
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaReadMixin:
+    """
+    Viewset mixin that serves the safe (GET/HEAD/OPTIONS) requests of the
+    actions listed in `replica_actions` from the replica. Only list pure
+    reads: actions that compute something and store it would persist what the
+    lagging replica returned. Writes made by a listed action still go to the
+    primary and pin the rest of the request to it.
+    """
+
+    replica_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        # action_map is set by as_view() before dispatch; self.action isn't yet
+        action = getattr(self, 'action_map', {}).get(request.method.lower())
+        if request.method not in SAFE_METHODS or action not in self.replica_actions:
+            return super().dispatch(request, *args, **kwargs)
+        with use_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            # Responses may hold lazy querysets; render while still routed
+            # to the replica instead of after the view has returned
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            return response
+
+
+class ReplicaRouter:
+    """Route marked reads to the replica and everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or _wrote_to_primary.get():
+            return None
+        if not replica_configured():
+            return None
+        # Stay on the primary while a transaction is open there
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if _replica_reads.get():
+            _wrote_to_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema through replication
+        return db != REPLICA_DB_ALIAS
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import sys
 from decouple import config, Csv
 import dj_database_url
 
@@ -31,6 +32,9 @@ SECRET_KEY = config('SECRET_KEY', default='django-insecure-*5-uq5pyf(*%&1s&sx^-d
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = config('DEBUG', default=True, cast=bool)
 
+# Running under `manage.py test`
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 # Render production environment detection
 if 'RENDER' in os.environ:
     DEBUG = False
@@ -118,6 +122,7 @@ INSTALLED_APPS = [
     'apps.cart',       # Handles shopping cart functionality
     'apps.apk_updates', # Handles APK version management
     'apps.mobile',     # Handles mobile-specific functionality
+    'apps.notifications', # Handles queued SMS/email delivery
 ]
 
 MIDDLEWARE = [
@@ -130,6 +135,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.users.middleware.ActivityTrackingMiddleware',
+    'freshk.throttling.RateLimitHeadersMiddleware',
 ]
 
 ROOT_URLCONF = 'freshk.urls'
@@ -160,9 +167,26 @@ WSGI_APPLICATION = 'freshk.wsgi.application'
 # Use DATABASE_URL if provided, otherwise use individual connection parameters
 DATABASE_URL = config('DATABASE_URL')
 
+# Connection reuse. By default each worker thread keeps a persistent connection
+# for DB_CONN_MAX_AGE seconds and checks it before reuse. With DB_POOL=True a
+# psycopg3 connection pool is shared by the threads of each gunicorn worker
+# instead. DB_PGBOUNCER=True makes the settings safe behind PgBouncer in
+# transaction pooling mode.
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=600, cast=int)
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=config('GUNICORN_THREADS', default=4, cast=int), cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=int)
+DB_PGBOUNCER = config('DB_PGBOUNCER', default=False, cast=bool)
+
 if DATABASE_URL:
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL, conn_max_age=600, ssl_require=True)
+        'default': dj_database_url.parse(
+            DATABASE_URL,
+            conn_max_age=DB_CONN_MAX_AGE,
+            conn_health_checks=True,
+            ssl_require=DATABASE_URL.startswith('postgres')
+        )
     }
 else:
     DATABASES = {
@@ -173,12 +197,66 @@ else:
             'PASSWORD': config('DB_PASSWORD', default='khchin'),
             'HOST': config('DB_HOST', default='localhost'),
             'PORT': config('DB_PORT', default=''),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
             'OPTIONS': {
                 'sslmode': 'require',
             } if 'neon.tech' in config('DB_HOST', default='localhost') else {},
         }
     }
 
+# Optional read replica. Heavy read-only endpoints (analytics dashboards,
+# inventory summaries, user statistics) are marked to read from it, see
+# freshk/db_router.py. Tests mirror it onto the default database.
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True,
+        ssl_require=DATABASE_REPLICA_URL.startswith('postgres')
+    )
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['freshk.db_router.ReplicaRouter']
+
+for database in DATABASES.values():
+    if DB_POOL:
+        # The pool owns connection lifetime, Django must not keep its own.
+        # CONN_HEALTH_CHECKS makes Django check pooled connections on checkout.
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+
+    if DB_PGBOUNCER:
+        # Server-side cursors do not survive transaction pooling
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+
+# Cache
+# Rate limits, OTP codes (OTP_STORE='cache') and the JWT user cache are only
+# shared between workers with a shared cache. Set CACHE_URL to a Redis URL in
+# production; without it each process has its own local-memory cache.
+CACHE_URL = config('CACHE_URL', default='')
+
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -224,6 +302,53 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# APK downloads: let the reverse proxy send the file bytes instead of a
+# Django worker. '' serves from Django, 'nginx' sets X-Accel-Redirect,
+# 'apache' sets X-Sendfile (see APK_UPDATES_README.md).
+APK_DOWNLOAD_OFFLOAD = config('APK_DOWNLOAD_OFFLOAD', default='')
+# Internal nginx location that aliases MEDIA_ROOT
+APK_ACCEL_REDIRECT_PREFIX = config('APK_ACCEL_REDIRECT_PREFIX', default='/protected-media/')
+
+# Precompute bsdiff patches from this many previous active versions to every
+# newly uploaded APK (0 disables patch generation)
+APK_PATCH_PREVIOUS_VERSIONS = config('APK_PATCH_PREVIOUS_VERSIONS', default=3, cast=int)
+
+# Update checks: seconds other worker processes may serve a cached latest
+# version after it changed, and UpdateLog write buffering
+APK_UPDATE_CACHE_TTL = config('APK_UPDATE_CACHE_TTL', default=60, cast=int)
+# Not under `manage.py test`: the flusher thread would write to the test
+# database behind the test cases' backs
+APK_UPDATE_LOG_BUFFERED = config('APK_UPDATE_LOG_BUFFERED', default=True, cast=bool) and not TESTING
+APK_UPDATE_LOG_FLUSH_INTERVAL = config('APK_UPDATE_LOG_FLUSH_INTERVAL', default=2.0, cast=float)
+
+# Sharded stock counters (see INVENTORY.md): the rebalancer folds pending slot
+# movements into the ledger and evens out slots every interval. Run it as one
+# separate process with `manage.py rebalance_stock --loop`; setting
+# INVENTORY_REBALANCE_IN_PROCESS=True runs it in every web process instead
+# (single-process development setups only).
+INVENTORY_REBALANCE_IN_PROCESS = config('INVENTORY_REBALANCE_IN_PROCESS', default=False, cast=bool)
+INVENTORY_REBALANCE_INTERVAL = config('INVENTORY_REBALANCE_INTERVAL', default=5.0, cast=float)
+
+# Demand forecasts (`manage.py forecast_demand`, see INVENTORY.md): days of
+# sales history, moving-average window, smoothing factor, supplier lead time
+# in days and the safety stock z-score (1.65 ~ 95% service level)
+INVENTORY_FORECAST_HISTORY_DAYS = config('INVENTORY_FORECAST_HISTORY_DAYS', default=56, cast=int)
+INVENTORY_FORECAST_WINDOW = config('INVENTORY_FORECAST_WINDOW', default=14, cast=int)
+INVENTORY_FORECAST_ALPHA = config('INVENTORY_FORECAST_ALPHA', default=0.3, cast=float)
+INVENTORY_FORECAST_LEAD_DAYS = config('INVENTORY_FORECAST_LEAD_DAYS', default=2, cast=int)
+INVENTORY_FORECAST_SERVICE_Z = config('INVENTORY_FORECAST_SERVICE_Z', default=1.65, cast=float)
+
+# One-time codes: 'database' (OTPCode table) or 'cache' (needs a cache shared
+# by all workers, e.g. Redis). Codes expire after OTP_TTL_SECONDS and are
+# discarded after OTP_MAX_ATTEMPTS wrong guesses.
+OTP_STORE = config('OTP_STORE', default='database')
+OTP_TTL_SECONDS = config('OTP_TTL_SECONDS', default=600, cast=int)
+OTP_MAX_ATTEMPTS = config('OTP_MAX_ATTEMPTS', default=5, cast=int)
+# Lifetime of password reset tokens (PasswordResetToken table) and wrong codes
+# allowed per token
+PASSWORD_RESET_TTL_SECONDS = config('PASSWORD_RESET_TTL_SECONDS', default=600, cast=int)
+PASSWORD_RESET_MAX_ATTEMPTS = config('PASSWORD_RESET_MAX_ATTEMPTS', default=5, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -233,7 +358,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -245,8 +370,26 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Token-bucket rates per throttle scope (freshk/throttling.py): clients may
+    # burst up to the limit, which then refills evenly over the period
+    'DEFAULT_THROTTLE_RATES': {
+        'catalog': config('THROTTLE_RATE_CATALOG', default='120/min'),
+        'apk_check': config('THROTTLE_RATE_APK_CHECK', default='30/min'),
+        'apk_download': config('THROTTLE_RATE_APK_DOWNLOAD', default='10/hour'),
+        'otp_request': config('THROTTLE_RATE_OTP_REQUEST', default='10/hour'),
+        'production_otp': config('THROTTLE_RATE_PRODUCTION_OTP', default='5/hour'),
+        # Per phone number, on top of the per-IP limit
+        'otp_phone': config('THROTTLE_RATE_OTP_PHONE', default='3/hour'),
+        'password_reset': config('THROTTLE_RATE_PASSWORD_RESET', default='10/hour'),
+        'otp_verify': config('THROTTLE_RATE_OTP_VERIFY', default='20/hour'),
+    },
 }
 
+# Serve the hot read endpoints (update checks, mobile catalog listings and the
+# admin analytics dashboard) from async views backed by the async ORM.
+# Enable when running under freshk.asgi (see ASGI_DEPLOYMENT.md).
+ASYNC_READ_VIEWS = config('ASYNC_READ_VIEWS', default=False, cast=bool)
+
 # Simple JWT configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),  # Increased to 60 minutes for better mobile experience
@@ -255,12 +398,64 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Seconds an authenticated user may be served from the cache instead of the
+# users table (0 disables). Entries are invalidated when the user is saved;
+# with a per-process cache, other workers see changes after at most this long.
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=60, cast=int)
+
+# CustomUser.last_activity tracking: requests are noted in memory, flushed
+# every USER_ACTIVITY_FLUSH_INTERVAL seconds and written to the users table at
+# most once per user every USER_ACTIVITY_WRITE_INTERVAL minutes. Off under
+# `manage.py test`, whose database is gone by the time the last flush runs.
+USER_ACTIVITY_TRACKING = config('USER_ACTIVITY_TRACKING', default=True, cast=bool) and not TESTING
+USER_ACTIVITY_FLUSH_INTERVAL = config('USER_ACTIVITY_FLUSH_INTERVAL', default=30.0, cast=float)
+USER_ACTIVITY_WRITE_INTERVAL = config('USER_ACTIVITY_WRITE_INTERVAL', default=5, cast=int)
+
 # Twilio configuration - DISABLED FOR TESTING
 TWILIO_ENABLED = False
 TWILIO_ACCOUNT_SID = ''
 TWILIO_AUTH_TOKEN = ''
 TWILIO_PHONE_NUMBER = ''
 
+# Email (used by the notification dispatcher)
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=10, cast=int)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='FreshK <no-reply@freshk.com>')
+
+# Frontend page that lets the user pick a new password; the emailed link
+# appends ?token=... for POST /api/users/password_reset_confirm/
+PASSWORD_RESET_URL = config('PASSWORD_RESET_URL', default='http://localhost:3000/reset-password')
+
+# Outbound notifications (see NOTIFICATIONS.md). Backends per channel; the
+# console/file backends deliver nothing and are meant for development and tests.
+NOTIFICATION_BACKENDS = {
+    'sms': config(
+        'NOTIFICATION_SMS_BACKEND',
+        default='apps.notifications.backends.TwilioSMSBackend'
+        if config('TWILIO_ENABLED', default=False, cast=bool)
+        else 'apps.notifications.backends.ConsoleBackend'
+    ),
+    'email': config('NOTIFICATION_EMAIL_BACKEND', default='apps.notifications.backends.DjangoEmailBackend'),
+}
+NOTIFICATIONS_FILE_PATH = config('NOTIFICATIONS_FILE_PATH', default=str(BASE_DIR / 'logs/notifications.jsonl'))
+# Worker threads per web process. Deliver with one separate
+# `manage.py process_notifications` process instead (the default): otherwise
+# every web worker runs its own
+NOTIFICATION_WORKERS = config('NOTIFICATION_WORKERS', default=0, cast=int)
+NOTIFICATION_BATCH_SIZE = config('NOTIFICATION_BATCH_SIZE', default=20, cast=int)
+NOTIFICATION_POLL_INTERVAL = config('NOTIFICATION_POLL_INTERVAL', default=5.0, cast=float)
+NOTIFICATION_MAX_ATTEMPTS = config('NOTIFICATION_MAX_ATTEMPTS', default=5, cast=int)
+NOTIFICATION_RETRY_BASE_DELAY = config('NOTIFICATION_RETRY_BASE_DELAY', default=10, cast=int)
+NOTIFICATION_RETRY_MAX_DELAY = config('NOTIFICATION_RETRY_MAX_DELAY', default=600, cast=int)
+NOTIFICATION_CLAIM_TIMEOUT = config('NOTIFICATION_CLAIM_TIMEOUT', default=300, cast=int)
+NOTIFICATION_BREAKER_THRESHOLD = config('NOTIFICATION_BREAKER_THRESHOLD', default=5, cast=int)
+NOTIFICATION_BREAKER_RESET_TIMEOUT = config('NOTIFICATION_BREAKER_RESET_TIMEOUT', default=60, cast=int)
+
 # Swagger Settings
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -0,0 +1,253 @@
+"""
+Token-bucket rate limiting shared by all workers.
+
+Each (scope, client) pair has a bucket of `num` tokens that refills at
+num/period tokens per second, so clients can burst up to the limit and are
+then held to the average rate. Rates come from
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] ("120/min", "5/hour", ...).
+
+Where the bucket lives depends on the default cache:
+- Redis (Django's RedisCache or django-redis): one Lua script per request,
+  so check-and-take is atomic across every worker and host;
+- other shared caches (Memcached, database): an atomic cache.incr() counter
+  per refill window, which approximates the bucket;
+- local-memory/dummy cache: an in-process bucket table (per worker).
+
+Throttled responses carry Retry-After, and RateLimitHeadersMiddleware adds
+RateLimit-Limit / RateLimit-Remaining / RateLimit-Reset / RateLimit-Policy to
+every throttled endpoint's responses.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'ratelimit'
+
+# Atomically refill and take from the bucket stored in a hash. Uses the Redis
+# clock so all app servers agree on elapsed time.
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+def parse_rate(rate):
+    """'120/min' -> (120, 60)"""
+    return SimpleRateThrottle.parse_rate(None, rate)
+
+
+class LocalBucketStore:
+    """Buckets in process memory, for the local-memory cache"""
+
+    MAX_BUCKETS = 10000
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - ts) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CounterBucketStore:
+    """
+    Shared caches without scripting: count requests per refill window with the
+    atomic cache.incr(). Equivalent to a bucket that refills all at once.
+    """
+
+    def take(self, key, capacity, rate):
+        period = capacity / rate
+        window = int(time.time() // period)
+        window_key = f'{key}:{window}'
+        cache.add(window_key, 0, timeout=math.ceil(period) + 1)
+        try:
+            used = cache.incr(window_key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(window_key, 1, timeout=math.ceil(period) + 1)
+            used = 1
+        return used <= capacity, max(0, capacity - used)
+
+
+class RedisBucketStore:
+    """Buckets as Redis hashes, updated by a Lua script"""
+
+    def __init__(self, client):
+        self._script = client.register_script(TOKEN_BUCKET_LUA)
+
+    def take(self, key, capacity, rate):
+        allowed, tokens = self._script(keys=[cache.make_key(key)], args=[capacity, rate, 1])
+        return bool(allowed), float(tokens)
+
+
+def _redis_client():
+    """The redis-py client behind the default cache, or None"""
+    backend = caches['default']
+    # django-redis
+    client = getattr(backend, 'client', None)
+    if client is not None and hasattr(client, 'get_client'):
+        return client.get_client(write=True)
+    # django.core.cache.backends.redis.RedisCache
+    cache_client = getattr(backend, '_cache', None)
+    if cache_client is not None and hasattr(cache_client, 'get_client'):
+        return cache_client.get_client(write=True)
+    return None
+
+
+_store = None
+_local_store = LocalBucketStore()
+_store_lock = threading.Lock()
+
+
+def get_bucket_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if isinstance(caches['default'], (LocMemCache, DummyCache)):
+                    _store = _local_store
+                else:
+                    client = _redis_client()
+                    _store = RedisBucketStore(client) if client is not None else CounterBucketStore()
+    return _store
+
+
+def reset_buckets():
+    """
+    Forget the process-local buckets and the chosen store (tests: each test
+    case starts with full buckets, and a changed cache backend is picked up).
+    Buckets in a shared cache are left alone.
+    """
+    global _store
+    with _store_lock:
+        _store = None
+    _local_store.clear()
+
+
+def take_token(scope, ident, rate):
+    """
+    Take a token from the (scope, ident) bucket.
+    Returns (allowed, tokens left, refill rate in tokens per second).
+    """
+    num, period = parse_rate(rate)
+    refill = num / period
+    key = f'{KEY_PREFIX}:{scope}:{ident}'
+    try:
+        allowed, tokens = get_bucket_store().take(key, num, refill)
+    except Exception as e:
+        # Don't take the API down with the cache; limit per process meanwhile
+        logger.warning(f"Rate limit store unavailable, using local buckets: {e}")
+        allowed, tokens = _local_store.take(key, num, refill)
+    return allowed, tokens, refill
+
+
+def check_rate(scope, ident):
+    """Imperative check for limits that aren't tied to a view (e.g. per phone number)"""
+    rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+    if not rate:
+        return True
+    return take_token(scope, ident, rate)[0]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle backed by take_token(). Authenticated clients are limited per
+    user, anonymous ones per IP. Subclasses (or throttle_scope on the view) set
+    the scope.
+    """
+
+    scope = None
+
+    def get_scope(self, view):
+        return self.scope or getattr(view, 'throttle_scope', None)
+
+    def get_ident_for(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if not rate:
+            return True
+
+        allowed, tokens, refill = take_token(scope, self.get_ident_for(request), rate)
+        # Seconds until the next token, and until the bucket is full again
+        self._wait = max(0, 1 - tokens) / refill
+        num, period = parse_rate(rate)
+        record_rate_limit(request, num, period, int(tokens), (num - tokens) / refill)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+def record_rate_limit(request, limit, period, remaining, reset):
+    """Remember the tightest limit seen for this request for the response headers"""
+    http_request = getattr(request, '_request', request)
+    current = getattr(http_request, 'rate_limit', None)
+    if current is None or remaining < current['remaining']:
+        http_request.rate_limit = {
+            'limit': limit,
+            'period': period,
+            'remaining': remaining,
+            'reset': math.ceil(reset),
+        }
+
+
+class RateLimitHeadersMiddleware:
+    """Adds RateLimit-* headers to responses of throttled endpoints"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit:
+            response['RateLimit-Limit'] = str(rate_limit['limit'])
+            response['RateLimit-Remaining'] = str(rate_limit['remaining'])
+            response['RateLimit-Reset'] = str(rate_limit['reset'])
+            response['RateLimit-Policy'] = f"{rate_limit['limit']};w={rate_limit['period']}"
+        return response
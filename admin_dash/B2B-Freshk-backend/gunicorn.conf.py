@@ -0,0 +1,33 @@
+"""
+Gunicorn configuration for freshk.
+
+Gunicorn picks this file up automatically when started from the project root.
+Every value can be overridden from the environment, see GUNICORN_TUNING.md.
+"""
+
+import multiprocessing
+import os
+
+# Bind to $PORT on Render, 8000 everywhere else
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Thread-based workers: one process per CPU, several request threads each.
+# Most of a request is spent waiting on PostgreSQL, so threads let a worker
+# keep serving while another request waits, at a fraction of the memory of
+# extra processes.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', max(2, multiprocessing.cpu_count())))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Recycle workers periodically to cap slow memory growth
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+# APK uploads and large dashboard aggregations can take a while
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
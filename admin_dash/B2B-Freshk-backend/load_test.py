@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""
+Small HTTP load generator used to compare deployment modes (WSGI vs ASGI,
+worker/thread counts). It only needs aiohttp, which is already a dependency.
+
+Usage:
+    python load_test.py http://localhost:8000/api/apk/check-update/?version=1.0.0 \
+        --concurrency 50 --duration 20 [--token <JWT access token>]
+
+Several URLs can be given; requests are spread across them round-robin.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+
+async def worker(session, urls, headers, deadline, latencies, errors, offset):
+    i = offset
+    while time.perf_counter() < deadline:
+        url = urls[i % len(urls)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            async with session.get(url, headers=headers) as response:
+                await response.read()
+                if response.status >= 400:
+                    errors.append(response.status)
+                    continue
+        except aiohttp.ClientError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(urls, concurrency, duration, token):
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    latencies, errors = [], []
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            worker(session, urls, headers, deadline, latencies, errors, n)
+            for n in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simple HTTP load generator')
+    parser.add_argument('urls', nargs='+', help='URL(s) to request')
+    parser.add_argument('--concurrency', type=int, default=20, help='Concurrent connections')
+    parser.add_argument('--duration', type=float, default=10, help='Test duration in seconds')
+    parser.add_argument('--token', default='', help='JWT access token for authenticated endpoints')
+    args = parser.parse_args()
+
+    latencies, errors, elapsed = asyncio.run(
+        run(args.urls, args.concurrency, args.duration, args.token)
+    )
+
+    print(f"Requests:     {len(latencies)} ok, {len(errors)} failed in {elapsed:.1f}s")
+    print(f"Throughput:   {len(latencies) / elapsed:.1f} req/s")
+    if latencies:
+        print(f"Latency mean: {statistics.mean(latencies) * 1000:.1f} ms")
+        print(f"Latency p50:  {percentile(latencies, 50) * 1000:.1f} ms")
+        print(f"Latency p95:  {percentile(latencies, 95) * 1000:.1f} ms")
+        print(f"Latency p99:  {percentile(latencies, 99) * 1000:.1f} ms")
+    if errors:
+        print(f"Errors:       {sorted(set(map(str, errors)))}")
+
+
+if __name__ == '__main__':
+    main()